@@ -0,0 +1,387 @@
+# api_server.py
+"""
+Headless HTTP API around RealEstateAssistant for multi-user access.
+
+Requests are handled on one asyncio event loop. At most `workers` queries
+run at once; up to `queue_limit` more wait for a worker, and anything beyond
+that is rejected immediately with 503 and a Retry-After header instead of
+piling up latency. Each session gets its own assistant (and therefore its
+own conversation memory). Session IDs are issued by the server: a request
+without one starts a new session and the response carries its ID, and
+unknown IDs are rejected with 404. A session runs one turn at a time; a
+second request while one is in progress gets 409.
+
+Endpoints:
+    POST   /v1/query               multipart/form-data or JSON; fields
+                                   "message", optional "session_id" (as
+                                   returned by an earlier response),
+                                   "property_id" and "image" file parts
+    DELETE /v1/sessions/{id}       drop a session's conversation state
+    GET    /health                 worker and queue occupancy, per-model
+                                   circuit states
+    GET    /metrics                Prometheus text
+
+Usage:
+    python api_server.py --port 8080 --workers 8 --queue-limit 32
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from aiohttp import web
+from PIL import Image
+
+from main import RealEstateAssistant
+from tools.groq_client import aclose_async_clients, circuit_breaker
+from utils.image_preprocessing import MAX_IMAGES_PER_REQUEST, preprocess_images
+from utils.image_triage import triage_image
+from utils.metrics import metrics
+
+# Upper bound for one request body; images are downscaled after upload
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+# Upper bound for one uploaded image, checked while it is read
+MAX_IMAGE_BYTES = 15 * 1024 * 1024
+# Bytes read from a multipart part at a time
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class Overloaded(Exception):
+    """
+    Raised when every worker is busy and the wait queue is full
+    """
+
+
+class AdmissionController:
+    """
+    Bounded worker concurrency with a bounded wait queue
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._semaphore = asyncio.Semaphore(workers)
+        self.active = 0
+        self.waiting = 0
+
+    def check(self) -> None:
+        """
+        Raise Overloaded when a new query could not even queue for a worker
+        """
+        if self.active >= self.workers and self.waiting >= self.queue_limit:
+            metrics.increment("api.rejected")
+            raise Overloaded()
+
+    def slot(self):
+        """
+        Async context manager holding one worker slot; raises Overloaded
+        without waiting when the queue is already full
+        """
+        self.check()
+        return _Slot(self)
+
+    def _update_gauges(self):
+        metrics.set_gauge("api.active", self.active)
+        metrics.set_gauge("api.queue_depth", self.waiting)
+
+
+class _Slot:
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+
+    async def __aenter__(self):
+        controller = self.controller
+        controller.waiting += 1
+        controller._update_gauges()
+        start = time.perf_counter()
+        try:
+            await controller._semaphore.acquire()
+        finally:
+            controller.waiting -= 1
+        controller.active += 1
+        controller._update_gauges()
+        metrics.observe("api.queue_wait_seconds", time.perf_counter() - start)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.controller.active -= 1
+        self.controller._semaphore.release()
+        self.controller._update_gauges()
+        return False
+
+
+class _Session:
+    __slots__ = ("assistant", "lock", "last_used")
+
+    def __init__(self, assistant: RealEstateAssistant):
+        self.assistant = assistant
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """
+    Per-session assistants keyed by server-issued session ID, evicted least
+    recently used first and after `ttl_seconds` of inactivity
+    """
+
+    def __init__(self, factory: Callable[[], RealEstateAssistant], max_sessions: int = 1000,
+                 ttl_seconds: float = 3600):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self) -> Tuple[str, _Session]:
+        """
+        Start a session under a new random ID
+        """
+        self._expire()
+        session_id = uuid.uuid4().hex
+        session = _Session(self.factory())
+        self._sessions[session_id] = session
+        metrics.increment("api.sessions.created")
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            metrics.increment("api.sessions.evicted")
+        metrics.set_gauge("api.sessions", len(self._sessions))
+        return session_id, session
+
+    def get(self, session_id: str) -> Optional[_Session]:
+        """
+        The session with this ID, or None if it was never issued or has
+        been dropped
+        """
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        removed = self._sessions.pop(session_id, None) is not None
+        metrics.set_gauge("api.sessions", len(self._sessions))
+        return removed
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            # Never drop a session with a turn in progress
+            if session.last_used >= cutoff or session.lock.locked():
+                break
+            del self._sessions[session_id]
+            metrics.increment("api.sessions.expired")
+
+
+def _json_error(status: int, message: str, **headers) -> web.Response:
+    return web.json_response({"error": message}, status=status, headers=headers or None)
+
+
+def _overloaded(app: web.Application) -> web.Response:
+    return _json_error(503, "Server is at capacity, retry shortly", **{"Retry-After": str(app["retry_after"])})
+
+
+async def _read_part(part, limit: int) -> bytes:
+    """
+    Read a multipart part in chunks, rejecting it as soon as it exceeds limit
+    """
+    data = bytearray()
+    while True:
+        chunk = await part.read_chunk(READ_CHUNK_BYTES)
+        if not chunk:
+            return bytes(data)
+        data.extend(chunk)
+        if len(data) > limit:
+            raise web.HTTPRequestEntityTooLarge(max_size=limit, actual_size=len(data),
+                                                text=f"Images are limited to {limit // (1024 * 1024)} MB each")
+
+
+async def _read_query(request: web.Request):
+    """
+    Parse a query request into (message, session_id, property_id, raw images)
+    """
+    fields = {}
+    images: List[bytes] = []
+    if request.content_type == "multipart/form-data":
+        reader = await request.multipart()
+        async for part in reader:
+            if part.filename is not None or part.name == "image":
+                if len(images) >= MAX_IMAGES_PER_REQUEST:
+                    raise web.HTTPBadRequest(text=f"At most {MAX_IMAGES_PER_REQUEST} images per request")
+                images.append(await _read_part(part, MAX_IMAGE_BYTES))
+            else:
+                fields[part.name] = await part.text()
+    else:
+        try:
+            fields = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Expected multipart/form-data or a JSON body")
+        if not isinstance(fields, dict):
+            raise web.HTTPBadRequest(text="The JSON body must be an object")
+    return (
+        (fields.get("message") or "").strip(),
+        fields.get("session_id") or None,
+        fields.get("property_id") or None,
+        images,
+    )
+
+
+def _prepare_images(raw_images: List[bytes]):
+    # Triage needs the original EXIF data, which preprocessing strips
+    return preprocess_images(raw_images), [triage_image(data) for data in raw_images]
+
+
+async def handle_query(request: web.Request) -> web.Response:
+    app = request.app
+    start = time.perf_counter()
+    metrics.increment("api.requests")
+
+    # Turn away oversized bodies and a full queue before buffering any upload
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+        return _json_error(413, f"Requests are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    try:
+        app["admission"].check()
+    except Overloaded:
+        return _overloaded(app)
+
+    message, session_id, property_id, raw_images = await _read_query(request)
+    if not message:
+        return _json_error(400, "A non-empty 'message' field is required")
+    sessions = app["sessions"]
+    created = session_id is None
+    if created:
+        session_id, session = sessions.create()
+    else:
+        session = sessions.get(session_id)
+        if session is None:
+            return _json_error(404, "Unknown session; omit session_id to start a new one")
+    if session.lock.locked():
+        # A queued second turn would hold a worker slot while it waits
+        metrics.increment("api.session_busy")
+        return _json_error(409, "This session already has a query in progress")
+
+    try:
+        async with session.lock, app["admission"].slot():
+            # Decoding and resizing is CPU work; keep it off the event loop
+            images = triage = None
+            if raw_images:
+                try:
+                    prepared, triage = await asyncio.to_thread(_prepare_images, raw_images)
+                except (OSError, ValueError, Image.DecompressionBombError):
+                    # Corrupt data, or pixel counts beyond PIL's decompression bomb limit
+                    if created:
+                        sessions.delete(session_id)
+                    return _json_error(400, "Uploaded images could not be decoded")
+                images = [p.base64 for p in prepared]
+            response = await session.assistant.aprocess_query(message, images, property_id, triage)
+    except Overloaded:
+        if created:
+            # The client never learns this session's ID on an error
+            sessions.delete(session_id)
+        return _overloaded(app)
+
+    metrics.observe("api.request_seconds", time.perf_counter() - start)
+    return web.json_response({"session_id": session_id, "response": response})
+
+
+async def handle_delete_session(request: web.Request) -> web.Response:
+    if not request.app["sessions"].delete(request.match_info["session_id"]):
+        return _json_error(404, "Unknown session")
+    return web.Response(status=204)
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    admission = request.app["admission"]
+    return web.json_response({
+        "status": "ok",
+        "workers": admission.workers,
+        "active": admission.active,
+        "queued": admission.waiting,
+        "queue_limit": admission.queue_limit,
+        "sessions": len(request.app["sessions"]),
+        "circuits": circuit_breaker.states(),
+    })
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+
+def create_app(assistant_factory: Optional[Callable[[], RealEstateAssistant]] = None,
+               workers: int = 8, queue_limit: int = 32, max_sessions: int = 1000,
+               session_ttl: float = 3600, retry_after: int = 1) -> web.Application:
+    """
+    Build the aiohttp application
+
+    Args:
+        assistant_factory (Callable, optional): Creates the assistant for a new
+            session; defaults to RealEstateAssistant() configured from the
+            environment
+        workers (int): Queries processed concurrently
+        queue_limit (int): Queries allowed to wait for a worker before 503s
+        max_sessions (int): Sessions kept in memory
+        session_ttl (float): Seconds of inactivity before a session is dropped
+        retry_after (int): Retry-After seconds sent with 503 responses
+
+    Returns:
+        web.Application: The configured application
+    """
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+    app["sessions"] = SessionStore(assistant_factory or RealEstateAssistant, max_sessions, session_ttl)
+    app["retry_after"] = retry_after
+    app["workers"] = workers
+    app["queue_limit"] = queue_limit
+
+    async def on_startup(app):
+        # The semaphore must be created on the serving loop. Engine stages and
+        # preprocessing run in the default executor, sized to the worker count
+        # so a worker never waits for a thread.
+        app["admission"] = AdmissionController(workers, queue_limit)
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=workers + 4, thread_name_prefix="api")
+        )
+
+    async def on_cleanup(app):
+        await aclose_async_clients()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/v1/query", handle_query)
+    app.router.add_delete("/v1/sessions/{session_id}", handle_delete_session)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PropertyLoop assistant HTTP API")
+    parser.add_argument("--host", default=os.environ.get("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("API_PORT", 8080)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("API_WORKERS", 8)),
+                        help="Queries processed concurrently")
+    parser.add_argument("--queue-limit", type=int, default=int(os.environ.get("API_QUEUE_LIMIT", 32)),
+                        help="Queries waiting for a worker before 503s are returned")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--session-ttl", type=float, default=3600, help="Idle seconds before a session is dropped")
+    args = parser.parse_args()
+
+    if not os.environ.get("GROQ_API_KEY"):
+        parser.error("GROQ_API_KEY must be set")
+
+    app = create_app(workers=args.workers, queue_limit=args.queue_limit,
+                     max_sessions=args.max_sessions, session_ttl=args.session_ttl)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
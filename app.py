@@ -1,11 +1,23 @@
 # app.py
 import streamlit as st
 from PIL import Image
-import io
-import base64
 import os
 from main import RealEstateAssistant
-from utils.helpers import format_response, check_image_size
+from utils.image_preprocessing import preprocess_images
+from utils.image_triage import triage_image
+from utils.transcript_store import ThumbnailStore, Transcript
+from utils.tracing import start_export_server
+
+# Serves /metrics (Prometheus) and /traces (OTLP/JSON) when METRICS_PORT is set
+start_export_server()
+
+# Messages rendered per transcript page; older pages are read from disk
+PAGE_SIZE = 20
+
+@st.cache_resource
+def get_thumbnail_store():
+    # Shared by all sessions; identical uploads are stored once
+    return ThumbnailStore()
 
 # Set page config with the logo
 st.set_page_config(
@@ -21,10 +33,12 @@ st.sidebar.image(logo, width=200)
 # Initialize session state
 if "assistant" not in st.session_state:
     st.session_state.assistant = None
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+if "transcript" not in st.session_state:
+    st.session_state.transcript = Transcript()
 if "api_key_set" not in st.session_state:
     st.session_state.api_key_set = False
+if "upload_key" not in st.session_state:
+    st.session_state.upload_key = 0
 
 # Main UI
 st.title("🏠 Real Estate Multi-Agent Assistant")
@@ -49,6 +63,16 @@ with st.sidebar:
         except Exception as e:
             st.error(f"Error initializing assistant: {str(e)}")
     
+    # Issue reports are stored under this property when ISSUE_REPORT_DB is set
+    property_id = st.text_input("Property ID (optional)") or None
+    
+    # One large photo inspected as full-resolution tiles: finds hairline
+    # cracks and early mould at the cost of several vision calls
+    high_resolution = st.checkbox(
+        "High-resolution inspection",
+        help="Inspect a single large photo tile by tile for fine detail. Uses more API quota."
+    )
+    
     # Add information about the system
     st.subheader("How it works")
     st.write("""
@@ -71,50 +95,62 @@ if not st.session_state.api_key_set:
     st.info("Please enter your Groq API key in the sidebar to begin.")
     st.stop()
 
-# Display chat messages
-for message in st.session_state.messages:
+thumbnails = get_thumbnail_store()
+transcript = st.session_state.transcript
+
+# Display chat messages, one page at a time (the latest page by default)
+page_count = transcript.page_count(PAGE_SIZE)
+page = page_count - 1
+if page_count > 1:
+    page = st.number_input(
+        "Conversation page", min_value=1, max_value=page_count, value=page_count
+    ) - 1
+for message in transcript.page(page, PAGE_SIZE):
     with st.chat_message(message["role"]):
-        if message["role"] == "assistant" and "image_analysis" in message and message["image"] is not None:
-            # Display original image with analysis
-            st.image(message["image"], width=300)
-            st.write(format_response(message["content"]))
-        else:
-            st.write(format_response(message["content"]))
+        if message["images"]:
+            # Thumbnails are read from disk, not held in session state
+            st.image([thumbnails.path(image_id) for image_id in message["images"]], width=300)
+        st.write(message["text"])
 
 # User input
 user_input = st.chat_input("Ask about property issues or tenancy questions...")
-uploaded_file = st.file_uploader("Upload an image of property issue (optional)", type=["jpg", "jpeg", "png"])
+uploaded_files = st.file_uploader(
+    "Upload images of a property issue (optional, several angles are analyzed together)",
+    type=["jpg", "jpeg", "png"],
+    accept_multiple_files=True,
+    key=f"uploads-{st.session_state.upload_key}"
+)
 
 # Process input
-if user_input or uploaded_file:
+if user_input or uploaded_files:
     # Add user message to chat
     image_data = None
-    image = None
+    image_triage = None
+    image_ids = []
     
-    if uploaded_file:
+    if uploaded_files:
+        # Uploads survive reruns (page flips, sidebar changes); a fresh key
+        # empties the uploader so each upload is processed once
+        st.session_state.upload_key += 1
         try:
-            image = Image.open(uploaded_file)
-            
-            # Check image size
-            if not check_image_size(image):
-                st.warning("Image is too large. Resizing for optimal processing.")
-                image = image.resize((800, int(800 * image.height / image.width)))
-            
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format=image.format if image.format else "JPEG")
-            image_data = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
+            uploads = [f.getvalue() for f in uploaded_files]
+            # Triage sees the originals: the selfie and screenshot checks need
+            # the EXIF data that preprocessing strips
+            image_triage = [triage_image(data) for data in uploads]
+            # Orient, strip metadata, resize and re-encode for the vision model,
+            # sharing one request budget across all uploaded angles
+            prepared = preprocess_images(uploads)
+            image_ids = [thumbnails.put(p.data) for p in prepared]
+            image_data = [p.base64 for p in prepared]
             
             # Display user message with image
             with st.chat_message("user"):
                 if user_input:
                     st.write(user_input)
-                st.image(image, width=300)
+                st.image([thumbnails.path(image_id) for image_id in image_ids], width=300)
                 
-            st.session_state.messages.append({
-                "role": "user",
-                "content": user_input if user_input else "Please analyze this image.",
-                "image": image
-            })
+            default_prompt = "Please analyze these images." if len(image_ids) > 1 else "Please analyze this image."
+            transcript.append("user", user_input if user_input else default_prompt, image_ids)
         except Exception as e:
             st.error(f"Error processing image: {str(e)}")
             st.stop()
@@ -122,31 +158,35 @@ if user_input or uploaded_file:
         # Text-only user message
         with st.chat_message("user"):
             st.write(user_input)
-        st.session_state.messages.append({"role": "user", "content": user_input})
+        transcript.append("user", user_input)
     
-    # Process with multi-agent system
+    # Process with multi-agent system, rendering tokens as they arrive
     with st.chat_message("assistant"):
-        with st.spinner("Our agents are analyzing your request..."):
-            try:
-                response = st.session_state.assistant.process_query(
-                    user_input if user_input else "Analyze this image", 
-                    image_data
+        try:
+            placeholder = st.empty()
+            placeholder.markdown("_Our agents are analyzing your request..._")
+            
+            response = ""
+            if high_resolution and uploaded_files and len(uploaded_files) == 1:
+                # Tiles are cut from the original upload, not the resized copy
+                response = st.session_state.assistant.inspect_high_resolution(
+                    user_input if user_input else "Analyze this image",
+                    uploaded_files[0].getvalue(),
+                    property_id
                 )
-                
-                # Add assistant message to chat
-                if uploaded_file:
-                    st.image(image, width=300)
-                    st.write(format_response(response))
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response,
-                        "image": image,
-                        "image_analysis": True
-                    })
-                else:
-                    st.write(format_response(response))
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-            except Exception as e:
-                error_message = f"Sorry, I encountered an error: {str(e)}"
-                st.error(error_message)
-                st.session_state.messages.append({"role": "assistant", "content": error_message})
\ No newline at end of file
+            else:
+                for chunk in st.session_state.assistant.stream_query(
+                    user_input if user_input else "Analyze this image", 
+                    image_data,
+                    property_id,
+                    triage=image_triage
+                ):
+                    response += chunk
+                    placeholder.markdown(response + "▌")
+            
+            # Add assistant message to chat; the images stay on the user message
+            placeholder.markdown(transcript.append("assistant", response)["text"])
+        except Exception as e:
+            error_message = f"Sorry, I encountered an error: {str(e)}"
+            st.error(error_message)
+            transcript.append("assistant", error_message)
@@ -0,0 +1,165 @@
+# benchmarks/bench_api_load.py
+"""
+Load test for the HTTP API (api_server.py) against the local stub Groq
+server.
+
+For each worker count the API is started in-process and a fixed number of
+concurrent clients, one session each, send the mixed WORKLOAD: tenancy
+questions as JSON and issue photos as multipart uploads. Throughput shows
+how the server scales with workers while model latency stays constant.
+A final back-pressure run uses a short queue so the share of fast 503
+rejections is visible.
+
+Usage:
+    python -m benchmarks.bench_api_load --workers 1,2,4,8,16 --clients 32 --json api_load.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+from PIL import Image
+
+from api_server import create_app
+from benchmarks.run_suite import WORKLOAD, summarize
+from benchmarks.stub_groq_server import StubConfig, StubGroqServer
+from crew_agents.pool import AgentPool
+from main import RealEstateAssistant
+from tools.answer_cache import SemanticAnswerCache
+from tools.groq_client import MODEL_RATE_LIMITS, scheduler
+
+
+def random_jpeg(width: int = 640, height: int = 480) -> bytes:
+    # Random content so the perceptual-hash image cache never hits
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def _client(http: aiohttp.ClientSession, url: str, client_id: int, requests: int,
+                  samples: List[float], counts: Dict[str, int]):
+    # Issued by the server with the first answer
+    session_id = None
+    for i in range(requests):
+        query, has_image = WORKLOAD[(client_id + i) % len(WORKLOAD)]
+        query = f"{query} (client {client_id}, request {i})"
+        if has_image:
+            form = aiohttp.FormData()
+            form.add_field("message", query)
+            if session_id:
+                form.add_field("session_id", session_id)
+            form.add_field("image", random_jpeg(), filename="photo.jpg", content_type="image/jpeg")
+            kwargs = {"data": form}
+        else:
+            kwargs = {"json": {"message": query, "session_id": session_id}}
+
+        start = time.perf_counter()
+        async with http.post(f"{url}/v1/query", **kwargs) as response:
+            body = await response.read()
+            status = response.status
+            retry_after = float(response.headers.get("Retry-After") or 0)
+        if status == 200:
+            samples.append(time.perf_counter() - start)
+            session_id = json.loads(body)["session_id"]
+            counts["ok"] += 1
+        elif status == 503:
+            counts["rejected"] += 1
+            # Back off briefly instead of hammering a saturated server
+            await asyncio.sleep(min(retry_after, 0.05))
+        else:
+            counts["error"] += 1
+
+
+async def run_level(workers: int, queue_limit: int, clients: int, requests_per_client: int) -> Dict:
+    # A new API key gets a fresh Groq client bound to this event loop
+    api_key = f"stub-api-load-{workers}-{queue_limit}"
+
+    # Answers are never reused, so every tenancy question reaches the model
+    pool = AgentPool(api_key, answer_cache=SemanticAnswerCache(similarity_threshold=1.01))
+
+    def assistant_factory():
+        return RealEstateAssistant(api_key=api_key, pool=pool)
+
+    app = create_app(assistant_factory, workers=workers, queue_limit=queue_limit, retry_after=1)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}"
+
+    samples: List[float] = []
+    counts = {"ok": 0, "rejected": 0, "error": 0}
+    connector = aiohttp.TCPConnector(limit=clients)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as http:
+            start = time.perf_counter()
+            await asyncio.gather(*(_client(http, url, n, requests_per_client, samples, counts)
+                                   for n in range(clients)))
+            wall = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+
+    result = summarize(samples)
+    result.update(counts)
+    result["throughput_rps"] = round(counts["ok"] / wall, 3)
+    result["rejected_share"] = round(counts["rejected"] / max(1, sum(counts.values())), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the HTTP API against a stub Groq server")
+    parser.add_argument("--workers", default="1,2,4,8,16", help="Comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent clients (one session each)")
+    parser.add_argument("--requests", type=int, default=4, help="Requests per client and level")
+    parser.add_argument("--backpressure-workers", type=int, default=2)
+    parser.add_argument("--backpressure-queue", type=int, default=4)
+    parser.add_argument("--ttft-median", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--engine", default="lean", help="Execution engine for the sessions")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    os.environ["ASSISTANT_ENGINE"] = args.engine
+    # The stub has no rate limit; keep the client scheduler out of the measurements
+    scheduler.set_limits({model: {"rpm": 1e6, "tpm": 1e9} for model in MODEL_RATE_LIMITS})
+    config = StubConfig(ttft_median=args.ttft_median, tokens_per_second=args.tokens_per_second, seed=1)
+
+    results = {"scaling": {}, "backpressure": None}
+    with StubGroqServer(config) as server:
+        os.environ["GROQ_BASE_URL"] = server.url
+        # A queue as long as the client count means nothing is rejected
+        for workers in [int(level) for level in args.workers.split(",")]:
+            print(f"workers={workers}...")
+            results["scaling"][f"workers_{workers}"] = asyncio.run(
+                run_level(workers, args.clients, args.clients, args.requests)
+            )
+        print("back-pressure run...")
+        results["backpressure"] = asyncio.run(
+            run_level(args.backpressure_workers, args.backpressure_queue, args.clients, args.requests)
+        )
+        results["stub_stats"] = dict(server.stats)
+
+    print(f"\n{args.clients} clients x {args.requests} requests, stub TTFT {args.ttft_median}s")
+    print(f"{'workers':>8} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in results["scaling"].items():
+        print(f"{name.split('_')[1]:>8} {row['throughput_rps']:>8} {row.get('p50_ms'):>9} "
+              f"{row.get('p95_ms'):>9} {row.get('p99_ms'):>9}")
+    bp = results["backpressure"]
+    print(f"\nback-pressure (workers={args.backpressure_workers}, queue={args.backpressure_queue}): "
+          f"{bp['ok']} ok, {bp['rejected']} rejected with 503 ({100 * bp['rejected_share']:.0f}%), "
+          f"p99 {bp.get('p99_ms')} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
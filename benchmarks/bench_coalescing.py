@@ -0,0 +1,132 @@
+# benchmarks/bench_coalescing.py
+"""
+Model requests and latency when many sessions ask the same thing at once.
+
+Bursts of identical requests from fresh sessions (a building-wide notice
+answered by every tenant, one photo of a shared stairwell sent by several
+neighbours) run against the stub Groq server, with and without coalescing
+of identical in-flight requests (RealEstateAssistant coalesce_requests).
+Requests are sent three ways: aprocess_query on one event loop (the HTTP
+API), process_query from one thread per session, and stream_query from one
+thread per session (the Streamlit app).
+
+Reports p50/p99 latency, the model requests made and the share of requests
+that joined a call already in flight.
+
+Usage:
+    python -m benchmarks.bench_coalescing [--bursts 5] [--burst-size 20] [--json OUT]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from benchmarks.bench_api_load import random_jpeg
+from benchmarks.run_suite import summarize
+from benchmarks.stub_groq_server import StubConfig, StubGroqServer
+from crew_agents.pool import AgentPool
+from main import RealEstateAssistant
+from tools.answer_cache import SemanticAnswerCache
+from tools.groq_client import MODEL_RATE_LIMITS, scheduler
+from utils.image_preprocessing import preprocess_image
+from utils.metrics import metrics
+
+NOTICE_QUESTIONS = [
+    "The notice says rent goes up next month, is that enough notice?",
+    "Can the landlord enter my flat for the fire safety inspection without my consent?",
+    "Do I have to pay for the new communal door entry system?",
+]
+
+
+def run_bursts(bursts: int, burst_size: int, api_key: str, coalesce: bool, with_image: bool, mode: str) -> Dict:
+    # Answers are never reused, so only coalescing can share work
+    pool = AgentPool(api_key, engine="lean", answer_cache=SemanticAnswerCache(similarity_threshold=1.01))
+    samples = []
+
+    def session():
+        # A fresh session per request: no history, as when a notice goes out
+        return RealEstateAssistant(api_key=api_key, pool=pool, coalesce_requests=coalesce, image_triage=False)
+
+    async def one_async(question, image):
+        assistant = session()
+        start = time.perf_counter()
+        await assistant.aprocess_query(question, image)
+        samples.append(time.perf_counter() - start)
+
+    def one_thread(question, image):
+        assistant = session()
+        start = time.perf_counter()
+        if mode == "stream":
+            "".join(assistant.stream_query(question, image))
+        else:
+            assistant.process_query(question, image)
+        samples.append(time.perf_counter() - start)
+
+    async def burst_async(question, image):
+        await asyncio.gather(*(one_async(question, image) for _ in range(burst_size)))
+
+    with ThreadPoolExecutor(max_workers=burst_size) as executor:
+        for burst in range(bursts):
+            question = f"{NOTICE_QUESTIONS[burst % len(NOTICE_QUESTIONS)]} (notice {burst})"
+            image = preprocess_image(random_jpeg()).base64 if with_image else None
+            if mode == "async":
+                asyncio.run(burst_async(question, image))
+            else:
+                list(executor.map(lambda _: one_thread(question, image), range(burst_size)))
+    return summarize(samples)
+
+
+def run_setup(server: StubGroqServer, name: str, args, coalesce: bool, with_image: bool, mode: str) -> Dict:
+    metrics.reset()
+    requests_before = server.stats["requests"]
+    pool_key = f"stub-coalescing-{name}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run_bursts(args.bursts, args.burst_size, pool_key, coalesce, with_image, mode)
+    result["model_requests"] = server.stats["requests"] - requests_before
+    snapshot = metrics.snapshot()
+    calls = sum(value for key, value in snapshot.items() if key.startswith("coalescing.") and key.endswith(".calls"))
+    joined = sum(value for key, value in snapshot.items()
+                 if key.startswith("coalescing.") and key.endswith(".coalesced"))
+    result["coalescing_ratio"] = round(joined / (calls + joined), 3) if calls + joined else 0.0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark coalescing of identical in-flight requests")
+    parser.add_argument("--bursts", type=int, default=5, help="Distinct requests, each sent as one burst")
+    parser.add_argument("--burst-size", type=int, default=20, help="Identical requests per burst")
+    parser.add_argument("--ttft-median", type=float, default=0.3)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    # The stub has no rate limit; keep the client scheduler out of the measurements
+    scheduler.set_limits({model: {"rpm": 1e6, "tpm": 1e9} for model in MODEL_RATE_LIMITS})
+    results = {}
+    with StubGroqServer(StubConfig(ttft_median=args.ttft_median, ttft_sigma=0.2, seed=1)) as server:
+        os.environ["GROQ_BASE_URL"] = server.url
+        for kind, with_image, mode in (("notice", False, "async"), ("notice", False, "threads"),
+                                       ("notice", False, "stream"), ("photo", True, "async"),
+                                       ("photo", True, "stream")):
+            for coalesce in (False, True):
+                name = f"{kind} {mode}, {'coalesced' if coalesce else 'independent'}"
+                results[name] = run_setup(server, name.replace(", ", "-").replace(" ", "-"), args,
+                                          coalesce, with_image, mode)
+
+    print(f"{args.bursts} bursts of {args.burst_size} identical requests, stub TTFT {args.ttft_median}s")
+    print(f"{'setup':30} {'p50 ms':>9} {'p99 ms':>9} {'requests':>9} {'coalesced':>10}")
+    for name, row in results.items():
+        print(f"{name:30} {row.get('p50_ms'):>9} {row.get('p99_ms'):>9} {row['model_requests']:>9} "
+              f"{row['coalescing_ratio']:>10}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
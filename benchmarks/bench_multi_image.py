@@ -0,0 +1,90 @@
+# benchmarks/bench_multi_image.py
+"""
+Compare one consolidated multi-image vision call against one call per image:
+wall-clock latency and prompt/completion tokens reported by the API.
+
+Calls the Groq API (or any compatible server set through GROQ_BASE_URL).
+
+Usage:
+    python -m benchmarks.bench_multi_image IMAGE [IMAGE ...] [--query TEXT] [--json OUT]
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+from tools.groq_client import call_with_retries, get_groq_client
+from tools.image_tools import VISION_MODEL, build_image_messages
+from utils.image_preprocessing import preprocess_images
+
+
+def _call(client, messages) -> Dict:
+    start = time.perf_counter()
+    completion = call_with_retries(lambda: client.chat.completions.create(
+        model=VISION_MODEL,
+        messages=messages,
+        temperature=0.7,
+        max_completion_tokens=1024,
+        top_p=1,
+    ))
+    usage = completion.usage
+    return {
+        "seconds": time.perf_counter() - start,
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+
+def run(paths: List[str], query: str, api_key: str) -> Dict:
+    client = get_groq_client(api_key)
+    sources = []
+    for path in paths:
+        with open(path, "rb") as f:
+            sources.append(f.read())
+    images = [prepared.base64 for prepared in preprocess_images(sources)]
+
+    # Per-image turns are sequential, as they are in the chat today
+    per_image = [_call(client, build_image_messages(data, query)) for data in images]
+    consolidated = _call(client, build_image_messages(images, query))
+
+    def totals(calls):
+        return {
+            "calls": len(calls),
+            "seconds": round(sum(c["seconds"] for c in calls), 3),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+        }
+
+    return {"images": len(images), "per_image": totals(per_image), "consolidated": totals([consolidated])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-image vision requests")
+    parser.add_argument("paths", nargs="+", help="Images showing the same issue")
+    parser.add_argument("--query", default="Water is leaking near the window, what is wrong?")
+    parser.add_argument("--api-key", default=os.environ.get("GROQ_API_KEY"))
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("Groq API key is required (--api-key or GROQ_API_KEY)")
+
+    result = run(args.paths, args.query, args.api_key)
+    for mode in ("per_image", "consolidated"):
+        r = result[mode]
+        print(f"{mode:13} calls={r['calls']:<3} seconds={r['seconds']:<8} "
+              f"prompt_tokens={r['prompt_tokens']:<7} completion_tokens={r['completion_tokens']}")
+    per, one = result["per_image"], result["consolidated"]
+    if per["seconds"] and (per["prompt_tokens"] + per["completion_tokens"]):
+        saved_tokens = 1 - (one["prompt_tokens"] + one["completion_tokens"]) / (
+            per["prompt_tokens"] + per["completion_tokens"])
+        print(f"\nLatency saved: {100 * (1 - one['seconds'] / per['seconds']):.1f}%  "
+              f"Tokens saved: {100 * saved_tokens:.1f}%")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
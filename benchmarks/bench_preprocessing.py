@@ -0,0 +1,111 @@
+# benchmarks/bench_preprocessing.py
+"""
+Compare the image payload produced by utils.image_preprocessing against the
+previous app.py behaviour (resize to 800px only when check_image_size fails,
+re-save in the original format).
+
+Usage:
+    python -m benchmarks.bench_preprocessing [IMAGE_DIR ...] [--model MODEL] [--json OUT]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import time
+from typing import Dict, List
+
+from PIL import Image
+
+from utils.helpers import check_image_size
+from utils.image_preprocessing import preprocess_image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def legacy_payload(raw: bytes) -> Dict:
+    """
+    Reproduce the original app.py upload handling
+    """
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(raw))
+    image_format = image.format
+    if not check_image_size(image):
+        image = image.resize((800, int(800 * image.height / image.width)))
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format if image_format else "JPEG")
+    payload = base64.b64encode(buffer.getvalue())
+    return {"bytes": len(payload), "seconds": time.perf_counter() - start, "size": image.size}
+
+
+def pipeline_payload(raw: bytes, model: str = None) -> Dict:
+    start = time.perf_counter()
+    prepared = preprocess_image(raw, model=model)
+    payload = prepared.base64
+    return {
+        "bytes": len(payload),
+        "seconds": time.perf_counter() - start,
+        "size": (prepared.width, prepared.height),
+    }
+
+
+def collect_images(paths: List[str]) -> List[str]:
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(os.path.join(path, name))
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(path)
+    return images
+
+
+def run(paths: List[str], model: str = None, repeat: int = 3) -> List[Dict]:
+    results = []
+    for path in collect_images(paths):
+        with open(path, "rb") as f:
+            raw = f.read()
+        # Best of N to reduce timer noise
+        legacy = min((legacy_payload(raw) for _ in range(repeat)), key=lambda r: r["seconds"])
+        pipeline = min((pipeline_payload(raw, model) for _ in range(repeat)), key=lambda r: r["seconds"])
+        results.append({
+            "image": path,
+            "original_bytes": len(raw),
+            "legacy_payload_bytes": legacy["bytes"],
+            "legacy_encode_ms": round(legacy["seconds"] * 1000, 2),
+            "legacy_size": list(legacy["size"]),
+            "payload_bytes": pipeline["bytes"],
+            "encode_ms": round(pipeline["seconds"] * 1000, 2),
+            "size": list(pipeline["size"]),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vision image preprocessing")
+    parser.add_argument("paths", nargs="*", default=["assets"], help="Image files or directories")
+    parser.add_argument("--model", default=None, help="Target vision model profile")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.paths, args.model, args.repeat)
+    print(f"{'image':40} {'original':>10} {'legacy':>10} {'ms':>8} {'new':>10} {'ms':>8}")
+    for r in results:
+        print(f"{os.path.basename(r['image'])[:40]:40} {r['original_bytes']:>10} "
+              f"{r['legacy_payload_bytes']:>10} {r['legacy_encode_ms']:>8} "
+              f"{r['payload_bytes']:>10} {r['encode_ms']:>8}")
+    if results:
+        legacy_total = sum(r["legacy_payload_bytes"] for r in results)
+        new_total = sum(r["payload_bytes"] for r in results)
+        print(f"\nTotal payload: {legacy_total} -> {new_total} bytes "
+              f"({100 * (1 - new_total / legacy_total):.1f}% smaller)")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/bench_prompt_size.py
+"""
+Report the text prompt size of each pipeline stage: estimated tokens per
+request and how many of them form a prefix shared by different requests
+(the part provider-side prompt caching can reuse). Image parts are counted
+separately; base64 that leaks into text shows up as text tokens.
+
+The crew and lean stages record the prompts the engines actually send to a
+fake chat model, so CrewAI's own agent and ReAct scaffolding is included.
+
+Usage:
+    python -m benchmarks.bench_prompt_size [--json OUT]
+"""
+import argparse
+import contextlib
+import io
+import json
+from typing import Dict, List
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from benchmarks.run_suite import random_image_b64
+from crew_agents.engine import CrewEngine, LeanEngine
+from crew_agents.issue_agent import IssueAgentBuilder
+from tools.image_tools import build_image_messages, build_report_messages
+from tools.law_retrieval import Passage
+from tools.text_tools import estimate_tokens
+
+# Two requests per stage with different questions and history, so the shared
+# prefix is what stays byte-identical between users
+QUERIES = [
+    ("Can my landlord keep my deposit for normal wear and tear?",
+     "User: I moved out last week.\nAssistant: Thanks, what would you like to know about your tenancy?"),
+    ("How much notice does my landlord need to give before a rent increase in Scotland?",
+     "User: Hi there.\nAssistant: Hello! How can I help with your property or tenancy today?"),
+]
+PASSAGES = [
+    Passage(id="deposits#0", source="england/deposits.md", jurisdiction="england",
+            text="A landlord may only make deductions from a tenancy deposit for damage beyond fair "
+                 "wear and tear, unpaid rent or other breaches of the tenancy agreement. " * 3),
+    Passage(id="rent_increase#0", source="scotland/rent_increase.md", jurisdiction="scotland",
+            text="For a private residential tenancy the landlord must give at least three months' notice "
+                 "of a rent increase using the prescribed form. " * 3),
+]
+
+_recorded: List = []
+
+
+class RecordingChatModel(FakeListChatModel):
+    """
+    Fake chat model that keeps every prompt it is sent
+    """
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        _recorded.append(messages)
+        return super()._call(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        _recorded.append(messages)
+        return super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def _text(messages) -> str:
+    """
+    The text of a chat prompt; image parts are left out
+    """
+    parts = []
+    for message in messages:
+        if isinstance(message, tuple):
+            content = message[1]
+        elif isinstance(message, dict):
+            content = message["content"]
+        else:
+            content = message.content
+        if isinstance(content, list):
+            content = "\n".join(part.get("text", "") for part in content if part.get("type") == "text")
+        parts.append(str(content))
+    return "\n".join(parts)
+
+
+def _images(messages) -> int:
+    return sum(
+        1 for message in messages if isinstance(message, dict) and isinstance(message["content"], list)
+        for part in message["content"] if part.get("type") == "image_url"
+    )
+
+
+def _shared_prefix(first: str, second: str) -> str:
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return first[:length]
+
+
+def _row(prompts: List) -> Dict:
+    texts = [_text(messages) for messages in prompts]
+    return {
+        "tokens": estimate_tokens(texts[0]),
+        "shared_prefix_tokens": estimate_tokens(_shared_prefix(texts[0], texts[1])),
+        "images": _images(prompts[0]),
+    }
+
+
+def _engine_prompts(engine_cls, step: str, final_answer_format: bool) -> List:
+    prompts = []
+    for query, history in QUERIES:
+        reply = "tenancy_faq" if step == "router" else "Answer. This is general advice, not legal counsel."
+        if final_answer_format:
+            reply = f"Thought: I now know the final answer\nFinal Answer: {reply}"
+        engine = engine_cls(RecordingChatModel(responses=[reply]))
+        del _recorded[:]
+        with contextlib.redirect_stdout(io.StringIO()):
+            if step == "router":
+                engine.route(query, False, history)
+            else:
+                engine.answer_tenancy(query, history, PASSAGES)
+        prompts.append(list(_recorded[0]))
+    return prompts
+
+
+def _issue_task_prompt(image, query, history) -> List:
+    # What a CrewAI task built from create_task would carry as text
+    task = IssueAgentBuilder.create_task(image, query, history)
+    context = "\n".join(str(item.get("content", "")) for item in task["context"])
+    return [("user", f"{task['description']}\n{context}\nExpected output: {task['expected_output']}")]
+
+
+def run() -> Dict[str, Dict]:
+    image = random_image_b64()
+    results = {
+        "router (lean)": _row(_engine_prompts(LeanEngine, "router", False)),
+        "router (crew)": _row(_engine_prompts(CrewEngine, "router", True)),
+        "tenancy (lean)": _row(_engine_prompts(LeanEngine, "tenancy", False)),
+        "tenancy (crew)": _row(_engine_prompts(CrewEngine, "tenancy", True)),
+        "vision": _row([build_image_messages(image, query, conversation_context=history)
+                        for query, history in QUERIES]),
+        "issue_report": _row([build_report_messages(image, query, conversation_context=history)
+                              for query, history in QUERIES]),
+        "inspection": _row([IssueAgentBuilder.build_inspection_messages(image) for _ in QUERIES]),
+        "issue task": _row([_issue_task_prompt(image, query, history) for query, history in QUERIES]),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report prompt tokens per pipeline stage")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = run()
+    print(f"{'stage':16} {'tokens':>7} {'shared prefix':>14} {'images':>7}")
+    for stage, row in results.items():
+        print(f"{stage:16} {row['tokens']:>7} {row['shared_prefix_tokens']:>14} {row['images']:>7}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_resilience.py
+"""
+Tail latency during provider incidents, against the stub Groq server.
+
+Two incidents, each run with and without the guards:
+
+    hangs      a share of requests stall for --hang-seconds; compared with
+               and without per-query deadlines (QUERY_DEADLINE_SECONDS)
+    degraded   the small text model answers every request with 503;
+               compared with and without the per-model circuit breaker,
+               which switches stages to the fallback tier once it opens
+
+Reports p50/p99 latency per setup, how many queries hit their deadline or
+failed, and the model requests made.
+
+Usage:
+    python -m benchmarks.bench_resilience [--queries 40] [--json OUT]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import time
+from typing import Dict
+
+from benchmarks.run_suite import summarize
+from benchmarks.stub_groq_server import StubConfig, StubGroqServer
+from crew_agents.pool import AgentPool
+from main import DEADLINE_MESSAGE, RealEstateAssistant
+from tools.answer_cache import SemanticAnswerCache
+from tools.groq_client import MODEL_RATE_LIMITS, circuit_breaker, scheduler
+from tools.model_registry import DEFAULT_TIERS
+from utils.metrics import metrics
+
+QUESTIONS = [
+    "Can my landlord keep my deposit for normal wear and tear?",
+    "How much notice does my landlord need to give before a rent increase?",
+    "Is my tenancy deposit protected?",
+    "Can I be evicted without a court order?",
+    "Who pays for repairs under my lease?",
+]
+
+
+async def run_queries(count: int, concurrency: int, api_key: str, deadline_seconds: float) -> Dict:
+    # Answers are never reused, so every question reaches the model
+    pool = AgentPool(api_key, engine="lean", answer_cache=SemanticAnswerCache(similarity_threshold=1.01))
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, responses = [], []
+
+    async def one(number):
+        async with semaphore:
+            assistant = RealEstateAssistant(api_key=api_key, pool=pool, deadline_seconds=deadline_seconds)
+            start = time.perf_counter()
+            question = f"{QUESTIONS[number % len(QUESTIONS)]} (case {number})"
+            responses.append(await assistant.aprocess_query(question))
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(number) for number in range(count)))
+    result = summarize(samples)
+    result["deadline_exceeded"] = sum(1 for response in responses if response == DEADLINE_MESSAGE)
+    result["errors"] = sum(1 for response in responses if response.startswith("I encountered an error"))
+    return result
+
+
+def run_setup(server: StubGroqServer, name: str, args, deadline_seconds: float, breaker: bool) -> Dict:
+    metrics.reset()
+    circuit_breaker.reset()
+    circuit_breaker.failure_threshold = 5 if breaker else 10 ** 9
+    requests_before = server.stats["requests"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(run_queries(args.queries, args.concurrency, f"stub-resilience-{name}",
+                                         deadline_seconds))
+    result["model_requests"] = server.stats["requests"] - requests_before
+    result["circuit_opened"] = int(metrics.get("groq.circuit.opened"))
+    result["fallbacks"] = int(sum(value for key, value in metrics.snapshot().items()
+                                  if key.startswith("cascade.") and key.endswith(".fallbacks")))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark deadlines and circuit breaking during incidents")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--deadline", type=float, default=3.0, help="Per-query deadline in seconds")
+    parser.add_argument("--hang-rate", type=float, default=0.1)
+    parser.add_argument("--hang-seconds", type=float, default=10.0)
+    parser.add_argument("--ttft-median", type=float, default=0.2)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    # The stub has no rate limit; keep the client scheduler out of the measurements
+    scheduler.set_limits({model: {"rpm": 1e6, "tpm": 1e9} for model in MODEL_RATE_LIMITS})
+    results = {}
+
+    hangs = StubConfig(ttft_median=args.ttft_median, ttft_sigma=0.2, hang_rate=args.hang_rate,
+                       hang_seconds=args.hang_seconds, seed=1)
+    with StubGroqServer(hangs) as server:
+        os.environ["GROQ_BASE_URL"] = server.url
+        results["hangs, no deadline"] = run_setup(server, "hangs-off", args, 0, breaker=True)
+        results["hangs, deadline"] = run_setup(server, "hangs-on", args, args.deadline, breaker=True)
+
+    degraded = StubConfig(ttft_median=args.ttft_median, ttft_sigma=0.2,
+                          degraded_models=(DEFAULT_TIERS["small"],), seed=1)
+    with StubGroqServer(degraded) as server:
+        os.environ["GROQ_BASE_URL"] = server.url
+        results["degraded, no breaker"] = run_setup(server, "degraded-off", args, 0, breaker=False)
+        results["degraded, breaker"] = run_setup(server, "degraded-on", args, 0, breaker=True)
+
+    print(f"{args.queries} tenancy queries, {args.concurrency} concurrent, stub TTFT {args.ttft_median}s")
+    print(f"{'setup':22} {'p50 ms':>9} {'p99 ms':>9} {'deadline':>9} {'errors':>7} {'requests':>9} "
+          f"{'fallbacks':>10}")
+    for name, row in results.items():
+        print(f"{name:22} {row.get('p50_ms'):>9} {row.get('p99_ms'):>9} {row['deadline_exceeded']:>9} "
+              f"{row['errors']:>7} {row['model_requests']:>9} {row['fallbacks']:>10}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
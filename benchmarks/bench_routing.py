@@ -0,0 +1,134 @@
+# benchmarks/bench_routing.py
+"""
+Replay a query log against the stub Groq server with three routing setups:
+
+    llm_first     the previous behavior: local classifier, then the LLM
+                  router before any specialist, also for queries with images
+    rules         deterministic rules first (an image means issue detection)
+    speculative   rules, plus starting the likely specialist in parallel with
+                  the LLM router when the local classifier is unsure
+
+Reports end-to-end latency per setup and the model requests each one made
+(speculation trades some wasted requests for latency).
+
+The log is JSONL with "query" and optional "has_image" fields, the format
+RoutingLog writes (ROUTING_LOG_PATH); a built-in sample is used without one.
+
+Usage:
+    python -m benchmarks.bench_routing [--log routing_log.jsonl] [--json OUT]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.run_suite import random_image_b64, summarize
+from benchmarks.stub_groq_server import StubConfig, StubGroqServer
+from crew_agents.pool import AgentPool
+from main import RealEstateAssistant
+from tools.answer_cache import SemanticAnswerCache
+from tools.groq_client import MODEL_RATE_LIMITS, scheduler
+from utils.metrics import metrics
+
+# (query, has_image): clear and ambiguous tenancy questions, photos with
+# vague captions, and small talk
+SAMPLE_LOG = [
+    ("What does a break clause mean?", False),
+    ("My rent went up, is that normal?", False),
+    ("what's this?", True),
+    ("The landlord wants to visit tomorrow, is that allowed?", False),
+    ("Hello, can you help me?", False),
+    ("How much notice do I need to give?", False),
+    ("Is this legal?", False),
+    ("Can you take a look at this for me", True),
+    ("Is my deposit protected?", False),
+    ("Who pays for repairs?", False),
+    ("There is a crack in the wall", True),
+    ("My flatmate moved out, what now?", False),
+]
+
+SETUPS = {
+    "llm_first": {"routing_rules": False, "speculative_routing": False},
+    "rules": {"routing_rules": True, "speculative_routing": False},
+    "speculative": {"routing_rules": True, "speculative_routing": True},
+}
+
+
+def load_log(path: str) -> List[Tuple[str, bool]]:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                entries.append((entry.get("query", ""), bool(entry.get("has_image"))))
+    return entries
+
+
+async def replay(log: List[Tuple[str, bool]], api_key: str, engine: str, setup: Dict) -> Dict:
+    # Answers are never reused, so every tenancy question reaches the model
+    pool = AgentPool(api_key, engine=engine, answer_cache=SemanticAnswerCache(similarity_threshold=1.01))
+    samples = []
+    for query, has_image in log:
+        # A fresh session per query keeps conversation context out of the comparison
+        assistant = RealEstateAssistant(api_key=api_key, pool=pool, **setup)
+        image = random_image_b64() if has_image else None
+        start = time.perf_counter()
+        await assistant.aprocess_query(query, image)
+        samples.append(time.perf_counter() - start)
+    result = summarize(samples)
+    result["total_s"] = round(sum(samples), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rule-based and speculative routing on a query log")
+    parser.add_argument("--log", default=None, help="JSONL query log (RoutingLog format)")
+    parser.add_argument("--repeat", type=int, default=3, help="Times the log is replayed per setup")
+    parser.add_argument("--engine", default="lean", help="Execution engine: lean or crew")
+    parser.add_argument("--ttft-median", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    log = (load_log(args.log) if args.log else SAMPLE_LOG) * args.repeat
+    # The stub has no rate limit; keep the client scheduler out of the measurements
+    scheduler.set_limits({model: {"rpm": 1e6, "tpm": 1e9} for model in MODEL_RATE_LIMITS})
+    config = StubConfig(ttft_median=args.ttft_median, ttft_sigma=0.2,
+                        tokens_per_second=args.tokens_per_second, seed=1)
+
+    results = {}
+    with StubGroqServer(config) as server:
+        os.environ["GROQ_BASE_URL"] = server.url
+        for name, setup in SETUPS.items():
+            metrics.reset()
+            requests_before = server.stats["requests"]
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = asyncio.run(replay(log, f"stub-routing-{name}", args.engine, setup))
+            result["model_requests"] = server.stats["requests"] - requests_before
+            result["speculation"] = {key.split(".")[-1]: int(metrics.get(key)) for key in (
+                "router.speculation.started", "router.speculation.used", "router.speculation.cancelled")}
+            results[name] = result
+
+    baseline = results["llm_first"]["total_s"]
+    print(f"{len(log)} queries, engine={args.engine}, stub TTFT {args.ttft_median}s")
+    print(f"{'setup':12} {'total s':>8} {'saved':>7} {'p50 ms':>9} {'p95 ms':>9} {'requests':>9}")
+    for name, row in results.items():
+        saved = 100 * (baseline - row["total_s"]) / baseline if baseline else 0.0
+        print(f"{name:12} {row['total_s']:>8} {saved:>6.1f}% {row.get('p50_ms'):>9} "
+              f"{row.get('p95_ms'):>9} {row['model_requests']:>9}")
+    speculation = results["speculative"]["speculation"]
+    print(f"\nspeculation: {speculation['started']} started, {speculation['used']} used, "
+          f"{speculation['cancelled']} cancelled")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_session_pool.py
+"""
+Construction time and memory per assistant session, with a private set of
+components per session (the previous behavior: own ChatGroq, engine agents,
+router, caches) against sessions sharing one AgentPool.
+
+No model calls are made. Set ROUTING_LOG_PATH to include training the local
+router from a routing log in the per-session cost.
+
+Usage:
+    python -m benchmarks.bench_session_pool [--sessions N] [--engine crew] [--json OUT]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from crew_agents.pool import AgentPool, get_agent_pool
+from main import RealEstateAssistant
+
+API_KEY = "stub-session-pool"
+
+
+def measure(create: Callable[[], RealEstateAssistant], sessions: int) -> Dict[str, float]:
+    create()  # Warm imports and module-level singletons
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        assistants = [create() for _ in range(sessions)]
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert len(assistants) == sessions
+    return {
+        "ms_per_session": round(1000 * elapsed / sessions, 3),
+        "kib_per_session": round(allocated / sessions / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-session construction cost")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--engine", default="crew", help="Execution engine: crew or lean")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = {
+            "private": measure(lambda: RealEstateAssistant(
+                api_key=API_KEY, pool=AgentPool(API_KEY, engine=args.engine)), args.sessions),
+            "shared": measure(lambda: RealEstateAssistant(
+                api_key=API_KEY, pool=get_agent_pool(API_KEY, args.engine)), args.sessions),
+        }
+    print(f"{args.sessions} sessions, engine={args.engine}")
+    for name, row in results.items():
+        print(f"{name:8} {row['ms_per_session']:>9} ms/session {row['kib_per_session']:>9} KiB/session")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+# benchmarks/run_suite.py
+"""
+End-to-end benchmark suite against the local stub Groq server: no API
+quota is used and model latency is controlled by the stub configuration.
+
+Scenarios:
+    process_query   RealEstateAssistant.process_query over a mixed workload
+    image_tools     analyze_property_image and streaming time to first token
+    concurrency     aprocess_query throughput with N concurrent sessions
+    rate_limits     image calls while the stub answers a share of requests with 429
+    streamlit       transcript store, thumbnails, formatting and preprocessing helpers
+    memory          traced Python memory per assistant session and per transcript
+
+Latencies are reported as mean/p50/p95/p99 in milliseconds. Results are
+written as JSON; pass --compare with an earlier file to flag regressions.
+
+Usage:
+    python -m benchmarks.run_suite --output bench_results.json
+    python -m benchmarks.run_suite --scenarios image_tools,streamlit --compare bench_results.json
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from PIL import Image
+
+from benchmarks.stub_groq_server import StubConfig, StubGroqServer
+from tools.groq_client import MODEL_RATE_LIMITS, scheduler
+from utils.metrics import MetricsRegistry, metrics
+
+SCENARIOS = ("process_query", "image_tools", "concurrency", "rate_limits", "streamlit", "memory")
+
+# (query, has_image): confident tenancy and issue queries take the local
+# router; the greeting falls back to the LLM router
+WORKLOAD = [
+    ("What notice does my landlord need to give before ending my tenancy in England?", False),
+    ("There is a damp patch spreading on the bedroom ceiling, what is causing it?", True),
+    ("Can my landlord keep my deposit for normal wear and tear?", False),
+    ("Hello, can you help me?", False),
+]
+
+# Latency and size keys compared by --compare; higher is worse for all but throughput
+COMPARED_KEYS = ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "throughput_rps", "bytes_per_session",
+                 "bytes_per_message")
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    Latency summary in milliseconds, using the metrics registry percentiles
+    """
+    registry = MetricsRegistry(max_samples=max(1, len(samples)))
+    for sample in samples:
+        registry.observe("latency", sample)
+    summary = registry.summary("latency")
+    if not summary:
+        return {"count": 0}
+    result = {"count": summary["count"]}
+    for key in ("mean", "p50", "p95", "p99"):
+        result[f"{key}_ms"] = round(summary[key] * 1000, 3)
+    return result
+
+
+def random_image_b64(width: int = 640, height: int = 480) -> str:
+    # Random content so the perceptual-hash image cache never hits
+    noise = Image.frombytes("L", (64, 48), os.urandom(64 * 48)).resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    noise.save(buffer, format="JPEG", quality=85)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_process_query(api_key: str, requests: int, engine: Optional[str]) -> Dict:
+    from main import RealEstateAssistant
+
+    assistant = RealEstateAssistant(api_key=api_key, engine=engine)
+    by_kind: Dict[str, List[float]] = {"tenancy": [], "image": [], "llm_routed": []}
+    samples = []
+    for i in range(requests):
+        query, has_image = WORKLOAD[i % len(WORKLOAD)]
+        # Measure uncached answers
+        assistant.answer_cache.clear()
+        image = random_image_b64() if has_image else None
+        elapsed = _timed(lambda: assistant.process_query(query, image))
+        samples.append(elapsed)
+        kind = "image" if has_image else ("llm_routed" if query.startswith("Hello") else "tenancy")
+        by_kind[kind].append(elapsed)
+    return {"all": summarize(samples), **{kind: summarize(s) for kind, s in by_kind.items()}}
+
+
+def bench_image_tools(api_key: str, requests: int) -> Dict:
+    from tools.image_tools import analyze_property_image, stream_property_image_analysis
+
+    query = "What is wrong with this wall?"
+    plain, first_token, streamed = [], [], []
+    for _ in range(requests):
+        image = random_image_b64()
+        plain.append(_timed(lambda: analyze_property_image(image, query, api_key, use_cache=False)))
+
+        start = time.perf_counter()
+        ttft = None
+        for chunk in stream_property_image_analysis(image, query, api_key, use_cache=False):
+            if ttft is None and chunk:
+                ttft = time.perf_counter() - start
+        streamed.append(time.perf_counter() - start)
+        first_token.append(ttft or streamed[-1])
+    return {
+        "analyze": summarize(plain),
+        "stream_time_to_first_token": summarize(first_token),
+        "stream_total": summarize(streamed),
+    }
+
+
+def bench_concurrency(api_key: str, levels: List[int], requests: int, engine: Optional[str]) -> Dict:
+    from main import RealEstateAssistant
+
+    async def run_level(sessions: int) -> Dict:
+        assistants = [RealEstateAssistant(api_key=api_key, engine=engine) for _ in range(sessions)]
+        samples = []
+
+        async def session(assistant, count, offset):
+            for i in range(count):
+                query, has_image = WORKLOAD[(offset + i) % len(WORKLOAD)]
+                image = random_image_b64() if has_image else None
+                start = time.perf_counter()
+                await assistant.aprocess_query(f"{query} (session {offset})", image)
+                samples.append(time.perf_counter() - start)
+
+        per_session = max(1, requests // sessions)
+        start = time.perf_counter()
+        await asyncio.gather(*(session(a, per_session, n) for n, a in enumerate(assistants)))
+        wall = time.perf_counter() - start
+        result = summarize(samples)
+        result["throughput_rps"] = round(len(samples) / wall, 3)
+        return result
+
+    return {f"sessions_{level}": asyncio.run(run_level(level)) for level in levels}
+
+
+def bench_rate_limits(requests: int, error_rate: float) -> Dict:
+    from tools.image_tools import analyze_property_image
+
+    config = StubConfig(ttft_median=0.05, ttft_sigma=0.2, error_rate=error_rate, retry_after=0.2, seed=7)
+    with StubGroqServer(config) as server:
+        previous = os.environ.get("GROQ_BASE_URL")
+        os.environ["GROQ_BASE_URL"] = server.url
+        # Clients are cached per API key, so a new key gets a client for this server
+        api_key = f"stub-rate-limits-{time.time_ns()}"
+        retries_before = metrics.get("groq.retries")
+        samples, failures = [], 0
+        try:
+            for _ in range(requests):
+                image = random_image_b64()
+                start = time.perf_counter()
+                result = analyze_property_image(image, "Any damage?", api_key, use_cache=False)
+                samples.append(time.perf_counter() - start)
+                failures += result.startswith("Error")
+        finally:
+            if previous is None:
+                os.environ.pop("GROQ_BASE_URL", None)
+            else:
+                os.environ["GROQ_BASE_URL"] = previous
+        return {
+            "latency": summarize(samples),
+            "error_rate": error_rate,
+            "server_429s": server.stats["rate_limited"],
+            "client_retries": metrics.get("groq.retries") - retries_before,
+            "failed_requests": failures,
+        }
+
+
+def bench_streamlit(iterations: int) -> Dict:
+    from utils.helpers import format_response
+    from utils.image_preprocessing import preprocess_images
+    from utils.transcript_store import ThumbnailStore, Transcript
+
+    root = tempfile.mkdtemp(prefix="bench_transcripts_")
+    transcript = Transcript(root, window=20)
+    thumbnails = ThumbnailStore(root)
+    text = ("System: debug line\n" + "The landlord must protect the deposit. " * 40 + "\n\n\n\n") * 3
+    photo = io.BytesIO()
+    Image.frombytes("RGB", (300, 200), os.urandom(300 * 200 * 3)).resize((3000, 2000)).save(photo, "JPEG")
+    photo_bytes = photo.getvalue()
+
+    append = [_timed(lambda: transcript.append("assistant", text)) for _ in range(iterations)]
+    latest = [_timed(lambda: transcript.page(transcript.page_count(20) - 1, 20)) for _ in range(iterations)]
+    oldest = [_timed(lambda: transcript.page(0, 20)) for _ in range(iterations)]
+    formatting = [_timed(lambda: format_response(text)) for _ in range(iterations)]
+    prepared = []
+    thumbnail = []
+    for _ in range(max(1, iterations // 10)):
+        start = time.perf_counter()
+        images = preprocess_images([photo_bytes])
+        prepared.append(time.perf_counter() - start)
+        data = images[0].data + os.urandom(8)  # New content address each time
+        thumbnail.append(_timed(lambda: thumbnails.put(data)))
+    transcript.delete()
+    return {
+        "transcript_append": summarize(append),
+        "transcript_latest_page": summarize(latest),
+        "transcript_oldest_page": summarize(oldest),
+        "format_response": summarize(formatting),
+        "preprocess_upload": summarize(prepared),
+        "thumbnail_put": summarize(thumbnail),
+    }
+
+
+def bench_memory(api_key: str, sessions: int, engine: Optional[str]) -> Dict:
+    from main import RealEstateAssistant
+    from utils.transcript_store import Transcript
+
+    tracemalloc.start()
+    try:
+        # Warm module-level singletons so they are not charged to sessions
+        RealEstateAssistant(api_key=api_key, engine=engine).process_query(WORKLOAD[0][0])
+        before = tracemalloc.get_traced_memory()[0]
+        assistants = []
+        for i in range(sessions):
+            assistant = RealEstateAssistant(api_key=api_key, engine=engine)
+            for query, has_image in WORKLOAD:
+                assistant.process_query(query, random_image_b64() if has_image else None)
+            assistants.append(assistant)
+        per_session = (tracemalloc.get_traced_memory()[0] - before) / sessions
+
+        before = tracemalloc.get_traced_memory()[0]
+        transcript = Transcript(tempfile.mkdtemp(prefix="bench_transcripts_"))
+        for i in range(500):
+            transcript.append("user" if i % 2 == 0 else "assistant", "Message text " * 50)
+        per_message = (tracemalloc.get_traced_memory()[0] - before) / 500
+        transcript.delete()
+    finally:
+        tracemalloc.stop()
+    return {
+        "sessions": sessions,
+        "bytes_per_session": int(per_session),
+        "bytes_per_message": int(per_message),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif key in COMPARED_KEYS and isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    Describe metrics that got worse than the baseline by more than threshold
+
+    Returns:
+        List[str]: One line per regression
+    """
+    old, new = _flatten(baseline["results"]), _flatten(current["results"])
+    regressions = []
+    for path, value in sorted(new.items()):
+        previous = old.get(path)
+        if not previous:
+            continue
+        change = (value - previous) / previous
+        if path.endswith("throughput_rps"):
+            change = -change
+        marker = "REGRESSION" if change > threshold else ""
+        print(f"{path:60} {previous:>12} -> {value:<12} {100 * change:+7.1f}% {marker}")
+        if marker:
+            regressions.append(path)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite against a local stub Groq server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per latency scenario")
+    parser.add_argument("--concurrency", default="1,4,16", help="Concurrent session counts")
+    parser.add_argument("--sessions", type=int, default=5, help="Sessions for the memory scenario")
+    parser.add_argument("--engine", default=None, help="Execution engine: crew or lean")
+    parser.add_argument("--ttft-median", type=float, default=0.2)
+    parser.add_argument("--ttft-sigma", type=float, default=0.4)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--error-rate", type=float, default=0.2, help="429 share for the rate_limits scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", "-o", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as a regression")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    config = StubConfig(
+        ttft_median=args.ttft_median,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed,
+    )
+    api_key = "stub-benchmark"
+    # The stub has no rate limit; keep the client scheduler out of the measurements
+    scheduler.set_limits({model: {"rpm": 1e6, "tpm": 1e9} for model in MODEL_RATE_LIMITS})
+
+    results = {}
+    with StubGroqServer(config) as server:
+        os.environ["GROQ_BASE_URL"] = server.url
+        for name in scenarios:
+            print(f"Running {name}...")
+            start = time.perf_counter()
+            if name == "process_query":
+                results[name] = bench_process_query(api_key, args.requests, args.engine)
+            elif name == "image_tools":
+                results[name] = bench_image_tools(api_key, args.requests)
+            elif name == "concurrency":
+                levels = [int(level) for level in args.concurrency.split(",")]
+                results[name] = bench_concurrency(api_key, levels, args.requests * 2, args.engine)
+            elif name == "rate_limits":
+                results[name] = bench_rate_limits(args.requests, args.error_rate)
+            elif name == "streamlit":
+                results[name] = bench_streamlit(args.requests * 10)
+            elif name == "memory":
+                results[name] = bench_memory(api_key, args.sessions, args.engine)
+            print(f"  done in {time.perf_counter() - start:.1f}s")
+        stub_stats = dict(server.stats)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engine": args.engine or os.environ.get("ASSISTANT_ENGINE") or "crew",
+            "stub": vars(config),
+            "stub_stats": stub_stats,
+            "requests": args.requests,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} metrics regressed by more than {100 * args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+# benchmarks/stub_groq_server.py
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API, for
+benchmarks that should not spend API quota or depend on network noise.
+
+Time to first token follows a log-normal distribution and tokens are then
+produced at a fixed rate, for both plain and streamed (SSE) responses.
+Requests above the configured rate limit get a 429 with retry-after and
+x-ratelimit-* headers, and a share of requests can be rejected with 429 at
+random. Provider incidents can be simulated too: a share of requests can
+hang before answering, and listed models can answer every request with 503. Replies are canned but shaped like the real agents' outputs:
+route labels for router prompts, ReAct "Final Answer:" replies for CrewAI
+prompts and an inspection report for vision requests.
+
+Point the application at it with GROQ_BASE_URL, which the Groq SDK reads:
+
+    python -m benchmarks.stub_groq_server --port 8099 --ttft-median 0.3 --tokens-per-second 400
+    GROQ_BASE_URL=http://127.0.0.1:8099 GROQ_API_KEY=stub streamlit run app.py
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+# Prompt tokens charged per image part
+IMAGE_TOKENS = 1500
+
+TENANCY_ANSWER = (
+    "In most jurisdictions your landlord must return the deposit within a set period after the "
+    "tenancy ends and may only deduct for unpaid rent or damage beyond fair wear and tear. Ask "
+    "for an itemised list of deductions and use the deposit protection scheme's free dispute "
+    "service if you disagree. This is general advice, not legal counsel."
+)
+INSPECTION_REPORT = (
+    "1. Issue: water staining and peeling paint on the ceiling near the window.\n"
+    "2. Likely cause: a slow leak from the window seal or gutter above.\n"
+    "3. Recommendation: reseal the window, check the gutter and treat the area for mould.\n"
+    "4. Urgency: medium, fix within a few weeks to avoid further damage."
+)
+
+JSON_REPORT = {
+    "summary": "Water staining and peeling paint on the ceiling near the window.",
+    "location": "bedroom ceiling",
+    "issues": [{
+        "title": "Ceiling water damage",
+        "description": "Brown staining and flaking paint from a slow leak at the window seal.",
+        "severity": "Medium",
+        "category": "damp",
+        "recommended_trade": "damp_specialist",
+        "location": "ceiling above the window",
+        "recommended_action": "Reseal the window and check the gutter above.",
+    }],
+    "needs_professional_inspection": True,
+}
+
+# Keywords the stub router decides on; anything else needs clarification
+TENANCY_WORDS = ("landlord", "tenan", "deposit", "rent", "lease", "evict", "notice", "letting")
+ISSUE_WORDS = ("leak", "damp", "crack", "mould", "mold", "stain", "broken", "boiler", "ceiling")
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that cancel a request (or time out) drop the connection
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+@dataclass
+class StubConfig:
+    """
+    Behaviour of the stub server
+    """
+    ttft_median: float = 0.25
+    ttft_sigma: float = 0.4
+    tokens_per_second: float = 300.0
+    rate_limit_rpm: Optional[float] = None
+    rate_limit_tpm: Optional[float] = None
+    error_rate: float = 0.0
+    retry_after: float = 1.0
+    # Share of requests that stall for hang_seconds before answering
+    hang_rate: float = 0.0
+    hang_seconds: float = 30.0
+    # Models answering every request with 503
+    degraded_models: Tuple[str, ...] = ()
+    seed: Optional[int] = None
+
+
+def _message_text(messages: List[Dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get("text", "") for part in content if part.get("type") == "text")
+    return "\n".join(parts)
+
+
+def _image_count(messages: List[Dict]) -> int:
+    return sum(
+        1
+        for message in messages if isinstance(message.get("content"), list)
+        for part in message["content"] if part.get("type") == "image_url"
+    )
+
+
+def stub_route(prompt: str) -> str:
+    """
+    Keyword stand-in for the LLM router's decision on a routing prompt
+    """
+    if "Has image: Yes" in prompt:
+        return "issue_detection"
+    match = re.search(r"Current Query: (.*)", prompt)
+    query = (match.group(1) if match else prompt).lower()
+    if any(word in query for word in TENANCY_WORDS):
+        return "tenancy_faq"
+    if any(word in query for word in ISSUE_WORDS):
+        return "issue_detection"
+    return "ask_clarification"
+
+
+def canned_reply(payload: Dict) -> str:
+    """
+    Pick a reply shaped like what the real model returns for this prompt
+    """
+    messages = payload.get("messages", [])
+    text = _message_text(messages)
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps(JSON_REPORT)
+    if _image_count(messages):
+        reply = INSPECTION_REPORT
+    elif "Determine which specialist" in text:
+        reply = stub_route(text)
+    else:
+        reply = TENANCY_ANSWER
+    if "Final Answer:" in text:
+        # CrewAI agents parse ReAct-style replies
+        reply = f"Thought: I now know the final answer\nFinal Answer: {reply}"
+    return reply
+
+
+class _Window:
+    """
+    Sliding one-minute window of requests and tokens
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events: List = []
+
+    def admit(self, tokens: int, rpm: Optional[float], tpm: Optional[float]) -> Dict[str, float]:
+        now = time.monotonic()
+        with self.lock:
+            self.events = [(t, n) for t, n in self.events if now - t < 60]
+            used_tokens = sum(n for _, n in self.events)
+            over = (rpm is not None and len(self.events) >= rpm) or \
+                   (tpm is not None and used_tokens + tokens > tpm)
+            if not over:
+                self.events.append((now, tokens))
+                used_tokens += tokens
+            reset = 60 - (now - self.events[0][0]) if self.events else 0.0
+            return {
+                "limited": over,
+                "remaining_requests": max(0, (rpm or 14400) - len(self.events)),
+                "remaining_tokens": max(0, (tpm or 1_000_000) - used_tokens),
+                "reset": max(0.0, reset),
+            }
+
+
+class StubGroqServer:
+    """
+    Threaded HTTP server implementing POST /openai/v1/chat/completions
+    """
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StubConfig()
+        self.random = random.Random(self.config.seed)
+        self.window = _Window()
+        self.stats = {"requests": 0, "rate_limited": 0, "streamed": 0, "hung": 0, "unavailable": 0}
+        self._stats_lock = threading.Lock()
+        self._httpd = _QuietHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubGroqServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StubGroqServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _ttft(self) -> float:
+        # Log-normal with the configured median
+        return self.config.ttft_median * math.exp(self.random.gauss(0, self.config.ttft_sigma))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, body: Dict, headers: Dict[str, str]):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if self.path.rstrip("/") != COMPLETIONS_PATH:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}}, {})
+                    return
+                try:
+                    payload = json.loads(raw or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "Invalid JSON"}}, {})
+                    return
+
+                server._count("requests")
+                config = server.config
+                reply = canned_reply(payload)
+                messages = payload.get("messages", [])
+                # Images count as a fixed number of tokens, not their base64 length
+                prompt_tokens = len(_message_text(messages)) // 4 + IMAGE_TOKENS * _image_count(messages)
+                completion_tokens = max(1, len(reply) // 4)
+                window = server.window.admit(
+                    prompt_tokens + completion_tokens, config.rate_limit_rpm, config.rate_limit_tpm
+                )
+                headers = {
+                    "x-ratelimit-remaining-requests": str(int(window["remaining_requests"])),
+                    "x-ratelimit-remaining-tokens": str(int(window["remaining_tokens"])),
+                    "x-ratelimit-reset-requests": f"{window['reset']:.2f}s",
+                    "x-ratelimit-reset-tokens": f"{window['reset']:.2f}s",
+                }
+                if config.rate_limit_tpm:
+                    headers["x-ratelimit-limit-tokens"] = str(int(config.rate_limit_tpm))
+                if window["limited"] or server.random.random() < config.error_rate:
+                    server._count("rate_limited")
+                    headers["retry-after"] = str(config.retry_after)
+                    self._send_json(429, {"error": {
+                        "message": "Rate limit reached (stub server)",
+                        "type": "tokens", "code": "rate_limit_exceeded",
+                    }}, headers)
+                    return
+
+                model = payload.get("model", "stub")
+                if model in config.degraded_models:
+                    server._count("unavailable")
+                    self._send_json(503, {"error": {
+                        "message": "Service unavailable (stub server)", "type": "server_error",
+                    }}, {})
+                    return
+                if server.random.random() < config.hang_rate:
+                    server._count("hung")
+                    time.sleep(config.hang_seconds)
+
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+                created = int(time.time())
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }
+                time.sleep(server._ttft())
+
+                if payload.get("stream"):
+                    server._count("streamed")
+                    self._stream(reply, completion_id, model, created, usage, headers)
+                    return
+
+                time.sleep(completion_tokens / config.tokens_per_second)
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": "stop",
+                        "logprobs": None,
+                    }],
+                    "usage": usage,
+                }, headers)
+
+            def _stream(self, reply, completion_id, model, created, usage, headers):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.close_connection = True
+
+                def event(delta, finish_reason=None, extra=None):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason,
+                                     "logprobs": None}],
+                    }
+                    if extra:
+                        chunk.update(extra)
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                event({"role": "assistant", "content": ""})
+                # One chunk per ~4 characters, paced at the token rate
+                delay = 1.0 / server.config.tokens_per_second
+                for start in range(0, len(reply), 4):
+                    event({"content": reply[start:start + 4]})
+                    time.sleep(delay)
+                event({}, "stop", {"x_groq": {"id": completion_id, "usage": usage}})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Groq-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--ttft-median", type=float, default=StubConfig.ttft_median,
+                        help="Median seconds to first token (log-normal)")
+    parser.add_argument("--ttft-sigma", type=float, default=StubConfig.ttft_sigma,
+                        help="Log-normal sigma of time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=StubConfig.tokens_per_second)
+    parser.add_argument("--rate-limit-rpm", type=float, default=None, help="Requests per minute before 429s")
+    parser.add_argument("--rate-limit-tpm", type=float, default=None, help="Tokens per minute before 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=StubConfig.retry_after)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests that stall")
+    parser.add_argument("--hang-seconds", type=float, default=StubConfig.hang_seconds)
+    parser.add_argument("--degraded-model", action="append", default=[],
+                        help="Model answered with 503 (repeatable)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        ttft_median=args.ttft_median,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_second=args.tokens_per_second,
+        rate_limit_rpm=args.rate_limit_rpm,
+        rate_limit_tpm=args.rate_limit_tpm,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        degraded_models=tuple(args.degraded_model),
+        seed=args.seed,
+    )
+    server = StubGroqServer(config, args.host, args.port)
+    print(f"Stub Groq server on {server.url} with {asdict(config)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
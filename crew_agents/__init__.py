@@ -1,5 +1,8 @@
 from .router_agent import RouterAgentBuilder
 from .issue_agent import IssueAgentBuilder
 from .tenancy_agent import TenancyAgentBuilder
+from .engine import CrewEngine, LeanEngine, create_engine
+from .pool import AgentPool, get_agent_pool
 
-__all__ = ['RouterAgentBuilder', 'IssueAgentBuilder', 'TenancyAgentBuilder']
\ No newline at end of file
+__all__ = ['RouterAgentBuilder', 'IssueAgentBuilder', 'TenancyAgentBuilder',
+           'CrewEngine', 'LeanEngine', 'create_engine', 'AgentPool', 'get_agent_pool']
\ No newline at end of file
@@ -0,0 +1,230 @@
+# crew_agents/engine.py
+"""
+Execution engines for the text agents (router and tenancy specialist).
+
+Both engines use the prompts the *AgentBuilder classes assemble with
+tools.prompt_assembly (create_task / create_messages). "crew" runs each
+step as a one-agent, one-task CrewAI crew. "lean" sends the same prompts
+straight to the LLM, which skips per-request Task/Crew construction, the
+agent's ReAct loop and verbose stdout logging. The engine is chosen per
+deployment with the ASSISTANT_ENGINE environment variable.
+
+Given a model factory (llms), each step runs on the model tiers the
+registry lists for it ("router", "tenancy"), escalating to a larger model
+only when the reply fails validation (tools.model_registry). Without one,
+every step uses the single llm.
+"""
+import asyncio
+import os
+import queue
+
+from crewai import Crew, Task, Process
+from crewai.utilities.token_counter_callback import TokenCalcHandler
+from crew_agents.router_agent import RouterAgentBuilder, parse_route
+from crew_agents.tenancy_agent import TenancyAgentBuilder
+from tools.model_registry import accept_answer, accept_route, acascade, cascade, get_model_registry
+
+DEFAULT_ENGINE = "crew"
+
+
+class _CascadingEngine:
+    def __init__(self, llm, llms=None, registry=None):
+        self.llm = llm
+        # Model name -> chat model; None runs every step on llm
+        self.llms = llms
+        self.registry = registry
+
+    def _llm(self, model):
+        return self.llm if model is None else self.llms(model)
+
+    def _first_model(self, stage):
+        if self.llms is None:
+            return None
+        return (self.registry or get_model_registry()).model(stage)
+
+    def _cascade(self, stage, attempt, accept):
+        if self.llms is None:
+            return attempt(None)
+        return cascade(stage, attempt, accept, self.registry)
+
+    async def _acascade(self, stage, attempt, accept):
+        if self.llms is None:
+            return await attempt(None)
+        return await acascade(stage, attempt, accept, self.registry)
+
+
+class CrewEngine(_CascadingEngine):
+    """
+    Runs each step through CrewAI
+    """
+    name = "crew"
+
+    def __init__(self, llm, verbose=True, llms=None, registry=None):
+        super().__init__(llm, llms, registry)
+        self.verbose = verbose
+        # A CrewAI agent keeps per-task executor state, so it runs one task at
+        # a time. Idle agents (per step and model) are reused across sessions;
+        # concurrent requests build extra ones, so the pool grows to peak
+        # concurrency, not to the number of sessions.
+        self._builders = {"router": RouterAgentBuilder.build, "tenancy": TenancyAgentBuilder.build}
+        self._idle = {}
+        for kind in self._builders:
+            model = self._first_model(kind)
+            self._queue(kind, model).put(self._build(kind, model))
+
+    def _queue(self, kind, model):
+        # setdefault is atomic, so concurrent first uses share one queue
+        return self._idle.setdefault((kind, model), queue.SimpleQueue())
+
+    def _build(self, kind, model):
+        # CrewAI registers a token-counting callback on the agent's LLM. A
+        # private copy of the chat model wrapper (the Groq client underneath
+        # is still shared) keeps those callbacks off the shared LLM.
+        llm = self._llm(model)
+        # copy() leaves out fields marked exclude (ChatGroq's API clients, tags)
+        update = dict(llm.__dict__, callbacks=None)
+        return self._builders[kind](llm.copy(update=update))
+
+    def _kickoff(self, kind, task_spec, model=None):
+        idle = self._queue(kind, model)
+        try:
+            agent = idle.get_nowait()
+        except queue.Empty:
+            agent = self._build(kind, model)
+        try:
+            task = Task(
+                description=task_spec["description"],
+                agent=agent,
+                expected_output=task_spec["expected_output"]
+            )
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                verbose=self.verbose,
+                process=Process.sequential
+            )
+            # CrewAI 0.28 appends a TokenCalcHandler for the agent's token
+            # counter to llm.callbacks whenever the agent is validated
+            # (Agent.set_agent_executor), which Task(agent=...) and
+            # Crew(agents=[...]) both do. Give the task a fresh list with one
+            # counter and every other callback, so totals are not double
+            # counted and the list does not grow per request.
+            callbacks = agent.llm.callbacks or []
+            counters = [callback for callback in callbacks if isinstance(callback, TokenCalcHandler)]
+            agent.llm.callbacks = [
+                callback for callback in callbacks if not isinstance(callback, TokenCalcHandler)
+            ] + counters[-1:]
+            return str(crew.kickoff())
+        finally:
+            idle.put(agent)
+
+    def route(self, user_input, has_image, conversation_context=None):
+        """
+        Ask the router agent which specialist should answer
+
+        Returns:
+            str: One of 'issue_detection', 'tenancy_faq' or 'ask_clarification'
+        """
+        task_spec = RouterAgentBuilder.create_task(user_input, has_image, conversation_context)
+        return parse_route(self._cascade(
+            "router", lambda model: self._kickoff("router", task_spec, model), accept_route
+        ))
+
+    def answer_tenancy(self, user_input, conversation_context=None, passages=None):
+        """
+        Answer a tenancy question with the tenancy agent
+
+        Returns:
+            str: The answer
+        """
+        task_spec = TenancyAgentBuilder.create_task(user_input, conversation_context, passages)
+        return self._cascade(
+            "tenancy", lambda model: self._kickoff("tenancy", task_spec, model),
+            lambda answer: accept_answer(answer, passages)
+        )
+
+    async def aroute(self, user_input, has_image, conversation_context=None):
+        # CrewAI has no coroutine API; a cancelled call still runs to the end
+        # in its worker thread, only the result is dropped
+        return await asyncio.to_thread(self.route, user_input, has_image, conversation_context)
+
+    async def aanswer_tenancy(self, user_input, conversation_context=None, passages=None):
+        return await asyncio.to_thread(self.answer_tenancy, user_input, conversation_context, passages)
+
+
+class LeanEngine(_CascadingEngine):
+    """
+    Calls the LLM directly with the agents' prompts
+    """
+    name = "lean"
+
+    def route(self, user_input, has_image, conversation_context=None):
+        """
+        Ask the router prompt which specialist should answer
+
+        Returns:
+            str: One of 'issue_detection', 'tenancy_faq' or 'ask_clarification'
+        """
+        messages = RouterAgentBuilder.create_messages(user_input, has_image, conversation_context)
+        return parse_route(self._cascade(
+            "router", lambda model: self._llm(model).invoke(messages).content, accept_route
+        ))
+
+    def answer_tenancy(self, user_input, conversation_context=None, passages=None):
+        """
+        Answer a tenancy question with the tenancy prompt
+
+        Returns:
+            str: The answer
+        """
+        messages = TenancyAgentBuilder.create_messages(user_input, conversation_context, passages)
+        return self._cascade(
+            "tenancy", lambda model: self._llm(model).invoke(messages).content,
+            lambda answer: accept_answer(answer, passages)
+        )
+
+    async def aroute(self, user_input, has_image, conversation_context=None):
+        """
+        Async version of route; cancelling it aborts the model request
+        """
+        messages = RouterAgentBuilder.create_messages(user_input, has_image, conversation_context)
+
+        async def attempt(model):
+            return (await self._llm(model).ainvoke(messages)).content
+
+        return parse_route(await self._acascade("router", attempt, accept_route))
+
+    async def aanswer_tenancy(self, user_input, conversation_context=None, passages=None):
+        """
+        Async version of answer_tenancy; cancelling it aborts the model request
+        """
+        messages = TenancyAgentBuilder.create_messages(user_input, conversation_context, passages)
+
+        async def attempt(model):
+            return (await self._llm(model).ainvoke(messages)).content
+
+        return await self._acascade("tenancy", attempt, lambda answer: accept_answer(answer, passages))
+
+
+ENGINES = {CrewEngine.name: CrewEngine, LeanEngine.name: LeanEngine}
+
+
+def create_engine(llm, name=None, llms=None, registry=None):
+    """
+    Create the execution engine selected by name or ASSISTANT_ENGINE
+
+    Args:
+        llm: Chat model shared by the agents
+        name (str, optional): "crew" or "lean"
+        llms (Callable, optional): Returns the chat model for a model name;
+            enables per-step model tiers and escalation
+        registry (ModelRegistry, optional): Stage to model mapping; defaults
+            to get_model_registry()
+
+    Returns:
+        CrewEngine or LeanEngine
+    """
+    name = (name or os.environ.get("ASSISTANT_ENGINE") or DEFAULT_ENGINE).lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}', expected one of: {', '.join(ENGINES)}")
+    return ENGINES[name](llm, llms=llms, registry=registry)
@@ -2,6 +2,11 @@
 from crewai import Agent
 from langchain_core.tools import Tool
 from tools.image_tools import analyze_property_image
+from tools.image_cache import get_image_cache, image_hash_from_base64
+from tools.groq_client import call_with_retries, get_groq_client
+from tools.model_registry import accept_analysis, cascade, get_model_registry
+from tools.prompt_assembly import compact
+from utils.image_preprocessing import detect_mime_type
 
 class IssueAgentBuilder:
     @staticmethod
@@ -12,10 +17,10 @@ class IssueAgentBuilder:
         issue_detection_agent = Agent(
             role="Property Issue Detection Specialist",
             goal="Identify property issues from images and text, providing actionable troubleshooting advice",
-            backstory="""You are an experienced property inspector with decades of 
+            backstory=compact("""You are an experienced property inspector with decades of 
             experience identifying issues in residential and commercial properties.
             You can analyze both images and text queries to provide detailed property assessments.
-            You maintain context of previous observations while addressing new questions.""",
+            You maintain context of previous observations while addressing new questions."""),
             verbose=True,
             llm=llm,
             tools=[
@@ -30,8 +35,26 @@ class IssueAgentBuilder:
         return issue_detection_agent
     
     @staticmethod
-    def create_task(image_data=None, user_input=None):
+    def create_task(image_data=None, user_input=None, conversation_context=None):
+        """
+        Create an issue detection task
+        
+        Args:
+            image_data (str or list, optional): Base64 image, or several images
+                of the same issue to be covered by one consolidated report
+            user_input (str, optional): User's text query
+            conversation_context (str, optional): Budgeted conversation history
+        """
         context = []
+        images = [image_data] if isinstance(image_data, str) else list(image_data or [])
+        
+        if conversation_context:
+            context.append({
+                "type": "text",
+                "content": conversation_context,
+                "description": "Previous conversation with the user",
+                "expected_output": "Background for the current query"
+            })
         
         # Add text input to context if provided
         if user_input:
@@ -42,17 +65,42 @@ class IssueAgentBuilder:
                 "expected_output": "Analysis of the text query"
             })
         
-        # Add image data to context if provided
-        if image_data:
+        # Images are referenced, never inlined: base64 in a text prompt costs
+        # thousands of tokens and the model cannot see it as an image. The
+        # payloads travel separately under "images" for the vision call.
+        for index, data in enumerate(images, 1):
             context.append({
                 "type": "image",
-                "content": image_data,
-                "description": "Analyze this image for property issues, damage, or maintenance problems",
+                "content": f"[Image {index} of {len(images)}, attached to the vision request]",
+                "description": (
+                    "Analyze this image for property issues, damage, or maintenance problems"
+                    if len(images) == 1 else
+                    f"Image {index} of {len(images)}: analyze for property issues, damage, or maintenance problems"
+                ),
                 "expected_output": "Detailed visual analysis of property issues"
             })
         
         # Determine the appropriate task description and model based on input types
-        if image_data and user_input:
+        image_data = images
+        if len(images) > 1:
+            # Case: Several images of the same issue
+            description = f"""Examine all {len(images)} images together, treating them as different
+            angles of the same property, and produce ONE consolidated report to:
+            1. Identify visible property issues or damage (reference image numbers)
+            2. Address specific concerns mentioned in the text, if any
+            3. Assess the severity of the problems
+            4. Suggest potential solutions or next steps
+            5. Recommend if professional inspection is needed"""
+            
+            expected_output = """Single consolidated analysis including:
+            - Problem identification across all images
+            - Severity assessment
+            - Recommended actions
+            - Safety concerns (if any)"""
+            
+            model = get_model_registry().model("vision")  # Vision-capable model
+            
+        elif image_data and user_input:
             # Case: Both image and text provided
             description = """Examine both the image and text query to:
             1. Identify visible property issues or damage
@@ -67,7 +115,7 @@ class IssueAgentBuilder:
             - Recommended actions
             - Safety concerns (if any)"""
             
-            model = "meta-llama/llama-4-maverick-17b-128e-instruct"  # Vision-capable model
+            model = get_model_registry().model("vision")  # Vision-capable model
             
         elif image_data and not user_input:
             # Case: Only image provided
@@ -83,7 +131,7 @@ class IssueAgentBuilder:
             - Recommended actions
             - Safety concerns (if any)"""
             
-            model = "meta-llama/llama-4-maverick-17b-128e-instruct"  # Vision-capable model
+            model = get_model_registry().model("vision")  # Vision-capable model
             
         elif not image_data and user_input:
             # Case: Only text provided
@@ -99,94 +147,111 @@ class IssueAgentBuilder:
             - Any additional insights based on the text
             - Relevant property maintenance advice"""
             
-            model = "meta-llama/llama-3.3-70b-versatile"  # Text-optimized model
+            model = get_model_registry().model("issue_text")  # Text-optimized model
             
         else:
             # Case: No input provided (fallback)
             description = """Please provide either a property image or a text query about property issues."""
             expected_output = "Prompt for user to provide input"
-            model = "meta-llama/llama-3.3-70b-versatile"  # Default model
+            model = get_model_registry().model("issue_text")  # Default model
         
         return {
-            "description": description,
+            "description": compact(description),
             "context": context,
-            "expected_output": expected_output,
-            "model": model
+            "expected_output": compact(expected_output),
+            "model": model,
+            "images": images
         }
     
-    def analyze_image(image_data):
-        from groq import Groq
-        import time
-        
-        client = Groq(api_key=api_key)
-        max_retries = 3
-        retry_delay = 5  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                completion = client.chat.completions.create(
-                    model="meta-llama/llama-4-maverick-17b-128e-instruct",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": """You are an expert property inspector. Provide only factual observations and professional recommendations. 
-                            Focus exclusively on:
-                            - Precise damage descriptions
-                            - Technical assessments
-                            - Professional recommendations
-                            - Safety implications
-                            
-                            Do not include any meta-commentary, thoughts about tasks, or personal reflections."""
-                        },
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": """Property Inspection Report:
+    @staticmethod
+    def build_inspection_messages(image_data, mime_type=None):
+        """
+        Build the vision messages for a full property inspection report
+        """
+        mime_type = mime_type or detect_mime_type(image_data)
+        return [
+            {
+                "role": "system",
+                "content": compact("""You are an expert property inspector. Provide only factual observations and professional recommendations. 
+                Focus exclusively on:
+                - Precise damage descriptions
+                - Technical assessments
+                - Professional recommendations
+                - Safety implications
+
+                Do not include any meta-commentary, thoughts about tasks, or personal reflections.""")
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": compact("""Property Inspection Report:
 
-                                    1. Water Damage Assessment:
-                                       - Location and extent
-                                       - Active leak indicators
-                                       - Source identification
-                                       - Severity classification
+                        1. Water Damage Assessment:
+                           - Location and extent
+                           - Active leak indicators
+                           - Source identification
+                           - Severity classification
 
-                                    2. Structural Evaluation:
-                                       - Wall/ceiling conditions
-                                       - Structural integrity
-                                       - Support system status
+                        2. Structural Evaluation:
+                           - Wall/ceiling conditions
+                           - Structural integrity
+                           - Support system status
 
-                                    3. Environmental Issues:
-                                       - Mold/mildew presence
-                                       - Moisture assessment
-                                       - Air quality factors
+                        3. Environmental Issues:
+                           - Mold/mildew presence
+                           - Moisture assessment
+                           - Air quality factors
 
-                                    4. Safety Analysis:
-                                       - Critical risks
-                                       - Structural concerns
-                                       - Health hazards
+                        4. Safety Analysis:
+                           - Critical risks
+                           - Structural concerns
+                           - Health hazards
 
-                                    5. Action Items:
-                                       - Required interventions
-                                       - Professional services needed
-                                       - Priority level"""
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{image_data}"
-                                    }
-                                }
-                            ]
+                        5. Action Items:
+                           - Required interventions
+                           - Professional services needed
+                           - Priority level""")
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{image_data}"
                         }
-                    ],
-                    temperature=0.1,
-                    max_completion_tokens=2048,
-                    top_p=1
-                )
-                return completion.choices[0].message.content
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                else:
-                    return f"Error analyzing image: {str(e)}"
\ No newline at end of file
+                    }
+                ]
+            }
+        ]
+    
+    @staticmethod
+    def analyze_image(image_data, api_key):
+        # Reuse the analysis of a perceptually identical image
+        image_hash = image_hash_from_base64(image_data)
+        if image_hash is not None:
+            cached = get_image_cache().get(image_hash, namespace="inspection_report")
+            if cached is not None:
+                return cached
+        
+        client = get_groq_client(api_key)
+        
+        messages = IssueAgentBuilder.build_inspection_messages(image_data)
+        
+        def attempt(model):
+            # Rate limits and transient errors are retried with jittered backoff
+            completion = call_with_retries(lambda: client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.1,
+                max_completion_tokens=2048,
+                top_p=1
+            ))
+            return completion.choices[0].message.content
+        
+        try:
+            result = cascade("inspection", attempt, accept_analysis)
+            if image_hash is not None:
+                get_image_cache().put(image_hash, None, result, namespace="inspection_report")
+            return result
+        except Exception as e:
+            return f"Error analyzing image: {str(e)}"
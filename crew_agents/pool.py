@@ -0,0 +1,122 @@
+# crew_agents/pool.py
+"""
+Components shared by every assistant session.
+
+The chat models (one per registry model), execution engine and its CrewAI
+agents, local router, answer cache, law index, report store and the
+coalescing of identical in-flight requests are immutable or internally
+synchronized, so one AgentPool per API key and
+engine serves any number of sessions. RealEstateAssistant only adds
+per-session conversation memory.
+"""
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from langchain_groq import ChatGroq
+
+from crew_agents.engine import DEFAULT_ENGINE, create_engine
+from tools.answer_cache import SemanticAnswerCache, get_answer_cache
+from tools.groq_client import AsyncCompletions, Completions
+from tools.intent_classifier import RoutingLog, load_default_classifier
+from tools.issue_reports import get_report_store
+from tools.law_retrieval import load_default_index
+from tools.model_registry import ModelRegistry, get_model_registry
+from utils.single_flight import SingleFlight
+
+
+class AgentPool:
+    """
+    Shareable, session-independent parts of the assistant
+    """
+
+    def __init__(self, api_key: str, engine=None, intent_classifier=None, routing_log_path: Optional[str] = None,
+                 answer_cache: Optional[SemanticAnswerCache] = None, law_index=None, report_store=None,
+                 registry: Optional[ModelRegistry] = None):
+        """
+        Args:
+            api_key (str): Groq API key
+            engine (str or engine, optional): Engine name or instance; defaults
+                to ASSISTANT_ENGINE
+            intent_classifier (IntentClassifier, optional): Local fast-path router;
+                trained from the routing log when not given
+            routing_log_path (str, optional): JSONL routing log (ROUTING_LOG_PATH)
+            answer_cache (SemanticAnswerCache, optional): Tenancy answer cache;
+                defaults to the process-wide get_answer_cache()
+            law_index (LawIndex, optional): Retrieval index (TENANCY_LAW_INDEX)
+            report_store (IssueReportStore, optional): Issue report store (ISSUE_REPORT_DB)
+            registry (ModelRegistry, optional): Stage to model tiers; defaults
+                to get_model_registry()
+        """
+        self.api_key = api_key
+        self.registry = registry or get_model_registry()
+        self._llms: Dict[str, ChatGroq] = {}
+        self._llms_lock = threading.Lock()
+        # Default text model; steps that cascade pick theirs through llm_for
+        self.llm = self.llm_for(self.registry.model("tenancy"))
+        if engine is None or isinstance(engine, str):
+            engine = create_engine(self.llm, engine, llms=self.llm_for, registry=self.registry)
+        self.engine = engine
+
+        routing_log_path = routing_log_path or os.environ.get("ROUTING_LOG_PATH")
+        self.intent_classifier = intent_classifier or load_default_classifier(routing_log_path)
+        self.routing_log = RoutingLog(routing_log_path) if routing_log_path else None
+        # Empty caches, indexes and stores are falsy (__len__), so test for None
+        self.answer_cache = answer_cache if answer_cache is not None else get_answer_cache()
+        self.law_index = law_index if law_index is not None else load_default_index()
+        self.report_store = report_store if report_store is not None else get_report_store()
+        # Sessions asking the same thing at the same time share one model run
+        self.single_flight = SingleFlight()
+
+    def llm_for(self, model: str) -> ChatGroq:
+        """
+        The shared chat model for a model name, created on first use
+        """
+        with self._llms_lock:
+            llm = self._llms.get(model)
+            if llm is None:
+                # The pooled, rate-limit scheduled Groq clients are shared with
+                # the image tools, and so is their retry policy (call_with_retries),
+                # which fails at once on an open circuit or a spent deadline
+                llm = ChatGroq(
+                    api_key=self.api_key,
+                    model_name=model,
+                    client=Completions(self.api_key),
+                    async_client=AsyncCompletions(self.api_key)
+                )
+                self._llms[model] = llm
+            return llm
+
+
+_pools: Dict[Tuple[str, str], AgentPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_agent_pool(api_key: str, engine: Optional[str] = None) -> AgentPool:
+    """
+    Return the process-wide pool for an API key and engine name, creating it
+    on first use
+
+    Args:
+        api_key (str): Groq API key
+        engine (str, optional): "crew" or "lean"; defaults to ASSISTANT_ENGINE
+
+    Returns:
+        AgentPool: The shared pool
+    """
+    name = (engine or os.environ.get("ASSISTANT_ENGINE") or DEFAULT_ENGINE).lower()
+    key = (api_key, name)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = AgentPool(api_key, engine=name)
+            _pools[key] = pool
+        return pool
+
+
+def clear_agent_pools() -> None:
+    """
+    Forget the shared pools, e.g. after changing configuration
+    """
+    with _pools_lock:
+        _pools.clear()
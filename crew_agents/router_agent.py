@@ -1,43 +1,84 @@
 # crew_agents/router_agent.py
 from crewai import Agent
-from tools.text_tools import build_query_context
+from tools.text_tools import get_conversation_context
+from tools.intent_classifier import ASK_CLARIFICATION, ROUTES
+from tools.prompt_assembly import PromptBuilder, compact
+
+ROLE = "Query Router"
+GOAL = "Accurately categorize and route user queries to the right specialist agent"
+BACKSTORY = compact("""You are an expert at understanding user intentions and determining 
+            the appropriate specialist to handle their real estate questions. You excel at 
+            analyzing both text and detecting when visual analysis is needed.""")
+PERSONA = f"You are a {ROLE}. {BACKSTORY}\nYour goal: {GOAL}"
+INSTRUCTIONS = """Determine which specialist should handle the query below. Respond with ONLY one label:
+            issue_detection: property issues, maintenance problems, visual inspection, or an image is attached
+            tenancy_faq: tenancy laws, rental agreements, landlord/tenant rights or rental processes
+            ask_clarification: the query is unclear"""
+EXPECTED_OUTPUT = "Exactly one of: issue_detection, tenancy_faq, ask_clarification"
+
+def parse_route(text):
+    """
+    Extract the route label from a router reply, tolerating quotes or extra
+    words; anything unrecognized asks for clarification
+    """
+    text = str(text).lower()
+    for route in ROUTES:
+        if route in text:
+            return route
+    return ASK_CLARIFICATION
 
 class RouterAgentBuilder:
     @staticmethod
     def build(llm):
         return Agent(
-            role="Query Router",
-            goal="Accurately categorize and route user queries to the right specialist agent",
-            backstory="""You are an expert at understanding user intentions and determining 
-            the appropriate specialist to handle their real estate questions. You excel at 
-            analyzing both text and detecting when visual analysis is needed.""",
+            role=ROLE,
+            goal=GOAL,
+            backstory=BACKSTORY,
             verbose=True,
             llm=llm
         )
     
     @staticmethod
-    def create_task(user_input, has_image=False, conversation_history=None):
-        if conversation_history is None:
-            conversation_history = []
-            
-        context = build_query_context(user_input, conversation_history)
+    def build_prompt(user_input, has_image=False, conversation_history=None, persona=False):
+        """
+        Assemble the routing prompt: static instructions, then the history
+        and the query
         
+        conversation_history may be a list of messages or context already
+        formatted within a token budget (ConversationMemory.get_context).
+        persona adds the agent's role and backstory for direct LLM calls
+        (a CrewAI agent supplies its own).
+        """
+        if isinstance(conversation_history, str):
+            history = conversation_history
+        else:
+            history = get_conversation_context(conversation_history or [])
+        builder = PromptBuilder("router")
+        if persona:
+            builder.static("persona", PERSONA)
+        return (builder
+                .static("instructions", INSTRUCTIONS)
+                .static("output", f"Expected output: {EXPECTED_OUTPUT}" if persona else None)
+                .add("history", history, header="Previous Context:")
+                .add("query", f"Current Query: {user_input}\nHas image: {'Yes' if has_image else 'No'}",
+                     dedupe=False)
+                .build())
+    
+    @staticmethod
+    def create_task(user_input, has_image=False, conversation_history=None):
+        """
+        Create a routing task
+        """
+        prompt = RouterAgentBuilder.build_prompt(user_input, has_image, conversation_history)
         return {
-            "description": f"""
-            Determine which specialist should handle this query:
-            {context}
-            Has image: {'Yes' if has_image else 'No'}
-            
-            If the query is about property issues, maintenance problems, visual inspection,
-            or if there's an image attached, respond with ONLY "issue_detection".
-            
-            If the query is about tenancy laws, rental agreements, landlord/tenant rights,
-            or rental processes, respond with ONLY "tenancy_faq".
-            
-            If unclear, respond with ONLY "ask_clarification".
-            
-            Your response MUST be exactly one of these three options, with no additional text.
-            """,
-            "expected_output": "One of three options: 'issue_detection', 'tenancy_faq', or 'ask_clarification'"
+            "description": prompt.text,
+            "expected_output": EXPECTED_OUTPUT
         }
-        
\ No newline at end of file
+    
+    @staticmethod
+    def create_messages(user_input, has_image=False, conversation_history=None):
+        """
+        Build chat messages equivalent to the routing task, for calling the
+        LLM directly; the system message is the same for every request
+        """
+        return RouterAgentBuilder.build_prompt(user_input, has_image, conversation_history, persona=True).messages()
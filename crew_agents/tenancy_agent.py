@@ -1,8 +1,30 @@
 # crew_agents/tenancy_agent.py
 from crewai import Agent
 from langchain_core.tools import Tool
+from tools.prompt_assembly import PromptBuilder, compact
 from tools.text_tools import extract_location
 
+ROLE = "Tenancy Law Specialist"
+GOAL = "Provide accurate information about tenancy laws and rental processes"
+BACKSTORY = compact("""You are a knowledgeable expert on tenant rights, rental agreements, 
+            and landlord-tenant relationships. You have years of experience in real estate law
+            and can provide guidance on common tenancy issues, explain relevant laws,
+            and offer practical advice on navigating rental processes.""")
+PERSONA = f"You are a {ROLE}. {BACKSTORY}\nYour goal: {GOAL}"
+INSTRUCTIONS = """Answer the tenancy-related question below.
+            If it mentions a specific location, give location-specific advice. If not, note that laws
+            vary by location and give general guidance that applies in most jurisdictions.
+            Where law excerpts are provided, base your answer on them and cite them by number, e.g. [1].
+            
+            Your response should:
+            1. Directly address the user's question
+            2. Explain relevant legal concepts in simple terms
+            3. Suggest practical next steps if applicable
+            4. Include any important disclaimers (e.g., "This is general advice, not legal counsel")
+            
+            Keep your response focused and helpful."""
+EXPECTED_OUTPUT = "A helpful, accurate answer to the tenancy question with appropriate context and disclaimers"
+
 class TenancyAgentBuilder:
     @staticmethod
     def build(llm):
@@ -10,12 +32,9 @@ class TenancyAgentBuilder:
         Build and return the Tenancy FAQ Agent
         """
         tenancy_expert_agent = Agent(
-            role="Tenancy Law Specialist",
-            goal="Provide accurate information about tenancy laws and rental processes",
-            backstory="""You are a knowledgeable expert on tenant rights, rental agreements, 
-            and landlord-tenant relationships. You have years of experience in real estate law
-            and can provide guidance on common tenancy issues, explain relevant laws,
-            and offer practical advice on navigating rental processes.""",
+            role=ROLE,
+            goal=GOAL,
+            backstory=BACKSTORY,
             verbose=True,
             llm=llm,
             tools=[
@@ -30,26 +49,50 @@ class TenancyAgentBuilder:
         return tenancy_expert_agent
     
     @staticmethod
-    def create_task(user_input):
+    def build_prompt(user_input, conversation_context=None, passages=None, persona=False):
+        """
+        Assemble the tenancy prompt: static instructions, then the history,
+        retrieved passages and the question
+        
+        Args:
+            user_input (str): The tenancy question
+            conversation_context (str, optional): Budgeted conversation history
+            passages (list, optional): Retrieved law passages (tools.law_retrieval.Passage)
+                to ground the answer in
+            persona (bool): Add the agent's role and backstory, for direct LLM
+                calls (a CrewAI agent supplies its own)
+        """
+        excerpts = "\n\n".join(
+            f"[{number}] ({passage.source})\n{passage.text}"
+            for number, passage in enumerate(passages or [], 1)
+        )
+        builder = PromptBuilder("tenancy")
+        if persona:
+            builder.static("persona", PERSONA)
+        return (builder
+                .static("instructions", INSTRUCTIONS)
+                .static("output", f"Expected output: {EXPECTED_OUTPUT}" if persona else None)
+                .add("history", conversation_context, header="Previous conversation (for context only):")
+                .add("passages", excerpts, header="Relevant law and guidance:")
+                .add("question", f"Question: {user_input}", dedupe=False)
+                .build())
+    
+    @staticmethod
+    def create_task(user_input, conversation_context=None, passages=None):
         """
         Create a tenancy question task
         """
+        prompt = TenancyAgentBuilder.build_prompt(user_input, conversation_context, passages)
         return {
-            "description": f"""
-            Answer the following tenancy-related question:
-            {user_input}
-            
-            First, check if a specific location is mentioned. If so, provide location-specific advice.
-            If not, note that laws vary by location and provide general guidance that applies
-            in most jurisdictions.
-            
-            Your response should:
-            1. Directly address the user's question
-            2. Explain relevant legal concepts in simple terms
-            3. Suggest practical next steps if applicable
-            4. Include any important disclaimers (e.g., "This is general advice, not legal counsel")
-            
-            Keep your response focused and helpful.
-            """,
-            "expected_output": "A helpful, accurate answer to the tenancy question with appropriate context and disclaimers"
-        }
\ No newline at end of file
+            "description": prompt.text,
+            "expected_output": EXPECTED_OUTPUT
+        }
+    
+    @staticmethod
+    def create_messages(user_input, conversation_context=None, passages=None):
+        """
+        Build chat messages equivalent to the tenancy task, for calling the
+        LLM directly (e.g. when streaming); the system message is the same
+        for every request
+        """
+        return TenancyAgentBuilder.build_prompt(user_input, conversation_context, passages, persona=True).messages()
@@ -1,131 +1,679 @@
 # main.py
 import os
-from typing import Dict, Any, Optional  # Add typing imports
-from crewai import Crew, Task, Process
-from langchain_groq import ChatGroq
-from crew_agents.router_agent import RouterAgentBuilder
-from crew_agents.issue_agent import IssueAgentBuilder
+import time
+import asyncio
+import dataclasses
+from typing import Dict, Any, Optional, Iterator  # Add typing imports
+from crewai import Task
 from crew_agents.tenancy_agent import TenancyAgentBuilder
+from crew_agents.pool import AgentPool, get_agent_pool
+from tools.intent_classifier import route_by_rules
+from tools.text_tools import extract_jurisdiction
+from tools.image_tools import (
+    ERROR_PREFIX,
+    aanalyze_property_image,
+    aanalyze_property_report,
+    analyze_property_report,
+    stream_property_image_analysis,
+)
+from tools.groq_client import CircuitOpenError, unwrap_error
+from tools.issue_reports import render_report
+from tools.tiled_inspection import ainspect_tiled
+from tools.conversation_memory import ConversationMemory
+from utils.async_utils import run_sync
+from utils.deadlines import DeadlineExceeded, deadline_scope, run_with_deadline
+from utils.helpers import hamming_distance
+from utils.image_triage import DUPLICATE_DISTANCE, RETAKE_MESSAGES, triage_image
+from utils.metrics import metrics
+from utils.single_flight import request_fingerprint
+from utils.tracing import tracer
+
+NO_IMAGE_MESSAGE = "To help identify property issues, please upload an image of the problem area."
+
+DEADLINE_MESSAGE = ("Sorry, this is taking longer than expected, so I stopped waiting. "
+                    "Please try again in a moment.")
+
+SERVICE_UNAVAILABLE_MESSAGE = ("Sorry, the AI service is having problems right now. "
+                               "Please try again in a minute.")
+
+# Time budget for one query, from routing to the specialist's answer
+DEFAULT_DEADLINE_SECONDS = 30.0
+
+CLARIFICATION_MESSAGE = """I'm not sure if you're asking about:
+                1. A physical property issue (please upload an image if applicable)
+                2. Tenancy or rental agreement questions
+                
+                Could you please clarify?"""
+
+def normalize_images(image):
+    """
+    Accept one base64 image or a list of them; returns None, a single image
+    string, or a list of two or more images
+    """
+    if isinstance(image, (list, tuple)):
+        images = [data for data in image if data]
+        if not images:
+            return None
+        return images[0] if len(images) == 1 else images
+    return image or None
 
 class RealEstateAssistant:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, router_confidence_threshold=0.8, intent_classifier=None,
+                 routing_log_path=None, answer_cache=None, context_token_budget=800, memory=None,
+                 law_index=None, retrieval_top_k=4, engine=None, report_store=None, pool=None,
+                 routing_rules=True, speculative_routing=None, image_triage=True, deadline_seconds=None,
+                 coalesce_requests=True):
         # Set up API key
         self.api_key = api_key or os.environ.get("GROQ_API_KEY")
         if not self.api_key:
             raise ValueError("Groq API key is required.")
         
-        # Initialize LLM instances with specific models
-        self.llm = ChatGroq(
-            api_key=self.api_key,
-            model_name="meta-llama/llama-4-maverick-17b-128e-instruct"  # Updated model
-        )
+        # LLM, engine agents, local router, caches and stores are shared by
+        # every session with the same API key and engine; a private pool is
+        # built only when this assistant is given its own components
+        if pool is None:
+            custom = (any(part is not None for part in (intent_classifier, routing_log_path, answer_cache,
+                                                        law_index, report_store))
+                      or not (engine is None or isinstance(engine, str)))
+            if custom:
+                pool = AgentPool(self.api_key, engine=engine, intent_classifier=intent_classifier,
+                                 routing_log_path=routing_log_path, answer_cache=answer_cache,
+                                 law_index=law_index, report_store=report_store)
+            else:
+                pool = get_agent_pool(self.api_key, engine)
+        self.pool = pool
+        self.llm = pool.llm
+        self.engine = pool.engine
+        self.intent_classifier = pool.intent_classifier
+        self.routing_log = pool.routing_log
+        self.answer_cache = pool.answer_cache
+        self.law_index = pool.law_index
+        self.report_store = pool.report_store
+        
+        # Deterministic rules (an attached image always means issue detection)
+        # and the local fast-path router; the LLM router is only used below the
+        # threshold. Speculative routing (SPECULATIVE_ROUTING) starts the likely
+        # specialist alongside the LLM router, trading tokens for latency.
+        self.routing_rules = routing_rules
+        self.router_confidence_threshold = router_confidence_threshold
+        if speculative_routing is None:
+            speculative_routing = os.environ.get("SPECULATIVE_ROUTING", "").lower() in ("1", "true", "yes")
+        self.speculative_routing = speculative_routing
+        self.retrieval_top_k = retrieval_top_k
+        
+        # Local checks that turn away dark, blurry, repeated or non-property
+        # images before any vision call; hashes of the conversation's analyzed
+        # images catch re-sent photos
+        self.image_triage = image_triage
+        self._image_hashes = []
+        
+        # Every query gets a time budget (QUERY_DEADLINE_SECONDS, 0 for none);
+        # routing, specialists and Groq calls stop when it runs out
+        if deadline_seconds is None:
+            deadline_seconds = float(os.environ.get("QUERY_DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS))
+        self.deadline_seconds = deadline_seconds or None
+        
+        # Identical requests in flight at the same time (same text, images,
+        # route, model and conversation context) share one model run across
+        # the pool's sessions
+        self.coalesce_requests = coalesce_requests
+        
+        # Initialize conversation memory: bounded recent turns plus a rolling
+        # summary; every agent prompt gets at most context_token_budget tokens
+        self.context_token_budget = context_token_budget
+        self.memory = memory or ConversationMemory(summarizer=self._summarize)
+    
+    @property
+    def conversation_history(self):
+        """
+        Recent conversation turns, oldest first
+        """
+        return self.memory.messages
+    
+    def _triage_images(self, image, triage=None):
+        """
+        Triage uploaded images before the vision call
+        
+        Args:
+            image (str or list): Normalized image data
+            triage (list, optional): TriageResult per image, computed by the
+                caller from the original uploads; only the check against
+                photos already analyzed in this conversation is added here
         
-        # Build agents
-        self.router_agent = RouterAgentBuilder.build(self.llm)
-        self.issue_agent = IssueAgentBuilder.build(self.llm, self.api_key)
-        self.tenancy_agent = TenancyAgentBuilder.build(self.llm)
+        Returns:
+            tuple: Images worth analyzing (None if none are), a note for the
+                user about the rest (or None), the usable images' hashes, and
+                whether every image is one already analyzed in this
+                conversation (then there is no note)
+        """
+        images = [image] if isinstance(image, str) else image
+        if triage is not None and len(triage) != len(images):
+            raise ValueError("triage must hold one result per image")
+        kept, notes, hashes, repeated = [], [], [], 0
+        for number, data in enumerate(images, 1):
+            if triage is None:
+                result = triage_image(data, self._image_hashes)
+            else:
+                result = triage[number - 1]
+                if result.usable and any(hamming_distance(result.dhash, seen) <= DUPLICATE_DISTANCE
+                                         for seen in self._image_hashes):
+                    metrics.increment("image.triage.rejected.duplicate")
+                    result = dataclasses.replace(result, reason="duplicate")
+            repeated += result.reason == "duplicate"
+            if result.usable and any(hamming_distance(result.dhash, seen) <= DUPLICATE_DISTANCE for seen in hashes):
+                # The same photo twice in one upload: analyze it once
+                metrics.increment("image.triage.rejected.duplicate")
+            elif result.usable:
+                kept.append(data)
+                hashes.append(result.dhash)
+            elif len(images) == 1:
+                notes.append(result.message)
+            else:
+                notes.append(f"Photo {number}: {result.message}")
+        if repeated == len(images):
+            # Nothing new was uploaded, e.g. the app re-sent its attachment
+            # with a follow-up question
+            return None, None, [], True
+        return normalize_images(kept), "\n".join(notes) or None, hashes, False
+    
+    def _error_response(self, error, deadline=None):
+        """
+        Reply for a query that failed; a hung or failing provider gets a
+        plain message rather than a stack of SDK errors
+        """
+        tracer.current_span().set_attribute("error", str(error))
+        cause = unwrap_error(error)
+        if isinstance(cause, DeadlineExceeded) or (deadline is not None and deadline.expired):
+            metrics.increment("query.deadline_exceeded")
+            return DEADLINE_MESSAGE
+        if isinstance(cause, CircuitOpenError):
+            metrics.increment("query.circuit_open")
+            return SERVICE_UNAVAILABLE_MESSAGE
+        return f"I encountered an error while processing your request. Please try again. Error: {str(error)}"
+    
+    async def _coalesced(self, route, stage, user_input, image, conversation_context, call):
+        """
+        Await call(), or join the identical request another session started
+        
+        Args:
+            route (str): Route or step, part of the fingerprint
+            stage (str): Registry stage whose first model answers
+            call (Callable): Starts the model run when no identical one is in flight
+        """
+        if not self.coalesce_requests:
+            return await call()
+        key = request_fingerprint(user_input, image, route, self.pool.registry.model(stage), conversation_context)
+        return await self.pool.single_flight.do(key, call, route)
+    
+    def _coalesced_stream(self, route, stage, user_input, image, conversation_context, stream):
+        """
+        Iterate stream(), or join the identical stream another session started
         
-        # Initialize conversation memory
-        self.conversation_history = []
+        Args:
+            route (str): Route or step, part of the fingerprint
+            stage (str): Registry stage whose first model answers
+            stream (Callable): Returns the chunk iterator when no identical
+                stream is in flight
+        """
+        if not self.coalesce_requests:
+            return stream()
+        key = request_fingerprint(user_input, image, route, self.pool.registry.model(stage), conversation_context)
+        return self.pool.single_flight.stream(key, stream, route)
     
-    def process_query(self, user_input, image=None):
+    def _coalesced_call(self, route, stage, user_input, image, conversation_context, call):
+        """
+        Synchronous counterpart of _coalesced
+        """
+        if not self.coalesce_requests:
+            return call()
+        key = request_fingerprint(user_input, image, route, self.pool.registry.model(stage), conversation_context)
+        return self.pool.single_flight.call(key, call, route)
+    
+    def _summarize(self, prompt):
+        # Runs on the memory's background executor, off the request path, on
+        # the registry's summary model
+        return self.pool.llm_for(self.pool.registry.model("summary")).invoke(prompt).content
+    
+    def process_query(self, user_input, image=None, property_id=None, triage=None):
         """
         Process a user query through the multi-agent system
         
+        Thin synchronous wrapper around aprocess_query.
+        
+        Args:
+            user_input (str): User's text query
+            image (str or list, optional): Base64 encoded image data, or a list
+                of images analyzed together in one consolidated report
+            property_id (str, optional): Property the images show, stored
+                with the issue report
+            triage (list, optional): TriageResult per image from
+                utils.image_triage.triage_image, run on the original uploads.
+                Preprocessing strips the EXIF data the selfie and screenshot
+                checks use, so callers that preprocess should triage first;
+                without it the images passed here are triaged
+            
+
+        Returns:
+            str: Response from the appropriate agent
+        """
+        return run_sync(self.aprocess_query(user_input, image, property_id, triage))
+    
+    async def aprocess_query(self, user_input, image=None, property_id=None, triage=None):
+        """
+        Async version of process_query
+        
+        The vision call is awaited natively, as are engine stages on the lean
+        engine; CrewAI has no coroutine API, so the crew engine runs them
+        with asyncio.to_thread. With speculative routing, a query the local
+        router is unsure about starts the likely specialist while the LLM
+        router runs, and cancels it if the router decides otherwise.
+        Model runs are shared with identical requests other sessions have
+        in flight (see _coalesced); cancelling this query only stops it
+        waiting for them.
+        Photos already analyzed in this conversation are dropped before
+        routing, so a follow-up question sent with the same attachment is
+        answered as text.
+        
         Args:
             user_input (str): User's text query
-            image (str, optional): Base64 encoded image data
+            image (str or list, optional): Base64 encoded image data, or a list
+                of images analyzed together in one consolidated report
+            property_id (str, optional): Property the images show
+            triage (list, optional): TriageResult per image (see process_query)
             
         Returns:
             str: Response from the appropriate agent
         """
-        # Track conversation
-        self.conversation_history.append({"role": "user", "content": user_input})
+        # Track conversation; context is built from the turns before this one
+        conversation_context = self.memory.get_context(self.context_token_budget)
+        self.memory.add("user", user_input)
         
         # Determine if there's an image
+        image = normalize_images(image)
         has_image = image is not None
         
-        # Create routing task
-        routing_task_spec = RouterAgentBuilder.create_task(user_input, has_image)
-        routing_task = Task(
-            description=routing_task_spec["description"],
-            agent=self.router_agent,
-            expected_output=routing_task_spec["expected_output"]
-        )
-        
-        # Execute routing task
-        routing_crew = Crew(
-            agents=[self.router_agent],
-            tasks=[routing_task],
-            verbose=True,
-            process=Process.sequential
-        )
-        
-        try:
+        speculation = None
+        
+        def speculate(likely_route):
+            # Text-only queries only do model work on the tenancy branch
+            nonlocal speculation
+            if self.speculative_routing and likely_route == "tenancy_faq":
+                metrics.increment("router.speculation.started")
+                speculation = asyncio.create_task(
+                    self._aanswer_tenancy(user_input, conversation_context, speculative=True)
+                )
+                # A speculation that is cancelled or fails unused is never
+                # awaited; retrieve its outcome so it is not logged
+                speculation.add_done_callback(lambda task: task.cancelled() or task.exception())
+        
+        async def respond():
+            nonlocal image, speculation
+            note, hashes, repeated = None, [], False
+            routed_image = has_image
+            if has_image and self.image_triage:
+                image, note, hashes, repeated = await asyncio.to_thread(self._triage_images, image, triage)
+                # Photos already analyzed add nothing; the text is routed alone
+                routed_image = not repeated
+            
             # Get routing result
-            route_result = routing_crew.kickoff()
-            agent_type = route_result.lower().strip()
+            agent_type = await self._aroute(user_input, routed_image, conversation_context, speculate)
+            tracer.current_span().set_attribute("route", agent_type)
+            if speculation is not None and agent_type != "tenancy_faq":
+                # The router disagreed with the classifier's guess
+                metrics.increment("router.speculation.cancelled")
+                speculation.cancel()
+                speculation = None
             
             # Process based on agent type
             if agent_type == "issue_detection":
-                if has_image:
-                    # Create and execute issue detection task
-                    issue_task_spec = IssueAgentBuilder.create_task(image, user_input)
-                    issue_task = Task(
-                        description=issue_task_spec["description"],
-                        agent=self.issue_agent,
-                        context=[{
-                            "description": "Property Issue Analysis",
-                            "content": image,
-                            "expected_output": "Visual analysis of property issues",
-                            "type": "image_analysis"
-                        }],
-                        expected_output=issue_task_spec["expected_output"]
-                    )
-                    
-                    issue_crew = Crew(
-                        agents=[self.issue_agent],
-                        tasks=[issue_task],
-                        verbose=True,
-                        process=Process.sequential
-                    )
-                    
-                    response = issue_crew.kickoff()
+                if image is not None:
+                    # Same vision tool the issue agent is configured with
+                    with tracer.span("issue.vision"):
+                        if self.report_store is not None:
+                            report = await self._coalesced(
+                                "issue_report", "issue_report", user_input, image, conversation_context,
+                                lambda: aanalyze_property_report(
+                                    image, user_input, self.api_key, conversation_context=conversation_context
+                                )
+                            )
+                            # SQLite write; keep it off the event loop
+                            await asyncio.to_thread(self.report_store.add, report, property_id, user_input)
+                            response = render_report(report)
+                        else:
+                            response = await self._coalesced(
+                                "issue_detection", "vision", user_input, image, conversation_context,
+                                lambda: aanalyze_property_image(
+                                    image, user_input, self.api_key, conversation_context=conversation_context
+                                )
+                            )
+                    if not response.startswith(ERROR_PREFIX):
+                        self._image_hashes.extend(hashes)
+                    if note:
+                        response = f"{note}\n\n{response}"
+                elif repeated:
+                    response = RETAKE_MESSAGES["duplicate"]
                 else:
-                    response = "To help identify property issues, please upload an image of the problem area."
+                    response = note or NO_IMAGE_MESSAGE
                     
             elif agent_type == "tenancy_faq":
-                # Create and execute tenancy question task
-                tenancy_task_spec = TenancyAgentBuilder.create_task(user_input)
-                tenancy_task = Task(
-                    description=tenancy_task_spec["description"],
-                    agent=self.tenancy_agent,
-                    expected_output=tenancy_task_spec["expected_output"]
-                )
-                
-                tenancy_crew = Crew(
-                    agents=[self.tenancy_agent],
-                    tasks=[tenancy_task],
-                    verbose=True,
-                    process=Process.sequential
-                )
-                
-                response = tenancy_crew.kickoff()
+                if speculation is not None:
+                    metrics.increment("router.speculation.used")
+                    response = await speculation
+                else:
+                    response = await self._aanswer_tenancy(user_input, conversation_context)
                 
             else:  # ask_clarification
-                response = """I'm not sure if you're asking about:
-                1. A physical property issue (please upload an image if applicable)
-                2. Tenancy or rental agreement questions
-                
-                Could you please clarify?"""
-                
-        except Exception as e:
-            response = f"I encountered an error while processing your request. Please try again. Error: {str(e)}"
+                response = CLARIFICATION_MESSAGE
+            return response
+        
+        start = time.perf_counter()
+        with deadline_scope(self.deadline_seconds) as deadline, tracer.span("query", has_image=has_image):
+            try:
+                # Routing and the specialist share the query's time budget; work
+                # still in flight when it runs out is cancelled
+                response = await run_with_deadline(respond(), "query")
+            except Exception as e:
+                response = self._error_response(e, deadline)
+            finally:
+                if speculation is not None and not speculation.done():
+                    speculation.cancel()
+        metrics.observe("query.total_seconds", time.perf_counter() - start)
         
         # Track response
-        self.conversation_history.append({"role": "assistant", "content": response})
+        self.memory.add("assistant", response)
+        return response
+    
+    def inspect_high_resolution(self, user_input, image_bytes, property_id=None):
+        """
+        Inspect one large photo tile by tile (see tools.tiled_inspection)
+        
+        Thin synchronous wrapper around ainspect_high_resolution.
+        
+        Args:
+            user_input (str): User's text query
+            image_bytes (bytes): The original upload, not the downsampled copy
+            property_id (str, optional): Property the photo shows
+        
+        Returns:
+            str: The merged issue report as text
+        """
+        return run_sync(self.ainspect_high_resolution(user_input, image_bytes, property_id))
+    
+    async def ainspect_high_resolution(self, user_input, image_bytes, property_id=None):
+        """
+        Async version of inspect_high_resolution
+        
+        The user chose this mode for a photo, so there is no routing step.
+        Each analyzed tile is a vision call: the mode trades tokens for
+        detail at about the latency of a single call.
+        """
+        conversation_context = self.memory.get_context(self.context_token_budget)
+        self.memory.add("user", user_input)
+        
+        async def respond():
+            result = None
+            if self.image_triage:
+                result = await asyncio.to_thread(triage_image, image_bytes, self._image_hashes)
+            if result is not None and not result.usable:
+                return result.message
+            report = await self._coalesced(
+                "inspection", "inspection", user_input, image_bytes, conversation_context,
+                lambda: ainspect_tiled(image_bytes, user_input, self.api_key, conversation_context)
+            )
+            if self.report_store is not None:
+                await asyncio.to_thread(self.report_store.add, report, property_id, user_input)
+            if result is not None:
+                self._image_hashes.append(result.dhash)
+            return render_report(report)
+        
+        with deadline_scope(self.deadline_seconds) as deadline, \
+                tracer.span("query", has_image=True, high_resolution=True):
+            try:
+                response = await run_with_deadline(respond(), "query")
+            except Exception as e:
+                response = self._error_response(e, deadline)
+        
+        self.memory.add("assistant", response)
         return response
     
+    async def _aanswer_tenancy(self, user_input, conversation_context, speculative=False):
+        """
+        Cached or freshly generated tenancy answer; only complete answers are
+        cached, so a cancelled speculative answer leaves nothing behind
+        """
+        jurisdiction = extract_jurisdiction(user_input)
+        # Cache lookups and writes (log appends, compaction) and BM25
+        # retrieval are blocking; keep them off the event loop
+        response = await asyncio.to_thread(self.answer_cache.get, user_input, jurisdiction)
+        tracer.current_span().set_attribute("cache_hit", response is not None)
+        if response is None:
+            async def answer():
+                passages = await asyncio.to_thread(self._retrieve, user_input, jurisdiction)
+                with tracer.span("tenancy.answer", engine=self.engine.name, speculative=speculative):
+                    text = await self.engine.aanswer_tenancy(user_input, conversation_context, passages)
+                await asyncio.to_thread(self.answer_cache.put, user_input, jurisdiction, text)
+                return text
+            
+            response = await self._coalesced("tenancy_faq", "tenancy", user_input, None,
+                                             conversation_context, answer)
+        return response
+    
+    def _retrieve(self, user_input, jurisdiction):
+        if self.law_index is None:
+            return None
+        with tracer.span("tenancy.retrieval", jurisdiction=jurisdiction or ""):
+            return self.law_index.search(user_input, jurisdiction, self.retrieval_top_k)
+    
+    def stream_query(self, user_input, image=None, property_id=None, triage=None) -> Iterator[str]:
+        """
+        Streaming variant of process_query
+        
+        The specialist LLM is called directly so its tokens can be yielded as
+        they are generated. Time to first token is recorded in the
+        "query.time_to_first_token_seconds" metric. Structured issue reports
+        (when a report store is configured) arrive as one chunk. Sessions
+        streaming the identical request at the same time share one model
+        stream (see _coalesced_stream).
+        
+        Args:
+            user_input (str): User's text query
+            image (str or list, optional): Base64 encoded image data, or a list
+                of images analyzed together in one consolidated report
+            property_id (str, optional): Property the images show
+            triage (list, optional): TriageResult per image (see process_query)
+            
+        Yields:
+            str: Response text chunks
+        """
+        start = time.perf_counter()
+        conversation_context = self.memory.get_context(self.context_token_budget)
+        self.memory.add("user", user_input)
+        image = normalize_images(image)
+        has_image = image is not None
+        chunks = []
+        
+        with deadline_scope(self.deadline_seconds) as deadline, \
+                tracer.span("query", has_image=has_image, stream=True) as span:
+            try:
+                for chunk in self._stream_response(user_input, image, has_image, conversation_context, property_id,
+                                                   triage):
+                    if not chunk:
+                        continue
+                    if deadline is not None:
+                        # A stream that keeps trickling never hits a read timeout
+                        deadline.check("stream")
+                    if not chunks:
+                        metrics.observe("query.time_to_first_token_seconds", time.perf_counter() - start)
+                        span.set_attribute("time_to_first_token_seconds", time.perf_counter() - start)
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                error = self._error_response(e, deadline)
+                if chunks:
+                    error = f"\n\n{error}"
+                chunks.append(error)
+                yield error
+        
+        metrics.observe("query.total_seconds", time.perf_counter() - start)
+        self.memory.add("assistant", "".join(chunks))
+    
+    def _stream_response(self, user_input, image, has_image, conversation_context=None, property_id=None,
+                         triage=None):
+        note, hashes, repeated = None, [], False
+        if has_image and self.image_triage:
+            image, note, hashes, repeated = self._triage_images(image, triage)
+            # Photos already analyzed add nothing; the text is routed alone
+            has_image = not repeated
+        agent_type = self._route(user_input, has_image, conversation_context)
+        
+        if agent_type == "issue_detection":
+            if image is None:
+                yield RETAKE_MESSAGES["duplicate"] if repeated else note or NO_IMAGE_MESSAGE
+                return
+            if note:
+                yield f"{note}\n\n"
+            if self.report_store is not None:
+                # JSON-mode output is only useful once complete
+                with tracer.span("issue.vision"):
+                    report = self._coalesced_call(
+                        "issue_report", "issue_report", user_input, image, conversation_context,
+                        lambda: analyze_property_report(
+                            image, user_input, self.api_key, conversation_context=conversation_context
+                        )
+                    )
+                    self.report_store.add(report, property_id, user_input)
+                self._image_hashes.extend(hashes)
+                yield render_report(report)
+                return
+            with tracer.span("issue.vision", stream=True):
+                failed = False
+                for chunk in self._coalesced_stream(
+                    "issue_detection", "vision", user_input, image, conversation_context,
+                    lambda: stream_property_image_analysis(
+                        image, user_input, self.api_key, conversation_context=conversation_context
+                    )
+                ):
+                    failed = failed or chunk.startswith(ERROR_PREFIX)
+                    yield chunk
+            if not failed:
+                self._image_hashes.extend(hashes)
+        
+        elif agent_type == "tenancy_faq":
+            jurisdiction = extract_jurisdiction(user_input)
+            cached = self.answer_cache.get(user_input, jurisdiction)
+            if cached is not None:
+                yield cached
+                return
+            
+            def answer():
+                chunks = []
+                passages = self._retrieve(user_input, jurisdiction)
+                # Streamed text cannot be retried on a larger model, so this uses
+                # the first tenancy tier only (or its fallback while it is failing)
+                llm = self.pool.llm_for(self.pool.registry.model("tenancy"))
+                for message_chunk in llm.stream(
+                    TenancyAgentBuilder.create_messages(user_input, conversation_context, passages)
+                ):
+                    text = message_chunk.content
+                    if text:
+                        chunks.append(text)
+                        yield text
+                if chunks:
+                    self.answer_cache.put(user_input, jurisdiction, "".join(chunks))
+            
+            with tracer.span("tenancy.answer", engine="stream"):
+                yield from self._coalesced_stream("tenancy_faq", "tenancy", user_input, None,
+                                                  conversation_context, answer)
+        
+        else:  # ask_clarification
+            yield CLARIFICATION_MESSAGE
+    
+    def _fast_route(self, user_input, has_image):
+        """
+        Try the deterministic rules, then the local classifier
+        
+        Returns:
+            Tuple[Optional[str], str, str]: (accepted route or None, best guess,
+                method: "rule", "fast" or "llm")
+        """
+        if self.routing_rules:
+            route = route_by_rules(user_input, has_image)
+            if route is not None:
+                metrics.increment("router.rule.hits")
+                return route, route, "rule"
+        
+        fast_route, confidence = self.intent_classifier.classify(user_input)
+        # The classifier only sees text, so it may not overrule an attached image
+        image_conflict = has_image and fast_route != "issue_detection"
+        if confidence >= self.router_confidence_threshold and not image_conflict:
+            metrics.increment("router.fast_path.hits")
+            return fast_route, fast_route, "fast"
+        
+        metrics.increment("router.fast_path.fallbacks")
+        return None, fast_route, "llm"
+    
+    def _record_llm_route(self, user_input, has_image, agent_type, fast_route):
+        if agent_type != fast_route:
+            # The local classifier's best guess would have been wrong
+            metrics.increment("router.fast_path.misses")
+        if self.routing_log:
+            self.routing_log.record(user_input, agent_type, has_image)
+    
+    def _route(self, user_input, has_image, conversation_context=None):
+        """
+        Pick the specialist for a query: deterministic rules first, then the
+        local classifier when it is confident enough, the LLM router otherwise
+        
+        Args:
+            user_input (str): User's text query
+            has_image (bool): Whether an image is attached
+            conversation_context (str, optional): Budgeted history for the LLM router
+            
+        Returns:
+            str: One of 'issue_detection', 'tenancy_faq' or 'ask_clarification'
+        """
+        with tracer.span("router") as span:
+            route, fast_route, method = self._fast_route(user_input, has_image)
+            span.set_attribute("method", method)
+            if route is not None:
+                span.set_attribute("route", route)
+                return route
+            
+            # The router sees whether an image is attached, not the image itself
+            agent_type = self._coalesced_call(
+                "router", "router", user_input, "image" if has_image else None, conversation_context,
+                lambda: self.engine.route(user_input, has_image, conversation_context)
+            )
+            span.set_attribute("route", agent_type)
+            self._record_llm_route(user_input, has_image, agent_type, fast_route)
+            return agent_type
+    
+    async def _aroute(self, user_input, has_image, conversation_context=None, speculate=None):
+        """
+        Async version of _route
+        
+        Args:
+            speculate (Callable, optional): Called with the local classifier's
+                best guess right before the LLM router is awaited
+        """
+        with tracer.span("router") as span:
+            route, fast_route, method = self._fast_route(user_input, has_image)
+            span.set_attribute("method", method)
+            if route is not None:
+                span.set_attribute("route", route)
+                return route
+            
+            if speculate is not None:
+                speculate(fast_route)
+            # The router sees whether an image is attached, not the image itself
+            agent_type = await self._coalesced(
+                "router", "router", user_input, "image" if has_image else None, conversation_context,
+                lambda: self.engine.aroute(user_input, has_image, conversation_context)
+            )
+            span.set_attribute("route", agent_type)
+            self._record_llm_route(user_input, has_image, agent_type, fast_route)
+            return agent_type
+    
     def _create_task(self, task_dict: Dict[str, Any]) -> Task:
         return Task(
             description=task_dict["description"],
@@ -0,0 +1,30 @@
+# tests/test_answer_cache.py
+from tools.answer_cache import SemanticAnswerCache
+
+LANDLORD_NOTICE = "How much notice must a landlord give a tenant?"
+TENANT_NOTICE = "How much notice must a tenant give a landlord?"
+
+
+def test_swapped_parties_do_not_share_an_answer():
+    cache = SemanticAnswerCache()
+    cache.put(LANDLORD_NOTICE, None, "Usually at least two months under a section 21 notice.")
+
+    assert cache.get(TENANT_NOTICE) is None
+
+
+def test_rephrased_question_still_hits():
+    cache = SemanticAnswerCache()
+    cache.put(LANDLORD_NOTICE, None, "Usually at least two months under a section 21 notice.")
+
+    assert cache.get("how much notice must the landlord give the tenant") is not None
+
+
+def test_swapped_parties_are_kept_apart_after_reload(tmp_path):
+    path = str(tmp_path / "answers.jsonl")
+    cache = SemanticAnswerCache(persist_path=path)
+    cache.put(LANDLORD_NOTICE, None, "landlord answer")
+    cache.put(TENANT_NOTICE, None, "tenant answer")
+
+    reloaded = SemanticAnswerCache(persist_path=path)
+    assert reloaded.get(LANDLORD_NOTICE) == "landlord answer"
+    assert reloaded.get(TENANT_NOTICE) == "tenant answer"
@@ -0,0 +1,74 @@
+# tests/test_circuit_breaker.py
+import asyncio
+import time
+
+import pytest
+
+from crew_agents.pool import AgentPool
+from tools.answer_cache import SemanticAnswerCache
+from tools.groq_client import CircuitBreaker, CircuitOpenError, RateLimitScheduler, circuit_breaker
+from utils.deadlines import DeadlineExceeded, deadline_scope
+
+MODEL = "llama-3.1-8b-instant"
+QUESTION = "Is my deposit protected?"
+
+
+@pytest.fixture
+def llm():
+    pool = AgentPool("test-key", engine="lean", answer_cache=SemanticAnswerCache())
+    circuit_breaker.reset()
+    for _ in range(circuit_breaker.failure_threshold):
+        circuit_breaker.record_failure(MODEL)
+    yield pool.llm_for(MODEL)
+    circuit_breaker.reset()
+
+
+def test_open_circuit_fails_at_once_through_chat_model(llm):
+    # The first call builds the shared HTTP client
+    with pytest.raises(CircuitOpenError):
+        llm.invoke(QUESTION)
+
+    start = time.perf_counter()
+    with pytest.raises(CircuitOpenError):
+        llm.invoke(QUESTION)
+    assert time.perf_counter() - start < 0.1
+
+
+def test_open_circuit_fails_at_once_through_async_chat_model(llm):
+    async def elapsed():
+        with pytest.raises(CircuitOpenError):
+            await llm.ainvoke(QUESTION)
+        start = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            await llm.ainvoke(QUESTION)
+        return time.perf_counter() - start
+
+    assert asyncio.run(elapsed()) < 0.1
+
+
+def test_rate_limited_probe_gives_its_slot_back():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_seconds=0.05)
+    breaker.record_failure(MODEL)
+    time.sleep(0.06)
+    claimed_at = time.monotonic()
+    assert breaker.allow(MODEL, claimed_at)
+    assert not breaker.available(MODEL)
+
+    breaker.release(MODEL, claimed_at)
+
+    assert breaker.available(MODEL)
+
+
+def test_wait_past_deadline_reserves_nothing():
+    scheduler = RateLimitScheduler({MODEL: {"rpm": 60, "tpm": 1e6}})
+    for _ in range(60):
+        scheduler.reserve(MODEL, 10)
+    first_wait = scheduler.reserve(MODEL, 10)
+
+    with deadline_scope(0.5):
+        for _ in range(5):
+            with pytest.raises(DeadlineExceeded):
+                scheduler.acquire(MODEL, 10)
+
+    # The rejected requests did not push later callers further back
+    assert scheduler.reserve(MODEL, 10) == pytest.approx(first_wait + 1.0, abs=0.05)
@@ -0,0 +1,98 @@
+# tests/test_image_triage.py
+import base64
+import io
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+import main
+from main import RealEstateAssistant
+from tools.answer_cache import SemanticAnswerCache
+from utils.image_triage import RETAKE_MESSAGES
+
+QUESTION = "How much notice does my landlord have to give before a rent increase?"
+ANSWER = "Your landlord must give at least one month's notice."
+ANALYSIS = "Damp patch on the ceiling, likely from a leaking pipe above."
+
+
+class _Engine:
+    name = "test"
+
+    def route(self, user_input, has_image, conversation_context=None):
+        return "tenancy_faq" if "notice" in user_input else "issue_detection"
+
+    async def aroute(self, user_input, has_image, conversation_context=None):
+        return self.route(user_input, has_image, conversation_context)
+
+    def answer_tenancy(self, user_input, conversation_context=None, passages=None):
+        return ANSWER
+
+    async def aanswer_tenancy(self, user_input, conversation_context=None, passages=None):
+        return ANSWER
+
+
+def _photo() -> str:
+    # Varied shapes on a gradient: sharp, well exposed and not a screenshot
+    rng = random.Random(3)
+    image = Image.linear_gradient("L").resize((640, 480)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(30):
+        x, y = rng.randrange(640), rng.randrange(480)
+        draw.ellipse([x, y, x + rng.randrange(20, 120), y + rng.randrange(20, 120)],
+                     fill=tuple(rng.randrange(40, 220) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def assistant(monkeypatch):
+    monkeypatch.delenv("ISSUE_REPORT_DB", raising=False)
+    vision_calls = []
+
+    async def analyze(image, user_input, api_key, conversation_context=None):
+        vision_calls.append(user_input)
+        return ANALYSIS
+
+    def stream_analysis(image, user_input, api_key, conversation_context=None):
+        vision_calls.append(user_input)
+        yield ANALYSIS
+
+    monkeypatch.setattr(main, "aanalyze_property_image", analyze)
+    monkeypatch.setattr(main, "stream_property_image_analysis", stream_analysis)
+    cache = SemanticAnswerCache()
+    # The streamed tenancy answer is served from the cache, not a model
+    cache.put(QUESTION, None, ANSWER)
+    assistant = RealEstateAssistant(api_key="test-key", engine=_Engine(), answer_cache=cache,
+                                    routing_rules=True, router_confidence_threshold=1.1)
+    assistant.vision_calls = vision_calls
+    return assistant
+
+
+def test_duplicate_photo_with_new_question_answers_the_question(assistant):
+    photo = _photo()
+    assert assistant.process_query("What is this stain on my ceiling?", photo) == ANALYSIS
+
+    response = assistant.process_query(QUESTION, photo)
+
+    assert response == ANSWER
+    assert len(assistant.vision_calls) == 1
+
+
+def test_streamed_duplicate_photo_with_new_question_answers_the_question(assistant):
+    photo = _photo()
+    assert "".join(assistant.stream_query("What is this stain on my ceiling?", photo)) == ANALYSIS
+
+    response = "".join(assistant.stream_query(QUESTION, photo))
+
+    assert response == ANSWER
+    assert len(assistant.vision_calls) == 1
+
+
+def test_duplicate_photo_alone_points_to_earlier_analysis(assistant):
+    photo = _photo()
+    assistant.process_query("What is this stain on my ceiling?", photo)
+
+    assert assistant.process_query("What is this stain on my ceiling?", photo) == RETAKE_MESSAGES["duplicate"]
+    assert len(assistant.vision_calls) == 1
@@ -0,0 +1,363 @@
+# tools/answer_cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+# Words that carry no meaning for FAQ matching. Negations are deliberately kept.
+STOP_WORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "is", "are", "am",
+    "be", "been", "do", "does", "did", "to", "of", "in", "on", "for", "at", "by",
+    "with", "and", "or", "it", "its", "this", "that", "there", "what", "how", "can",
+    "could", "should", "would", "will", "please", "if", "so", "about", "from", "have",
+    "has", "need", "want", "know", "tell", "hi", "hello",
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_MERSENNE_PRIME = (1 << 61) - 1
+# The persisted log is rewritten once it holds this many times as many
+# records as there are live entries (and at least COMPACT_MIN_RECORDS)
+COMPACT_RATIO = 2
+COMPACT_MIN_RECORDS = 100
+
+
+def content_tokens(text: str) -> List[str]:
+    """
+    Content words of a text in order, repeats kept
+
+    Args:
+        text (str): Raw text
+
+    Returns:
+        List[str]: Lower-cased tokens without stop words, plurals folded
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        # Cheap plural folding ("deposits" -> "deposit")
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def normalize_query(text: str) -> List[str]:
+    """
+    Reduce a query to its content words, in order
+
+    Word order is kept: "must a landlord give a tenant" and "must a tenant
+    give a landlord" ask different things.
+
+    Args:
+        text (str): Raw user query
+
+    Returns:
+        List[str]: Normalized tokens
+    """
+    return content_tokens(text)
+
+
+def same_order(tokens_a: List[str], tokens_b: List[str]) -> bool:
+    """
+    Whether the words two token lists share appear in the same order (by
+    first occurrence); swapped parties or objects fail this
+    """
+    shared = set(tokens_a) & set(tokens_b)
+    return ([t for t in dict.fromkeys(tokens_a) if t in shared]
+            == [t for t in dict.fromkeys(tokens_b) if t in shared])
+
+
+class MinHasher:
+    """
+    MinHash signatures for estimating Jaccard similarity between token sets
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        params = hashlib.blake2b(str(seed).encode(), digest_size=64).digest()
+        self._coefficients = []
+        for i in range(num_perm):
+            block = hashlib.blake2b(params + i.to_bytes(4, "little"), digest_size=16).digest()
+            a = int.from_bytes(block[:8], "little") % _MERSENNE_PRIME or 1
+            b = int.from_bytes(block[8:], "little") % _MERSENNE_PRIME
+            self._coefficients.append((a, b))
+
+    def signature(self, tokens: List[str]) -> Tuple[int, ...]:
+        if not tokens:
+            return tuple([_MERSENNE_PRIME] * self.num_perm)
+        hashes = [
+            int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little")
+            for t in tokens
+        ]
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._coefficients
+        )
+
+    @staticmethod
+    def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        matches = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+        return matches / len(sig_a)
+
+
+class SemanticAnswerCache:
+    """
+    Cache of tenancy FAQ answers keyed on normalized query and jurisdiction.
+
+    Near-duplicate queries are found through MinHash signatures bucketed with
+    locality-sensitive hashing, so lookups stay cheap as the cache grows; a
+    near match must use the words it shares with the query in the same order.
+    Entries are evicted least-recently-used beyond max_entries and expire after
+    ttl_seconds. When persist_path is set, every put appends one JSON line
+    to that file, which is replayed on start-up and compacted once it holds
+    COMPACT_RATIO times as many records as live entries.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.8, max_entries: int = 1000,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600, persist_path: Optional[str] = None,
+                 num_perm: int = 64, bands: int = 32, metrics_prefix: str = "tenancy_cache"):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.metrics_prefix = metrics_prefix
+        self._hasher = MinHasher(num_perm)
+        self._bands = bands
+        self._rows = num_perm // bands
+        self._lock = threading.Lock()
+        # key -> {"tokens", "jurisdiction", "signature", "answer", "created_at"}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._buckets: Dict[Tuple, set] = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+        self._log = None
+        self._log_records = 0
+        if persist_path:
+            self._load()
+
+    @staticmethod
+    def _key(tokens: List[str], jurisdiction: Optional[str]) -> str:
+        return f"{jurisdiction or '*'}|{' '.join(tokens)}"
+
+    def _band_keys(self, signature: Tuple[int, ...], jurisdiction: Optional[str]):
+        for band in range(self._bands):
+            start = band * self._rows
+            yield (jurisdiction, band, signature[start:start + self._rows])
+
+    def _is_expired(self, entry: Dict, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry["created_at"] > self.ttl_seconds
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band_key in self._band_keys(entry["signature"], entry["jurisdiction"]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _insert(self, key: str, entry: Dict) -> None:
+        self._entries[key] = entry
+        for band_key in self._band_keys(entry["signature"], entry["jurisdiction"]):
+            self._buckets[band_key].add(key)
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.increment(f"{self.metrics_prefix}.{'hits' if hit else 'misses'}")
+        metrics.set_gauge(f"{self.metrics_prefix}.hit_rate", self.hit_rate)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, query: str, jurisdiction: Optional[str] = None) -> Optional[str]:
+        """
+        Look up a cached answer for a query or a near-duplicate of it
+
+        Args:
+            query (str): User's tenancy question
+            jurisdiction (str, optional): Jurisdiction extracted from the query
+
+        Returns:
+            Optional[str]: Cached answer, or None on a miss
+        """
+        tokens = normalize_query(query)
+        key = self._key(tokens, jurisdiction)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and tokens:
+                signature = self._hasher.signature(tokens)
+                candidates = set()
+                for band_key in self._band_keys(signature, jurisdiction):
+                    candidates |= self._buckets.get(band_key, set())
+                best_score = 0.0
+                for candidate in candidates:
+                    score = MinHasher.similarity(signature, self._entries[candidate]["signature"])
+                    if (score >= self.similarity_threshold and score > best_score
+                            and same_order(tokens, self._entries[candidate]["tokens"])):
+                        best_score, key, entry = score, candidate, self._entries[candidate]
+
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self._record(hit=False)
+                return None
+
+            self._entries.move_to_end(key)
+            self._record(hit=True)
+            return entry["answer"]
+
+    def put(self, query: str, jurisdiction: Optional[str], answer: str) -> None:
+        """
+        Store an answer for a query
+        """
+        tokens = normalize_query(query)
+        if not tokens:
+            return
+        key = self._key(tokens, jurisdiction)
+        entry = {
+            "tokens": tokens,
+            "jurisdiction": jurisdiction,
+            "signature": self._hasher.signature(tokens),
+            "answer": answer,
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._remove(key)
+            self._insert(key, entry)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            metrics.set_gauge(f"{self.metrics_prefix}.size", len(self._entries))
+            if self.persist_path:
+                self._append(entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            if self.persist_path:
+                self._compact()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    @staticmethod
+    def _record_line(entry: Dict) -> str:
+        # Signatures are recomputed on load; only the source data is persisted
+        return json.dumps({
+            "tokens": entry["tokens"],
+            "jurisdiction": entry["jurisdiction"],
+            "answer": entry["answer"],
+            "created_at": entry["created_at"],
+        }) + "\n"
+
+    def _append(self, entry: Dict) -> None:
+        # One line per put; the lock is held, so writes never interleave
+        if self._log is None:
+            self._log = open(self.persist_path, "a", encoding="utf-8")
+        self._log.write(self._record_line(entry))
+        self._log.flush()
+        self._log_records += 1
+        if self._log_records > max(COMPACT_RATIO * len(self._entries), COMPACT_MIN_RECORDS):
+            self._compact()
+
+    def _compact(self) -> None:
+        # Rewrite the log with only the live entries, in LRU order
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(self._record_line(e) for e in self._entries.values())
+        os.replace(tmp_path, self.persist_path)
+        self._log_records = len(self._entries)
+        metrics.increment(f"{self.metrics_prefix}.compactions")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return
+        if text.lstrip().startswith("["):
+            # Snapshot written by earlier versions; rewritten as a log below
+            try:
+                data = json.loads(text)
+            except ValueError:
+                return
+        else:
+            data = []
+            for line in text.splitlines():
+                try:
+                    data.append(json.loads(line))
+                except ValueError:
+                    # e.g. a line cut short by a crash mid-write
+                    continue
+        now = time.time()
+        for item in data:
+            entry = {
+                "tokens": item["tokens"],
+                "jurisdiction": item.get("jurisdiction"),
+                "signature": self._hasher.signature(item["tokens"]),
+                "answer": item["answer"],
+                "created_at": item.get("created_at", now),
+            }
+            if self._is_expired(entry, now):
+                continue
+            # Later records of the same query replace earlier ones
+            key = self._key(entry["tokens"], entry["jurisdiction"])
+            self._remove(key)
+            self._insert(key, entry)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        self._log_records = len(data)
+        if text.lstrip().startswith("[") or self._log_records > COMPACT_RATIO * len(self._entries):
+            self._compact()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Return the process-wide tenancy answer cache.
+
+    The cache is persisted to TENANCY_CACHE_PATH when set, otherwise kept in
+    memory. One instance owns the file: a second one would lose the first
+    one's entries when it compacts the log.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SemanticAnswerCache(persist_path=os.environ.get("TENANCY_CACHE_PATH"))
+        return _default_cache
@@ -0,0 +1,247 @@
+# tools/batch_inspection.py
+"""
+Batch issue detection for directories or manifests of property photos.
+
+Images are triaged and preprocessed in a process pool and analyzed
+concurrently on one event loop. Dark, blurry or screenshot images are
+recorded as "rejected" with the reason, without a vision call. Results are
+appended to a JSONL file as each image finishes, so an interrupted run can
+be resumed: images already recorded as "ok" or "rejected" are skipped.
+
+Usage:
+    python -m tools.batch_inspection PHOTOS_DIR_OR_MANIFEST --output results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+from tools.groq_client import aclose_async_clients
+from tools.image_tools import ERROR_PREFIX, VISION_MODEL, aanalyze_property_image, aanalyze_property_report
+from tools.issue_reports import IssueReportStore, render_report
+from utils.image_preprocessing import preprocess_image
+from utils.image_triage import triage_image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+DEFAULT_QUERY = "Inspect this photo for property issues, damage or maintenance problems."
+
+
+def load_items(source: str, query: Optional[str] = None) -> List[Dict]:
+    """
+    Build the list of images to inspect
+
+    Args:
+        source (str): A directory (searched recursively), a .jsonl manifest with
+            "image" and optional "query"/"property_id" fields, or a text
+            manifest with one image path per line
+        query (str, optional): Query used when an item does not define one
+
+    Returns:
+        List[Dict]: Items with "image", "query" and optional "property_id"
+    """
+    query = query or DEFAULT_QUERY
+    items = []
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    items.append({"image": os.path.join(root, name), "query": query})
+        return sorted(items, key=lambda item: item["image"])
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if source.endswith(".jsonl"):
+                entry = json.loads(line)
+            else:
+                entry = {"image": line}
+            if not os.path.isabs(entry["image"]):
+                entry["image"] = os.path.join(base_dir, entry["image"])
+            entry.setdefault("query", query)
+            items.append(entry)
+    return items
+
+
+def load_completed(output_path: str) -> Set[str]:
+    """
+    Return the images already analyzed or rejected in a previous run
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash may leave a truncated last line
+                continue
+            if record.get("status") in ("ok", "rejected"):
+                done.add(record["image"])
+    return done
+
+
+def _terminate_partial_line(output_path: str) -> None:
+    # Keep new records on their own line after a crash mid-write
+    if not os.path.exists(output_path) or not os.path.getsize(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def _prepare(path: str, model: Optional[str], triage: bool = True) -> Dict:
+    # Runs in a worker process; returns only picklable primitives
+    with open(path, "rb") as f:
+        raw = f.read()
+    if triage:
+        # The original still has its EXIF data, which preprocessing strips
+        result = triage_image(raw)
+        if not result.usable:
+            return {"rejected": result.reason, "message": result.message}
+    prepared = preprocess_image(raw, model=model)
+    return {
+        "data": prepared.base64,
+        "mime_type": prepared.mime_type,
+        "width": prepared.width,
+        "height": prepared.height,
+        "payload_bytes": len(prepared.data),
+    }
+
+
+async def inspect_batch(items: Iterable[Dict], api_key: str, output_path: str, concurrency: int = 8,
+                        preprocess_workers: Optional[int] = None, model: Optional[str] = VISION_MODEL,
+                        resume: bool = True, report_store: Optional[IssueReportStore] = None,
+                        triage: bool = True) -> Dict[str, int]:
+    """
+    Analyze many images concurrently, appending one JSON line per image
+
+    Args:
+        items (Iterable[Dict]): Items from load_items
+        api_key (str): Groq API key
+        output_path (str): JSONL results file, appended to
+        concurrency (int): Maximum vision calls in flight
+        preprocess_workers (int, optional): Size of the preprocessing process pool
+        model (str, optional): Vision model whose input profile is used
+        resume (bool): Skip images already recorded as successful
+        report_store (IssueReportStore, optional): When given, images are
+            analyzed into structured reports stored under their property_id
+        triage (bool): Reject unusable images before preprocessing and the
+            vision call (utils.image_triage)
+
+    Returns:
+        Dict[str, int]: Counts of "ok", "rejected", "error" and "skipped" images
+    """
+    items = list(items)
+    done = load_completed(output_path) if resume else set()
+    pending = [item for item in items if item["image"] not in done]
+    summary = {"ok": 0, "rejected": 0, "error": 0, "skipped": len(items) - len(pending)}
+    if not pending:
+        return summary
+
+    _terminate_partial_line(output_path)
+    loop = asyncio.get_running_loop()
+    llm_slots = asyncio.Semaphore(concurrency)
+    # Bound prepared-but-unsent images so memory stays flat for large batches
+    in_flight = asyncio.Semaphore(concurrency * 2)
+
+    async def inspect(item, pool):
+        async with in_flight:
+            start = time.perf_counter()
+            record = dict(item)
+            try:
+                prepared = await loop.run_in_executor(pool, _prepare, item["image"], model, triage)
+                if "rejected" in prepared:
+                    record.update(status="rejected", reason=prepared["rejected"], message=prepared["message"])
+                    record["seconds"] = round(time.perf_counter() - start, 3)
+                    return record
+                async with llm_slots:
+                    if report_store is not None:
+                        report = await aanalyze_property_report(
+                            prepared["data"], item["query"], api_key, mime_type=prepared["mime_type"]
+                        )
+                    else:
+                        analysis = await aanalyze_property_image(
+                            prepared["data"], item["query"], api_key, mime_type=prepared["mime_type"]
+                        )
+                record.update(
+                    width=prepared["width"],
+                    height=prepared["height"],
+                    payload_bytes=prepared["payload_bytes"],
+                )
+                if report_store is not None:
+                    report_id = report_store.add(report, item.get("property_id"), item["query"])
+                    record.update(status="ok", analysis=render_report(report), report_id=report_id,
+                                  overall_severity=report["overall_severity"], issues=len(report["issues"]))
+                elif analysis.startswith(ERROR_PREFIX):
+                    record.update(status="error", error=analysis)
+                else:
+                    record.update(status="ok", analysis=analysis)
+            except Exception as e:
+                record.update(status="error", error=str(e))
+            record["seconds"] = round(time.perf_counter() - start, 3)
+            return record
+
+    with ProcessPoolExecutor(max_workers=preprocess_workers) as pool, \
+            open(output_path, "a", encoding="utf-8") as out:
+        tasks = [asyncio.ensure_future(inspect(item, pool)) for item in pending]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                record = await finished
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                summary[record["status"]] += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch property photo inspection")
+    parser.add_argument("source", help="Directory of photos or a manifest (.jsonl or one path per line)")
+    parser.add_argument("--output", "-o", default="inspection_results.jsonl", help="JSONL results file")
+    parser.add_argument("--query", default=None, help="Query sent with every image")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum vision calls in flight")
+    parser.add_argument("--workers", type=int, default=None, help="Preprocessing processes")
+    parser.add_argument("--no-resume", action="store_true", help="Re-run images already in the output")
+    parser.add_argument("--no-triage", action="store_true", help="Send every image to the vision model")
+    parser.add_argument("--report-db", default=os.environ.get("ISSUE_REPORT_DB"),
+                        help="SQLite file to store structured issue reports in")
+    parser.add_argument("--api-key", default=os.environ.get("GROQ_API_KEY"))
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("Groq API key is required (--api-key or GROQ_API_KEY)")
+
+    items = load_items(args.source, args.query)
+
+    async def run():
+        try:
+            return await inspect_batch(
+                items,
+                args.api_key,
+                args.output,
+                concurrency=args.concurrency,
+                preprocess_workers=args.workers,
+                resume=not args.no_resume,
+                report_store=IssueReportStore(args.report_db) if args.report_db else None,
+                triage=not args.no_triage,
+            )
+        finally:
+            await aclose_async_clients()
+
+    summary = asyncio.run(run())
+    print(f"Inspected {summary['ok']} images, {summary['rejected']} rejected, {summary['error']} errors, "
+          f"{summary['skipped']} already done -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# tools/conversation_memory.py
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from tools.text_tools import estimate_tokens, get_conversation_context, truncate_to_tokens
+
+# Shared by all sessions so summarization never needs a thread per session
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a
+real estate assistant (property issues and tenancy questions). Keep facts that later
+questions may depend on: locations, property details, issues found, advice given.
+Reply with the updated summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+
+class ConversationMemory:
+    """
+    Bounded per-session conversation memory.
+
+    Recent turns live in a fixed-size ring buffer. Turns pushed out of it are
+    folded into a rolling summary in the background, a batch at a time (one
+    summarizer call per summary_batch evicted turns, not one per turn), so
+    adding a message never waits on an LLM. Turns waiting for the next batch
+    stay in the prompt context. Memory use stays flat however long the chat
+    runs.
+    """
+
+    def __init__(self, max_messages: int = 10, max_message_chars: int = 4000,
+                 max_summary_tokens: int = 300,
+                 summarizer: Optional[Callable[[str], str]] = None,
+                 summary_batch: Optional[int] = None):
+        """
+        Args:
+            max_messages (int): Size of the recent-turn ring buffer
+            max_message_chars (int): Stored messages are truncated to this length
+            max_summary_tokens (int): Cap on the rolling summary
+            summarizer (Callable, optional): Function taking a prompt and
+                returning text (e.g. an LLM call). Without one, evicted turns
+                are summarized extractively.
+            summary_batch (int, optional): Evicted turns folded into the
+                summary per summarizer call; defaults to half the buffer
+        """
+        self.max_messages = max_messages
+        self.max_message_chars = max_message_chars
+        self.max_summary_tokens = max_summary_tokens
+        self.summarizer = summarizer
+        self.summary_batch = summary_batch or max(1, max_messages // 2)
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=max_messages)
+        # Evicted turns waiting for a batch, and the batch being summarized
+        self._pending: List[Dict] = []
+        self._folding: List[Dict] = []
+        self._summary = ""
+        self._summarizing = False
+        self.total_messages = 0
+
+    @property
+    def messages(self) -> List[Dict]:
+        """
+        Recent messages, oldest first
+        """
+        with self._lock:
+            return list(self._recent)
+
+    @property
+    def summary(self) -> str:
+        with self._lock:
+            return self._summary
+
+    def add(self, role: str, content: str) -> None:
+        """
+        Record a message; evicted turns are queued for summarization
+        """
+        content = str(content)[:self.max_message_chars]
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                self._pending.append(self._recent[0])
+            self._recent.append({"role": role, "content": content})
+            self.total_messages += 1
+            start_summary = len(self._pending) >= self.summary_batch and not self._summarizing
+            if start_summary:
+                self._summarizing = True
+        if start_summary:
+            _summary_executor.submit(self._summarize)
+
+    def _summarize(self) -> None:
+        # Loop while full batches are waiting, picking up turns queued meanwhile
+        while True:
+            with self._lock:
+                if len(self._pending) < self.summary_batch:
+                    self._summarizing = False
+                    return
+                pending, self._pending = self._pending, []
+                self._folding = pending
+                summary = self._summary
+            new_summary = self._fold(summary, pending)
+            with self._lock:
+                self._summary = truncate_to_tokens(new_summary, self.max_summary_tokens)
+                self._folding = []
+
+    def _fold(self, summary: str, pending: List[Dict]) -> str:
+        messages = get_conversation_context(pending, max_tokens=self.max_summary_tokens * 4)
+        if self.summarizer is not None:
+            try:
+                prompt = SUMMARY_PROMPT.format(
+                    max_words=int(self.max_summary_tokens * 0.75),
+                    summary=summary or "(none)",
+                    messages=messages,
+                )
+                return str(self.summarizer(prompt)).strip()
+            except Exception:
+                pass
+        # Extractive fallback: keep the first sentence of each turn, newest last
+        lines = summary.splitlines() if summary else []
+        for message in pending:
+            first_sentence = message["content"].split(". ")[0]
+            role = "User" if message["role"] == "user" else "Assistant"
+            lines.append(f"{role}: {truncate_to_tokens(first_sentence, 40)}")
+        # Drop the oldest lines when over budget
+        max_chars = self.max_summary_tokens * 4
+        while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def get_context(self, max_tokens: int = 800) -> str:
+        """
+        Build prompt context within a token budget: the rolling summary (up
+        to a third of the budget) followed by as many recent turns as fit
+
+        Args:
+            max_tokens (int): Token budget for the whole context
+
+        Returns:
+            str: Formatted context, empty if there is no history
+        """
+        with self._lock:
+            summary = self._summary
+            # Evicted turns not yet in the summary come before the buffer
+            recent = self._folding + self._pending + list(self._recent)
+
+        parts = []
+        used = 0
+        if summary:
+            summary_text = "Summary of earlier conversation: " + truncate_to_tokens(summary, max_tokens // 3)
+            parts.append(summary_text)
+            used = estimate_tokens(summary_text)
+
+        recent_text = get_conversation_context(recent, max_tokens=max(0, max_tokens - used))
+        if recent_text:
+            parts.append(recent_text)
+        return "\n".join(parts)
+
+    def token_count(self) -> int:
+        """
+        Estimated tokens currently held (summary plus recent turns)
+        """
+        with self._lock:
+            turns = self._folding + self._pending + list(self._recent)
+            return estimate_tokens(self._summary) + sum(estimate_tokens(m["content"]) for m in turns)
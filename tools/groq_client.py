@@ -0,0 +1,759 @@
+# tools/groq_client.py
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import httpx
+from groq import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncGroq,
+    Groq,
+    RateLimitError,
+)
+
+from utils.deadlines import DeadlineExceeded, remaining_seconds
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+# Fallback per-model limits (requests and tokens per minute) until the API
+# reports the real ones through x-ratelimit-* response headers
+MODEL_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000},
+    "llama-3.3-70b-versatile": {"rpm": 30, "tpm": 12000},
+    "meta-llama/llama-4-scout-17b-16e-instruct": {"rpm": 30, "tpm": 30000},
+    "meta-llama/llama-4-maverick-17b-128e-instruct": {"rpm": 30, "tpm": 6000},
+}
+DEFAULT_RATE_LIMIT = {"rpm": 30, "tpm": 6000}
+
+# Rough token cost of one image part in a vision request
+IMAGE_TOKEN_ESTIMATE = 1500
+
+POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# Consecutive failed calls (5xx, timeouts, connection errors) that open a
+# model's circuit, and how long it stays open before one probe call
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RECOVERY_SECONDS = 30.0
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse Groq reset headers such as "2m59.56s" or "250ms" into seconds
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    seconds = sum(float(amount) * units[unit] for amount, unit in _DURATION_PATTERN.findall(value))
+    return seconds or None
+
+
+def estimate_request_tokens(payload: Dict[str, Any]) -> int:
+    """
+    Estimate the tokens a chat completion request counts against the limit
+
+    Text is estimated at ~4 characters per token; image parts at a fixed cost
+    so base64 payloads do not inflate the estimate.
+    """
+    chars = 0
+    images = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    chars += len(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    images += 1
+    completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or 1024
+    return chars // 4 + images * IMAGE_TOKEN_ESTIMATE + completion
+
+
+class TokenBucket:
+    """
+    Token bucket that lets callers go into debt: reserve() always succeeds and
+    returns how long the caller must wait, so waiters are served in order
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.refill_per_second
+
+    def refund(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def sync_remaining(self, remaining: float, limit: Optional[float], now: float) -> None:
+        # Trust the server's view, which includes traffic from other processes
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimitScheduler:
+    """
+    Per-model request and token buckets shared by every Groq call in the process
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self._limits = limits or MODEL_RATE_LIMITS
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._blocked_until: Dict[str, float] = {}
+
+    def set_limits(self, limits: Dict[str, Dict[str, float]]) -> None:
+        """
+        Replace the per-model fallback limits (e.g. for a higher account tier
+        or a local test server); buckets are rebuilt on next use
+        """
+        with self._lock:
+            self._limits = limits
+            self._buckets.clear()
+            self._blocked_until.clear()
+
+    def _model_buckets(self, model: str) -> Dict[str, TokenBucket]:
+        buckets = self._buckets.get(model)
+        if buckets is None:
+            limit = self._limits.get(model, DEFAULT_RATE_LIMIT)
+            buckets = {
+                "requests": TokenBucket(limit["rpm"], limit["rpm"] / 60.0),
+                "tokens": TokenBucket(limit["tpm"], limit["tpm"] / 60.0),
+            }
+            self._buckets[model] = buckets
+        return buckets
+
+    def reserve(self, model: str, tokens: int, max_wait: Optional[float] = None) -> float:
+        """
+        Reserve capacity for one request
+
+        Args:
+            model (str): Model the request is for
+            tokens (int): Estimated tokens of the request
+            max_wait (float, optional): Longest acceptable wait; when the
+                wait would be longer nothing is reserved
+
+        Returns:
+            float: Seconds the caller must wait before sending
+
+        Raises:
+            DeadlineExceeded: The wait would reach max_wait
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._model_buckets(model)
+            amount = min(tokens, buckets["tokens"].capacity)
+            wait = max(
+                0.0,
+                buckets["requests"].reserve(1, now),
+                buckets["tokens"].reserve(amount, now),
+                self._blocked_until.get(model, 0) - now,
+            )
+            rejected = bool(wait) and max_wait is not None and wait >= max_wait
+            if rejected:
+                # A request that is never sent must not delay the ones that are
+                buckets["requests"].refund(1)
+                buckets["tokens"].refund(amount)
+        if rejected:
+            metrics.increment("groq.scheduler.deadline_exceeded")
+            raise DeadlineExceeded("rate limit wait")
+        if wait:
+            metrics.increment("groq.scheduler.waits")
+            metrics.increment("groq.scheduler.wait_seconds", wait)
+        return wait
+
+    def refund(self, model: str, tokens: int) -> None:
+        """
+        Give back a reservation whose request was not sent after all
+        """
+        with self._lock:
+            buckets = self._model_buckets(model)
+            buckets["requests"].refund(1)
+            buckets["tokens"].refund(min(tokens, buckets["tokens"].capacity))
+
+    def acquire(self, model: str, tokens: int) -> float:
+        # Waiting past the request's deadline would only delay the failure
+        wait = self.reserve(model, tokens, remaining_seconds())
+        if wait:
+            try:
+                time.sleep(wait)
+            except BaseException:
+                self.refund(model, tokens)
+                raise
+        return wait
+
+    async def aacquire(self, model: str, tokens: int) -> float:
+        wait = self.reserve(model, tokens, remaining_seconds())
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                # e.g. the query was cancelled while it waited
+                self.refund(model, tokens)
+                raise
+        return wait
+
+    def update_from_headers(self, model: str, headers: httpx.Headers) -> None:
+        """
+        Align the buckets with x-ratelimit-* and retry-after response headers
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._model_buckets(model)
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_tokens is not None:
+                limit = headers.get("x-ratelimit-limit-tokens")
+                try:
+                    buckets["tokens"].sync_remaining(
+                        float(remaining_tokens), float(limit) if limit else None, now
+                    )
+                except ValueError:
+                    pass
+
+            # Groq reports requests per day; only honour exhaustion
+            if headers.get("x-ratelimit-remaining-requests") == "0":
+                reset = parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    self._block(model, now + reset)
+
+            retry_after = parse_reset_duration(headers.get("retry-after"))
+            if retry_after:
+                self._block(model, now + retry_after)
+
+    def _block(self, model: str, until: float) -> None:
+        self._blocked_until[model] = max(self._blocked_until.get(model, 0), until)
+
+
+scheduler = RateLimitScheduler()
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a model whose circuit is open
+    """
+
+    def __init__(self, model: str):
+        super().__init__(f"{model} is failing; circuit open")
+        self.model = model
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breakers shared by every Groq call in the process
+
+    After failure_threshold consecutive failures (5xx responses, timeouts,
+    connection errors) a model's circuit opens and calls to it fail at once
+    with CircuitOpenError; the model registry switches stages to fallback
+    tiers meanwhile. After recovery_seconds one probe call is let through:
+    success closes the circuit, failure keeps it open for another period.
+    Rate limits (429) say nothing about the model's health: a rate-limited
+    probe gives its slot back for the next call.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 recovery_seconds: float = CIRCUIT_RECOVERY_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        # Models with a probe in flight, and when it started (a cancelled
+        # probe never reports back, so it expires after recovery_seconds)
+        self._probes: Dict[str, float] = {}
+
+    def _available(self, model: str, now: float) -> bool:
+        opened_at = self._opened_at.get(model)
+        if opened_at is None:
+            return True
+        if now - opened_at < self.recovery_seconds:
+            return False
+        probe = self._probes.get(model)
+        return probe is None or now - probe >= self.recovery_seconds
+
+    def available(self, model: str) -> bool:
+        """
+        Whether a call to the model would be let through
+        """
+        with self._lock:
+            return self._available(model, time.monotonic())
+
+    def allow(self, model: str, now: Optional[float] = None) -> bool:
+        """
+        Admit one call, claiming the probe slot of a recovering circuit
+
+        Args:
+            model (str): Model to call
+            now (float, optional): time.monotonic() of the call; pass the
+                same value to release
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self._available(model, now):
+                return False
+            if model in self._opened_at:
+                self._probes[model] = now
+            return True
+
+    def release(self, model: str, claimed_at: float) -> None:
+        """
+        Give back the probe slot a call claimed with allow(model, claimed_at)
+        without a verdict: the call was not sent, or was rate limited
+        """
+        with self._lock:
+            if self._probes.get(model) == claimed_at:
+                del self._probes[model]
+
+    def record_success(self, model: str) -> None:
+        with self._lock:
+            self._failures[model] = 0
+            self._probes.pop(model, None)
+            if self._opened_at.pop(model, None) is not None:
+                metrics.increment("groq.circuit.closed")
+                metrics.set_gauge(f"groq.circuit.open.{model}", 0)
+
+    def record_failure(self, model: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._failures[model] = self._failures.get(model, 0) + 1
+            probing = self._probes.pop(model, None) is not None
+            if probing or (model not in self._opened_at and self._failures[model] >= self.failure_threshold):
+                self._opened_at[model] = now
+                metrics.increment("groq.circuit.opened")
+                metrics.set_gauge(f"groq.circuit.open.{model}", 1)
+
+    def states(self) -> Dict[str, str]:
+        """
+        "open", "half_open" or "closed" for every model seen so far
+        """
+        now = time.monotonic()
+        with self._lock:
+            models: Set[str] = set(self._failures) | set(self._opened_at)
+            return {
+                model: "closed" if model not in self._opened_at
+                else "open" if not self._available(model, now) and model not in self._probes
+                else "half_open"
+                for model in sorted(models)
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures.clear()
+            self._opened_at.clear()
+            self._probes.clear()
+
+
+circuit_breaker = CircuitBreaker()
+
+
+def unwrap_error(error: BaseException) -> BaseException:
+    """
+    The DeadlineExceeded or CircuitOpenError behind an SDK connection error
+
+    Both are raised from the HTTP request hooks, which the Groq SDK reports
+    as APIConnectionError; other errors are returned unchanged.
+    """
+    cause = error.__cause__
+    if isinstance(cause, (DeadlineExceeded, CircuitOpenError)):
+        return cause
+    return error
+
+
+def _request_payload(request: httpx.Request) -> Optional[Dict[str, Any]]:
+    # Only chat completions carry a JSON body with a model
+    try:
+        payload = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return None
+    if not isinstance(payload, dict) or "model" not in payload:
+        return None
+    return payload
+
+
+def _start_request_span(request: httpx.Request, payload: Dict[str, Any], tokens: int) -> None:
+    # One span per HTTP attempt, ended by the response hook
+    span = tracer.start_span(
+        "groq.request", model=payload["model"], estimated_tokens=tokens, stream=bool(payload.get("stream"))
+    )
+    request.extensions["trace_span"] = span
+
+
+def _end_request_span(response: httpx.Response) -> None:
+    span = response.request.extensions.pop("trace_span", None)
+    if span is None:
+        return
+    span.set_attribute("status_code", response.status_code)
+    parent = span.parent
+    if parent is not None:
+        # Roll the attempt up into the logical LLM call or pipeline stage
+        parent.set_attribute("model", span.attributes["model"])
+        parent.add_to_attribute("rate_limit_wait_seconds", span.attributes.get("rate_limit_wait_seconds", 0.0))
+    usage = None
+    if response.status_code == 200 and not span.attributes["stream"]:
+        try:
+            usage = json.loads(response.content).get("usage")
+        except (ValueError, AttributeError, httpx.ResponseNotRead):
+            usage = None
+    if usage:
+        for key in ("prompt_tokens", "completion_tokens"):
+            span.set_attribute(key, usage.get(key, 0))
+            if parent is not None:
+                parent.add_to_attribute(key, usage.get(key, 0))
+    # Streamed responses end at the headers, i.e. time to first byte
+    span.end()
+
+
+def _check_circuit(model: str) -> float:
+    # Returns the claim time, for releasing a probe slot that goes unused
+    claimed_at = time.monotonic()
+    if not circuit_breaker.allow(model, claimed_at):
+        metrics.increment("groq.circuit.rejected")
+        raise CircuitOpenError(model)
+    return claimed_at
+
+
+def _reject_request(model: str, claimed_at: float, tokens: Optional[int] = None) -> None:
+    # The request is not sent after all: free its probe slot and reservation
+    circuit_breaker.release(model, claimed_at)
+    if tokens is not None:
+        scheduler.refund(model, tokens)
+
+
+def _apply_deadline(request: httpx.Request) -> None:
+    # No single read or connect may outlast the request's deadline
+    remaining = remaining_seconds()
+    if remaining is None:
+        return
+    if remaining <= 0:
+        raise DeadlineExceeded("groq request")
+    timeout = request.extensions.get("timeout") or dict.fromkeys(("connect", "read", "write", "pool"))
+    request.extensions["timeout"] = {
+        key: remaining if value is None else min(value, remaining) for key, value in timeout.items()
+    }
+
+
+def _on_request(request: httpx.Request) -> None:
+    payload = _request_payload(request)
+    if payload:
+        model = payload["model"]
+        # Checked before reserving, so a rejected call uses up no capacity
+        claimed_at = _check_circuit(model)
+        tokens = estimate_request_tokens(payload)
+        if tracer.enabled:
+            _start_request_span(request, payload, tokens)
+        try:
+            wait = scheduler.acquire(model, tokens)
+        except BaseException:
+            _reject_request(model, claimed_at)
+            raise
+        if wait and "trace_span" in request.extensions:
+            request.extensions["trace_span"].set_attribute("rate_limit_wait_seconds", wait)
+        try:
+            _apply_deadline(request)
+        except BaseException:
+            _reject_request(model, claimed_at, tokens)
+            raise
+        request.extensions["groq_model"] = model
+        request.extensions["groq_claimed_at"] = claimed_at
+
+
+def _record_response(response: httpx.Response) -> None:
+    model = response.request.extensions.get("groq_model")
+    if model:
+        if response.status_code == 429:
+            metrics.increment("groq.rate_limited")
+            circuit_breaker.release(model, response.request.extensions["groq_claimed_at"])
+        elif response.status_code >= 500:
+            circuit_breaker.record_failure(model)
+        else:
+            circuit_breaker.record_success(model)
+        scheduler.update_from_headers(model, response.headers)
+
+
+def _record_transport_error(request: httpx.Request) -> None:
+    model = request.extensions.get("groq_model")
+    if model:
+        circuit_breaker.record_failure(model)
+
+
+class _CircuitBreakerTransport(httpx.HTTPTransport):
+    """
+    Counts timeouts and connection errors against the model's circuit
+    """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return super().handle_request(request)
+        except httpx.TransportError:
+            _record_transport_error(request)
+            raise
+
+
+class _AsyncCircuitBreakerTransport(httpx.AsyncHTTPTransport):
+    """
+    Async variant of _CircuitBreakerTransport
+    """
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return await super().handle_async_request(request)
+        except httpx.TransportError:
+            _record_transport_error(request)
+            raise
+
+
+def _on_response(response: httpx.Response) -> None:
+    _record_response(response)
+    if "trace_span" in response.request.extensions:
+        if response.status_code == 200:
+            # Reading a non-streamed body here is safe; the SDK reuses it
+            if not response.request.extensions["trace_span"].attributes["stream"]:
+                response.read()
+        _end_request_span(response)
+
+
+async def _aon_request(request: httpx.Request) -> None:
+    payload = _request_payload(request)
+    if payload:
+        model = payload["model"]
+        claimed_at = _check_circuit(model)
+        tokens = estimate_request_tokens(payload)
+        if tracer.enabled:
+            _start_request_span(request, payload, tokens)
+        try:
+            wait = await scheduler.aacquire(model, tokens)
+        except BaseException:
+            _reject_request(model, claimed_at)
+            raise
+        if wait and "trace_span" in request.extensions:
+            request.extensions["trace_span"].set_attribute("rate_limit_wait_seconds", wait)
+        try:
+            _apply_deadline(request)
+        except BaseException:
+            _reject_request(model, claimed_at, tokens)
+            raise
+        request.extensions["groq_model"] = model
+        request.extensions["groq_claimed_at"] = claimed_at
+
+
+async def _aon_response(response: httpx.Response) -> None:
+    _record_response(response)
+    if "trace_span" in response.request.extensions:
+        if response.status_code == 200:
+            if not response.request.extensions["trace_span"].attributes["stream"]:
+                await response.aread()
+        _end_request_span(response)
+
+
+_registry_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_clients: Dict[str, Groq] = {}
+# httpx.AsyncClient pools are bound to the event loop that created them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncGroq]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Return the process-wide keep-alive HTTP client used for Groq calls
+    """
+    global _http_client
+    with _registry_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                transport=_CircuitBreakerTransport(limits=POOL_LIMITS),
+                timeout=REQUEST_TIMEOUT,
+                event_hooks={"request": [_on_request], "response": [_on_response]},
+            )
+        return _http_client
+
+
+def get_groq_client(api_key: str) -> Groq:
+    """
+    Return the shared Groq client for an API key
+
+    SDK retries are disabled; callers retry through call_with_retries so all
+    retries share the scheduler and backoff policy.
+    """
+    http_client = get_http_client()
+    with _registry_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = Groq(api_key=api_key, http_client=http_client, max_retries=0)
+            _clients[api_key] = client
+        return client
+
+
+def get_async_groq_client(api_key: str) -> AsyncGroq:
+    """
+    Return the shared AsyncGroq client for an API key on the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(api_key)
+        if client is None:
+            http_client = httpx.AsyncClient(
+                transport=_AsyncCircuitBreakerTransport(limits=POOL_LIMITS),
+                timeout=REQUEST_TIMEOUT,
+                event_hooks={"request": [_aon_request], "response": [_aon_response]},
+            )
+            client = AsyncGroq(api_key=api_key, http_client=http_client, max_retries=0)
+            clients[api_key] = client
+        return client
+
+
+async def aclose_async_clients() -> None:
+    """
+    Close the running event loop's AsyncGroq clients and their connection
+    pools; call before the loop ends (synchronous callers share one
+    long-lived loop, see utils.async_utils.run_sync)
+    """
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        clients = _async_clients.pop(loop, {})
+    for client in clients.values():
+        await client.close()
+
+
+class Completions:
+    """
+    chat.completions of the shared Groq client, retried through
+    call_with_retries; used as ChatGroq's client
+
+    The SDK's own retries are left off: it reports errors raised in the
+    request hooks (an open circuit, a spent deadline) as connection errors
+    and would retry them with a backoff that ignores the deadline.
+    """
+
+    def __init__(self, api_key: str, max_retries: int = 3):
+        self.api_key = api_key
+        self.max_retries = max_retries
+
+    def create(self, **kwargs):
+        client = get_groq_client(self.api_key)
+        return call_with_retries(lambda: client.chat.completions.create(**kwargs), max_retries=self.max_retries)
+
+
+class AsyncCompletions:
+    """
+    chat.completions of the shared AsyncGroq client for whichever event loop
+    is running, retried through acall_with_retries; used as ChatGroq's
+    async_client so ainvoke/astream work from any loop and go through the
+    scheduler hooks
+    """
+
+    def __init__(self, api_key: str, max_retries: int = 3):
+        self.api_key = api_key
+        self.max_retries = max_retries
+
+    async def create(self, **kwargs):
+        client = get_async_groq_client(self.api_key)
+        return await acall_with_retries(lambda: client.chat.completions.create(**kwargs),
+                                        max_retries=self.max_retries)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (RateLimitError, APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    if response is None:
+        return 0.0
+    return parse_reset_duration(response.headers.get("retry-after")) or 0.0
+
+
+def backoff_delay(attempt: int, base_delay: float = 0.5, max_delay: float = 20.0) -> float:
+    """
+    Full-jitter exponential backoff
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def _retry_delay(error: Exception, attempt: int, max_retries: int, base_delay: float, max_delay: float) -> float:
+    # Seconds to back off before retrying error; raises when it should not be retried
+    cause = unwrap_error(error)
+    if cause is not error:
+        raise cause
+    if attempt >= max_retries or not _is_retryable(error):
+        raise error
+    metrics.increment("groq.retries")
+    delay = max(_retry_after(error), backoff_delay(attempt, base_delay, max_delay))
+    remaining = remaining_seconds()
+    if remaining is not None and delay >= remaining:
+        raise DeadlineExceeded("retry backoff") from error
+    return delay
+
+
+def call_with_retries(fn: Callable[[], Any], max_retries: int = 3, base_delay: float = 0.5,
+                      max_delay: float = 20.0) -> Any:
+    """
+    Call a Groq SDK function, retrying rate limits and transient failures
+
+    Args:
+        fn (Callable): Zero-argument function performing the request
+        max_retries (int): Retries after the first attempt
+
+    Returns:
+        Any: The function's result; the last error is raised when retries run out
+
+    Raises:
+        DeadlineExceeded: The request's deadline passed, or would pass
+            during the backoff
+        CircuitOpenError: The model's circuit is open
+    """
+    with tracer.span("llm.call") as span:
+        for attempt in range(max_retries + 1):
+            try:
+                return fn()
+            except Exception as e:
+                delay = _retry_delay(e, attempt, max_retries, base_delay, max_delay)
+                span.add_to_attribute("retries", 1)
+                span.add_to_attribute("retry_wait_seconds", delay)
+                time.sleep(delay)
+
+
+async def acall_with_retries(fn: Callable[[], Awaitable[Any]], max_retries: int = 3,
+                             base_delay: float = 0.5, max_delay: float = 20.0) -> Any:
+    """
+    Async variant of call_with_retries
+    """
+    with tracer.span("llm.call") as span:
+        for attempt in range(max_retries + 1):
+            try:
+                return await fn()
+            except Exception as e:
+                delay = _retry_delay(e, attempt, max_retries, base_delay, max_delay)
+                span.add_to_attribute("retries", 1)
+                span.add_to_attribute("retry_wait_seconds", delay)
+                await asyncio.sleep(delay)
@@ -0,0 +1,212 @@
+# tools/image_cache.py
+import base64
+import io
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from PIL import Image
+
+from tools.answer_cache import normalize_query
+from utils.helpers import compute_dhash, hamming_distance
+from utils.metrics import metrics
+
+_SIGNED_64 = 1 << 63
+# The 64-bit hash is indexed as HASH_BANDS bands of 8 bits. Two hashes that
+# differ in fewer bits than there are bands agree exactly on at least one
+# band, so a lookup only compares rows sharing a band with the query hash.
+HASH_BANDS = 8
+_BAND_BITS = 64 // HASH_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+
+def _to_signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= _SIGNED_64 else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def hash_band_keys(image_hash: int):
+    """
+    Index keys of a hash's bands: band number in the high bits, band value below
+    """
+    return [(band << _BAND_BITS) | ((image_hash >> (band * _BAND_BITS)) & _BAND_MASK)
+            for band in range(HASH_BANDS)]
+
+
+def image_hash_from_base64(image_data: str) -> Optional[int]:
+    """
+    Decode base64 image data and return its dHash, or None if it cannot be decoded
+    """
+    try:
+        with Image.open(io.BytesIO(base64.b64decode(image_data))) as image:
+            return compute_dhash(image)
+    except Exception:
+        return None
+
+
+class ImageAnalysisCache:
+    """
+    Disk-backed cache of vision analyses keyed on a perceptual image hash and
+    the normalized query.
+
+    Lookups match any stored hash within max_distance bits, so re-compressed
+    or lightly re-cropped uploads of the same photo reuse the earlier result.
+    Hash bands are indexed, so a lookup only compares the few rows sharing a
+    band with the query hash instead of every row for the query (a full scan
+    is only needed when max_distance is HASH_BANDS or more). The store holds
+    at most max_entries rows; the least recently used are evicted first.
+    """
+
+    def __init__(self, path: str = ":memory:", max_entries: int = 5000, max_distance: int = 6,
+                 ttl_seconds: Optional[float] = 30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS analyses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                image_hash INTEGER NOT NULL,
+                query TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS analysis_bands (
+                band_key INTEGER NOT NULL,
+                analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_query ON analyses (query)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_access ON analyses (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_key ON analysis_bands (band_key, analysis_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_analysis ON analysis_bands (analysis_id)")
+        # Rows stored before hash bands were indexed
+        unindexed = self._conn.execute(
+            "SELECT id, image_hash FROM analyses WHERE id NOT IN (SELECT analysis_id FROM analysis_bands)"
+        ).fetchall()
+        for row_id, stored_hash in unindexed:
+            self._insert_bands(row_id, _to_unsigned(stored_hash))
+        self._conn.commit()
+        # Row count, kept in step so eviction does not count rows on every put
+        self._size = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def _insert_bands(self, row_id: int, image_hash: int) -> None:
+        self._conn.executemany(
+            "INSERT INTO analysis_bands (band_key, analysis_id) VALUES (?, ?)",
+            [(key, row_id) for key in hash_band_keys(image_hash)],
+        )
+
+    @staticmethod
+    def _normalize(query: Optional[str], namespace: str) -> str:
+        # The namespace keeps results of different prompts apart
+        return f"{namespace}:{' '.join(normalize_query(query or ''))}"
+
+    def get(self, image_hash: int, query: Optional[str] = None, namespace: str = "analysis") -> Optional[str]:
+        """
+        Return a cached analysis for a visually similar image and the same query
+
+        Args:
+            image_hash (int): dHash of the decoded image
+            query (str, optional): User query sent with the image
+            namespace (str): Prompt the cached result was produced with
+
+        Returns:
+            Optional[str]: Cached analysis, or None on a miss
+        """
+        normalized = self._normalize(query, namespace)
+        now = time.time()
+        with self._lock:
+            if self.ttl_seconds is not None:
+                expired = self._conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._size -= expired.rowcount
+            if self.max_distance < HASH_BANDS:
+                keys = hash_band_keys(image_hash)
+                # CROSS JOIN keeps the band index as the outer loop; most uploads
+                # share the default query, so its index would select them all
+                rows = self._conn.execute(
+                    "SELECT DISTINCT a.id, a.image_hash, a.result FROM analysis_bands b "
+                    "CROSS JOIN analyses a ON a.id = b.analysis_id "
+                    f"WHERE b.band_key IN ({', '.join('?' * len(keys))}) AND a.query = ?",
+                    (*keys, normalized),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id, image_hash, result FROM analyses WHERE query = ?", (normalized,)
+                ).fetchall()
+
+            best = None
+            for row_id, stored_hash, result in rows:
+                distance = hamming_distance(image_hash, _to_unsigned(stored_hash))
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, row_id, result)
+
+            if best is None:
+                metrics.increment("image_cache.misses")
+                return None
+
+            self._conn.execute("UPDATE analyses SET last_access = ? WHERE id = ?", (now, best[1]))
+            self._conn.commit()
+            metrics.increment("image_cache.hits")
+            return best[2]
+
+    def put(self, image_hash: int, query: Optional[str], result: str, namespace: str = "analysis") -> None:
+        """
+        Store an analysis, evicting the least recently used rows beyond max_entries
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO analyses (image_hash, query, result, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (_to_signed(image_hash), self._normalize(query, namespace), result, now, now),
+            )
+            self._insert_bands(cursor.lastrowid, image_hash)
+            self._size += 1
+            if self._size > self.max_entries:
+                evicted = self._conn.execute(
+                    "DELETE FROM analyses WHERE id IN (SELECT id FROM analyses ORDER BY last_access LIMIT ?)",
+                    (self._size - self.max_entries,),
+                )
+                self._size -= evicted.rowcount
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageAnalysisCache:
+    """
+    Return the process-wide image analysis cache.
+
+    The store lives in IMAGE_CACHE_PATH when set, otherwise in memory.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageAnalysisCache(
+                path=os.environ.get("IMAGE_CACHE_PATH", ":memory:"),
+                max_entries=int(os.environ.get("IMAGE_CACHE_MAX_ENTRIES", "5000")),
+            )
+        return _default_cache
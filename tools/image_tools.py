@@ -1,45 +1,286 @@
 # tools/image_tools.py
-from groq import Groq
+import asyncio
 import base64
+from typing import Iterator, List, Union
+from tools.groq_client import acall_with_retries, call_with_retries, get_async_groq_client, get_groq_client
+from tools.image_cache import get_image_cache, image_hash_from_base64
+from tools.issue_reports import REPORT_INSTRUCTIONS, parse_report
+from tools.model_registry import (DEFAULT_TIERS, accept_analysis, accept_report, acascade, cascade,
+                                  get_model_registry)
+from tools.prompt_assembly import PromptBuilder
+from utils.deadlines import DeadlineExceeded
+from utils.image_preprocessing import MAX_IMAGES_PER_REQUEST, detect_mime_type, pack_images
 
-def analyze_property_image(image_data: str, query: str, api_key: str) -> str:
+# Default first-tier vision model; calls take theirs from the model registry
+VISION_MODEL = DEFAULT_TIERS["vision"]
+ERROR_PREFIX = "Error analyzing image:"
+
+SINGLE_IMAGE_INSTRUCTIONS = """Analyze this property image and identify:
+    1. Any visible damage or issues
+    2. Severity of problems
+    3. Potential causes
+    4. Recommended solutions"""
+MULTI_IMAGE_INSTRUCTIONS = """The photos show the same property, possibly from different angles.
+    Photos may be tiled into numbered contact sheets. Produce ONE consolidated report that identifies:
+    1. Any visible damage or issues (reference photo numbers)
+    2. Severity of problems
+    3. Potential causes
+    4. Recommended solutions"""
+
+def _vision_messages(stage: str, image_data: Union[str, List[str]], query: str, mime_type: str = None,
+                     conversation_context: str = None, output_format: str = None) -> list:
+    if isinstance(image_data, str):
+        images = [image_data]
+        mime_types = [mime_type or detect_mime_type(image_data)]
+        instructions = SINGLE_IMAGE_INSTRUCTIONS
+    else:
+        images = pack_images(list(image_data), MAX_IMAGES_PER_REQUEST)
+        mime_types = [detect_mime_type(data) for data in images]
+        instructions = MULTI_IMAGE_INSTRUCTIONS
+
+    # Instructions form the cacheable system prefix; only the photo count,
+    # history and question vary per request
+    builder = (PromptBuilder(stage)
+               .static("instructions", instructions)
+               .static("output", output_format))
+    if not isinstance(image_data, str):
+        builder.add("photos", f"Number of photos: {len(image_data)}")
+    prompt = (builder
+              .add("history", conversation_context, header="Previous conversation (for context only):")
+              .add("query", query, header="Additional context:", dedupe=False)
+              .build())
+
+    content = [{"type": "text", "text": prompt.dynamic_text}] if prompt.dynamic_text else []
+    for data, data_mime_type in zip(images, mime_types):
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{data_mime_type};base64,{data}"
+            }
+        })
+    return [{"role": "system", "content": prompt.static_text}, {"role": "user", "content": content}]
+
+def build_image_messages(image_data: Union[str, List[str]], query: str, mime_type: str = None,
+                         conversation_context: str = None) -> list:
+    """
+    Build the vision chat messages for one or more property images
+
+    Several images are sent in a single request for one consolidated report.
+    Beyond the model's image limit they are tiled into numbered contact sheets.
+    Images are always separate image parts; the text never carries base64.
+    """
+    return _vision_messages("vision", image_data, query, mime_type, conversation_context)
+
+def _cache_hash(image_data: Union[str, List[str]], use_cache: bool):
+    # Only single-image analyses are cached
+    if not use_cache or not isinstance(image_data, str):
+        return None
+    return image_hash_from_base64(image_data)
+
+def _cache_lookup(image_data: Union[str, List[str]], query: str, use_cache: bool, namespace: str = "analysis"):
+    # Decodes the image and queries SQLite: the async tools run it in a thread
+    image_hash = _cache_hash(image_data, use_cache)
+    if image_hash is None:
+        return None, None
+    return image_hash, get_image_cache().get(image_hash, query, namespace=namespace)
+
+def analyze_property_image(image_data: Union[str, List[str]], query: str, api_key: str, use_cache: bool = True,
+                           mime_type: str = None, conversation_context: str = None) -> str:
     """
     Analyze property image using Groq's VLM
+
+    image_data may be a list of base64 images, analyzed together in a single
+    vision request.
+
+    The MIME type is detected from the payload unless given. Results are
+    cached on the image's perceptual hash and the query, so repeated uploads
+    of the same photo skip the vision call.
     """
-    client = Groq(api_key=api_key)
-    
+    image_hash = _cache_hash(image_data, use_cache)
+    if image_hash is not None:
+        cached = get_image_cache().get(image_hash, query)
+        if cached is not None:
+            return cached
+
+    client = get_groq_client(api_key)
+    messages = build_image_messages(image_data, query, mime_type, conversation_context)
+
+    def attempt(model):
+        completion = call_with_retries(lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            max_completion_tokens=1024,
+            top_p=1,
+            stream=False
+        ))
+        return completion.choices[0].message.content
+
     try:
-        completion = client.chat.completions.create(
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": f"""Analyze this property image and identify:
-                            1. Any visible damage or issues
-                            2. Severity of problems
-                            3. Potential causes
-                            4. Recommended solutions
-                            
-                            Additional context: {query}"""
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_data}"
-                            }
-                        }
-                    ]
-                }
-            ],
+        result = cascade("vision", attempt, accept_analysis)
+        if image_hash is not None:
+            get_image_cache().put(image_hash, query, result)
+        return result
+    except DeadlineExceeded:
+        # The query's budget ran out; that is not the image's fault
+        raise
+    except Exception as e:
+        return f"{ERROR_PREFIX} {str(e)}"
+
+async def aanalyze_property_image(image_data: Union[str, List[str]], query: str, api_key: str, use_cache: bool = True,
+                                  mime_type: str = None, conversation_context: str = None) -> str:
+    """
+    Async variant of analyze_property_image built on AsyncGroq, so many
+    analyses can be awaited concurrently on one event loop
+    """
+    image_hash, cached = await asyncio.to_thread(_cache_lookup, image_data, query, use_cache)
+    if cached is not None:
+        return cached
+
+    client = get_async_groq_client(api_key)
+    messages = build_image_messages(image_data, query, mime_type, conversation_context)
+
+    async def attempt(model):
+        completion = await acall_with_retries(lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
             temperature=0.7,
             max_completion_tokens=1024,
             top_p=1,
             stream=False
-        )
-        
+        ))
         return completion.choices[0].message.content
+
+    try:
+        result = await acascade("vision", attempt, accept_analysis)
+        if image_hash is not None:
+            await asyncio.to_thread(get_image_cache().put, image_hash, query, result)
+        return result
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        return f"{ERROR_PREFIX} {str(e)}"
+
+def stream_property_image_analysis(image_data: Union[str, List[str]], query: str, api_key: str, use_cache: bool = True,
+                                   mime_type: str = None, conversation_context: str = None) -> Iterator[str]:
+    """
+    Streaming variant of analyze_property_image
+
+    A stream cannot be retried on a larger model once it has been shown, so
+    it always uses the stage's first model.
+
+    Yields:
+        str: Text chunks as the vision model generates them
+    """
+    image_hash = _cache_hash(image_data, use_cache)
+    if image_hash is not None:
+        cached = get_image_cache().get(image_hash, query)
+        if cached is not None:
+            yield cached
+            return
+
+    client = get_groq_client(api_key)
+
+    try:
+        stream = call_with_retries(lambda: client.chat.completions.create(
+            model=get_model_registry().model("vision"),
+            messages=build_image_messages(image_data, query, mime_type, conversation_context),
+            temperature=0.7,
+            max_completion_tokens=1024,
+            top_p=1,
+            stream=True
+        ))
+
+        chunks = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                chunks.append(delta)
+                yield delta
+
+        if image_hash is not None and chunks:
+            get_image_cache().put(image_hash, query, "".join(chunks))
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        return f"Error analyzing image: {str(e)}"
+        yield f"{ERROR_PREFIX} {str(e)}"
+
+def build_report_messages(image_data: Union[str, List[str]], query: str, mime_type: str = None,
+                          conversation_context: str = None) -> list:
+    """
+    Vision messages asking for a structured JSON issue report
+    """
+    return _vision_messages("issue_report", image_data, query, mime_type, conversation_context,
+                            output_format=REPORT_INSTRUCTIONS)
+
+def _report_request(model, messages) -> dict:
+    return dict(
+        model=model,
+        messages=messages,
+        temperature=0.2,
+        max_completion_tokens=1024,
+        top_p=1,
+        response_format={"type": "json_object"},
+        stream=False
+    )
+
+def analyze_property_report(image_data: Union[str, List[str]], query: str, api_key: str, use_cache: bool = True,
+                            mime_type: str = None, conversation_context: str = None) -> dict:
+    """
+    Analyze property images into a structured report (see tools.issue_reports)
+    using JSON-mode output
+
+    Returns:
+        dict: Normalized report with "summary", "location", "issues" and
+            "overall_severity"
+
+    Invalid JSON or an empty report escalates to the next vision tier.
+
+    Raises:
+        Exception: API errors after retries, or ValueError for invalid JSON
+    """
+    image_hash = _cache_hash(image_data, use_cache)
+    if image_hash is not None:
+        cached = get_image_cache().get(image_hash, query, namespace="issue_report")
+        if cached is not None:
+            return parse_report(cached)
+
+    client = get_groq_client(api_key)
+    messages = build_report_messages(image_data, query, mime_type, conversation_context)
+
+    def attempt(model):
+        completion = call_with_retries(lambda: client.chat.completions.create(**_report_request(model, messages)))
+        text = completion.choices[0].message.content
+        return text, parse_report(text)
+
+    text, report = cascade("issue_report", attempt, lambda result: accept_report(result[1]))
+    if image_hash is not None:
+        get_image_cache().put(image_hash, query, text, namespace="issue_report")
+    return report
+
+async def aanalyze_property_report(image_data: Union[str, List[str]], query: str, api_key: str,
+                                   use_cache: bool = True, mime_type: str = None,
+                                   conversation_context: str = None) -> dict:
+    """
+    Async variant of analyze_property_report
+    """
+    image_hash, cached = await asyncio.to_thread(_cache_lookup, image_data, query, use_cache, "issue_report")
+    if cached is not None:
+        return parse_report(cached)
+
+    client = get_async_groq_client(api_key)
+    messages = build_report_messages(image_data, query, mime_type, conversation_context)
+
+    async def attempt(model):
+        completion = await acall_with_retries(
+            lambda: client.chat.completions.create(**_report_request(model, messages))
+        )
+        text = completion.choices[0].message.content
+        return text, parse_report(text)
+
+    text, report = await acascade("issue_report", attempt, lambda result: accept_report(result[1]))
+    if image_hash is not None:
+        await asyncio.to_thread(get_image_cache().put, image_hash, query, text, "issue_report")
+    return report
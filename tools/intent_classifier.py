@@ -0,0 +1,288 @@
+# tools/intent_classifier.py
+import json
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ISSUE_DETECTION = "issue_detection"
+TENANCY_FAQ = "tenancy_faq"
+ASK_CLARIFICATION = "ask_clarification"
+
+ROUTES = (ISSUE_DETECTION, TENANCY_FAQ, ASK_CLARIFICATION)
+
+# Keywords and their weights. Tokens must match a keyword (or one of its
+# KEYWORD_FORMS) exactly, so "law" does not fire on "lawn"; phrases must match
+# whole words.
+ISSUE_KEYWORDS = {
+    "leak": 3.0, "damp": 3.0, "mould": 3.0, "mold": 3.0, "mildew": 3.0,
+    "crack": 3.0, "stain": 2.0, "rot": 2.0, "water damage": 3.0, "drip": 2.5,
+    "flood": 2.5, "ceiling": 1.5, "wall": 1.0, "roof": 1.5, "pipe": 2.0,
+    "plumbing": 2.0, "boiler": 2.0, "heating": 1.5, "wiring": 2.0, "electric": 1.5,
+    "broken": 2.0, "damage": 2.0, "peeling": 2.5, "condensation": 2.5,
+    "fungus": 2.5, "infestation": 2.5, "pest": 2.0, "rodent": 2.5, "window": 1.0,
+    "inspect": 1.5, "repair": 1.0, "fix": 1.0, "photo": 2.0, "image": 2.0,
+    "picture": 2.0,
+}
+
+TENANCY_KEYWORDS = {
+    "tenant": 3.0, "landlord": 2.0, "lease": 3.0, "rent": 2.0, "deposit": 3.0,
+    "evict": 3.0, "notice": 2.0, "contract": 2.0, "agreement": 2.0,
+    "section 21": 3.0, "section 8": 3.0, "sublet": 3.0, "letting": 2.0,
+    "legal": 1.5, "law": 2.0, "rights": 1.5, "break clause": 3.0,
+    "renew": 2.0, "move out": 2.0, "guarantor": 3.0, "arrears": 3.0,
+    "inventory": 2.0, "fee": 1.5,
+}
+
+# Inflections that count as the keyword itself
+KEYWORD_FORMS = {
+    "leak": ("leaks", "leaked", "leaking", "leaky", "leakage"),
+    "damp": ("dampness",),
+    "mould": ("mouldy", "moulds"),
+    "mold": ("moldy", "molds"),
+    "crack": ("cracks", "cracked", "cracking"),
+    "stain": ("stains", "stained", "staining"),
+    "rot": ("rots", "rotten", "rotting", "rotted"),
+    "drip": ("drips", "dripping", "dripped"),
+    "flood": ("floods", "flooded", "flooding"),
+    "ceiling": ("ceilings",),
+    "wall": ("walls",),
+    "roof": ("roofs", "roofing"),
+    "pipe": ("pipes", "pipework"),
+    "plumbing": ("plumber", "plumbers"),
+    "boiler": ("boilers",),
+    "heating": ("heater", "heaters"),
+    "wiring": ("wire", "wires"),
+    "electric": ("electrics", "electrical", "electricity"),
+    "damage": ("damaged", "damages"),
+    "peeling": ("peel", "peels", "peeled"),
+    "fungus": ("fungal", "fungi"),
+    "infestation": ("infested", "infest"),
+    "pest": ("pests",),
+    "rodent": ("rodents",),
+    "window": ("windows",),
+    "inspect": ("inspection", "inspections", "inspected", "inspector"),
+    "repair": ("repairs", "repaired", "repairing"),
+    "fix": ("fixed", "fixes", "fixing"),
+    "photo": ("photos", "photograph", "photographs"),
+    "image": ("images",),
+    "picture": ("pictures",),
+    "tenant": ("tenants", "tenancy", "tenancies"),
+    "landlord": ("landlords", "landlady"),
+    "lease": ("leases", "leased", "leasehold", "leaseholder"),
+    "rent": ("rents", "rented", "renting", "rental", "renter", "renters"),
+    "deposit": ("deposits",),
+    "evict": ("evicts", "evicted", "evicting", "eviction", "evictions"),
+    "notice": ("notices",),
+    "contract": ("contracts",),
+    "agreement": ("agreements",),
+    "sublet": ("sublets", "subletting"),
+    "legal": ("legally", "illegal", "illegally"),
+    "law": ("laws",),
+    "renew": ("renews", "renewed", "renewal"),
+    "guarantor": ("guarantors",),
+    "fee": ("fees",),
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-case word tokenizer shared by the rules and the trained model
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class IntentClassifier:
+    """
+    Local router that predicts the route label without an LLM round trip.
+
+    Scores come from weighted keyword rules, optionally combined with a
+    multinomial Naive Bayes model trained on logged routing decisions.
+    """
+
+    def __init__(self, temperature: float = 1.0, model_weight: float = 1.0):
+        self.temperature = temperature
+        self.model_weight = model_weight
+        self._rules = {
+            ISSUE_DETECTION: self._split_keywords(ISSUE_KEYWORDS),
+            TENANCY_FAQ: self._split_keywords(TENANCY_KEYWORDS),
+        }
+        self._log_priors: Dict[str, float] = {}
+        self._log_likelihoods: Dict[str, Dict[str, float]] = {}
+        self._unseen_log_likelihood: Dict[str, float] = {}
+
+    @staticmethod
+    def _split_keywords(keywords: Dict[str, float]) -> Tuple[Dict[str, float], Tuple]:
+        # Single words (and their forms) are looked up per token, phrases
+        # against the space-joined tokens
+        words = {}
+        for keyword, weight in keywords.items():
+            if " " not in keyword:
+                for form in (keyword,) + KEYWORD_FORMS.get(keyword, ()):
+                    words[form] = weight
+        phrases = tuple((f" {k} ", w) for k, w in keywords.items() if " " in k)
+        return words, phrases
+
+    @property
+    def is_trained(self) -> bool:
+        return bool(self._log_priors)
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> "IntentClassifier":
+        """
+        Train the Naive Bayes component
+
+        Args:
+            samples (Iterable): (query, route) pairs, route being one of ROUTES
+
+        Returns:
+            IntentClassifier: self, for chaining
+        """
+        label_counts = defaultdict(int)
+        token_counts = defaultdict(lambda: defaultdict(int))
+        vocabulary = set()
+
+        for query, route in samples:
+            if route not in ROUTES:
+                continue
+            label_counts[route] += 1
+            for token in tokenize(query):
+                token_counts[route][token] += 1
+                vocabulary.add(token)
+
+        total = sum(label_counts.values())
+        if not total:
+            return self
+
+        vocab_size = len(vocabulary) + 1
+        self._log_priors = {}
+        self._log_likelihoods = {}
+        self._unseen_log_likelihood = {}
+        for route, count in label_counts.items():
+            # Laplace smoothing
+            route_total = sum(token_counts[route].values()) + vocab_size
+            self._log_priors[route] = math.log(count / total)
+            self._log_likelihoods[route] = {
+                token: math.log((c + 1) / route_total) for token, c in token_counts[route].items()
+            }
+            self._unseen_log_likelihood[route] = math.log(1 / route_total)
+        return self
+
+    @classmethod
+    def from_routing_log(cls, path: str, **kwargs) -> "IntentClassifier":
+        """
+        Build a classifier trained on a JSONL routing log written by RoutingLog
+        """
+        classifier = cls(**kwargs)
+        if path and os.path.exists(path):
+            classifier.fit(RoutingLog.read(path))
+        return classifier
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """
+        Raw (unnormalized) score per route
+        """
+        lowered = text.lower()
+        tokens = tokenize(lowered)
+        scores = {route: 0.0 for route in ROUTES}
+
+        joined = f" {' '.join(tokens)} "
+        for route, (words, phrases) in self._rules.items():
+            for token in tokens:
+                scores[route] += words.get(token, 0.0)
+            for phrase, weight in phrases:
+                if phrase in joined:
+                    scores[route] += weight
+
+        if self.is_trained and tokens:
+            log_posteriors = {}
+            for route, prior in self._log_priors.items():
+                likelihoods = self._log_likelihoods[route]
+                unseen = self._unseen_log_likelihood[route]
+                log_posteriors[route] = prior + sum(likelihoods.get(t, unseen) for t in tokens)
+            best = max(log_posteriors.values())
+            for route, value in log_posteriors.items():
+                # Relative log-odds against the best label, averaged per token
+                scores[route] += self.model_weight * (value - best) / len(tokens)
+
+        return scores
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """
+        Predict a route for a user query
+
+        Args:
+            text (str): User's text query
+
+        Returns:
+            Tuple[str, float]: (route, confidence in [0, 1])
+        """
+        scores = self.scores(text or "")
+        top = max(scores.values())
+        exps = {route: math.exp((s - top) / self.temperature) for route, s in scores.items()}
+        total = sum(exps.values())
+        route = max(exps, key=exps.get)
+        if exps[ASK_CLARIFICATION] == exps[route]:
+            # No evidence either way
+            route = ASK_CLARIFICATION
+        return route, exps[route] / total
+
+
+class RoutingLog:
+    """
+    Append-only JSONL log of routing decisions, used to train IntentClassifier
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Shared by all sessions of an agent pool
+        self._lock = threading.Lock()
+
+    def record(self, query: str, route: str, has_image: bool = False) -> None:
+        if route not in ROUTES:
+            return
+        line = json.dumps({"query": query, "route": route, "has_image": has_image}) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    @staticmethod
+    def read(path: str) -> List[Tuple[str, str]]:
+        samples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                samples.append((entry.get("query", ""), entry.get("route", "")))
+        return samples
+
+
+def route_by_rules(text: str, has_image: bool = False) -> Optional[str]:
+    """
+    Routes that are certain without a model: the router prompt sends every
+    query with an image to issue detection, and there is nothing to route
+    in an empty message
+
+    Returns:
+        Optional[str]: The route, or None when a classifier has to decide
+    """
+    if has_image:
+        return ISSUE_DETECTION
+    if not _TOKEN_PATTERN.search((text or "").lower()):
+        return ASK_CLARIFICATION
+    return None
+
+
+def load_default_classifier(routing_log_path: Optional[str] = None) -> IntentClassifier:
+    """
+    Return a classifier trained on the routing log if one is available
+    """
+    path = routing_log_path or os.environ.get("ROUTING_LOG_PATH")
+    return IntentClassifier.from_routing_log(path) if path else IntentClassifier()
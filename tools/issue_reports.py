@@ -0,0 +1,377 @@
+# tools/issue_reports.py
+"""
+Structured issue reports and their SQLite store.
+
+The vision model is asked for a JSON report (issues with severity, category,
+recommended trade and location). Reports are validated, rendered as text for
+the chat, and persisted with indexes on property, severity, category and date
+so portfolio queries such as "all High severity damp issues this month" run
+in milliseconds without calling an LLM.
+
+Usage:
+    python -m tools.issue_reports query --severity High --category damp --since 2026-10-01
+    python -m tools.issue_reports counts --by category --property-id flat-12
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+SEVERITIES = ("Low", "Medium", "High")
+SEVERITY_RANK = {severity: rank for rank, severity in enumerate(SEVERITIES, 1)}
+CATEGORIES = (
+    "damp", "water_damage", "mould", "structural", "electrical", "plumbing", "roofing",
+    "heating", "windows_doors", "pests", "fire_safety", "cosmetic", "other",
+)
+TRADES = (
+    "plumber", "electrician", "roofer", "builder", "damp_specialist", "gas_engineer",
+    "carpenter", "glazier", "pest_control", "decorator", "surveyor", "general_handyman",
+)
+
+REPORT_INSTRUCTIONS = f"""Respond with a JSON object only, in this format:
+{{
+  "summary": "one or two sentence overview",
+  "location": "room or area shown, e.g. bathroom ceiling",
+  "issues": [
+    {{
+      "title": "short name of the issue",
+      "description": "what is visible and the likely cause",
+      "severity": one of {list(SEVERITIES)},
+      "category": one of {list(CATEGORIES)},
+      "recommended_trade": one of {list(TRADES)},
+      "location": "where in the image or property",
+      "recommended_action": "next step"
+    }}
+  ],
+  "needs_professional_inspection": true or false
+}}
+Use an empty "issues" list if no problems are visible."""
+
+ReportTime = Union[None, float, int, str, datetime]
+
+
+def _choice(value, choices, default):
+    text = re.sub(r"[\s/-]+", "_", str(value or "").strip().lower())
+    for choice in choices:
+        if text == choice.lower():
+            return choice
+    return default
+
+
+def normalize_report(data: Dict) -> Dict:
+    """
+    Validate a model-produced report and coerce its fields to the allowed
+    values; unknown categories become "other" and unknown severities "Medium"
+    """
+    issues = []
+    for issue in data.get("issues") or []:
+        if not isinstance(issue, dict):
+            continue
+        issues.append({
+            "title": str(issue.get("title") or "Unnamed issue").strip(),
+            "description": str(issue.get("description") or "").strip(),
+            "severity": _choice(issue.get("severity"), SEVERITIES, "Medium"),
+            "category": _choice(issue.get("category"), CATEGORIES, "other"),
+            "recommended_trade": _choice(issue.get("recommended_trade"), TRADES, "surveyor"),
+            "location": str(issue.get("location") or data.get("location") or "").strip(),
+            "recommended_action": str(issue.get("recommended_action") or "").strip(),
+        })
+    severity = max((issue["severity"] for issue in issues), key=SEVERITY_RANK.get, default=None)
+    return {
+        "summary": str(data.get("summary") or "").strip(),
+        "location": str(data.get("location") or "").strip(),
+        "issues": issues,
+        "overall_severity": severity,
+        "needs_professional_inspection": bool(data.get("needs_professional_inspection")),
+    }
+
+
+def parse_report(text: str) -> Dict:
+    """
+    Parse the JSON report returned by the model
+
+    Raises:
+        ValueError: If the text holds no JSON object
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # Tolerate prose or code fences around the object
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        if not match:
+            raise ValueError("Model response did not contain a JSON report")
+        data = json.loads(match.group(0))
+    if not isinstance(data, dict):
+        raise ValueError("Model response was not a JSON object")
+    return normalize_report(data)
+
+
+def render_report(report: Dict) -> str:
+    """
+    Render a structured report as readable chat text
+    """
+    if not report["issues"]:
+        return f"{report['summary'] or 'No property issues are visible in the image.'}"
+
+    lines = []
+    if report["summary"]:
+        lines += [report["summary"], ""]
+    if report["location"]:
+        lines.append(f"Location: {report['location']}")
+    lines += [f"Overall severity: {report['overall_severity']}", ""]
+    for number, issue in enumerate(report["issues"], 1):
+        lines.append(f"{number}. {issue['title']} (severity: {issue['severity']}, "
+                     f"{issue['category'].replace('_', ' ')})")
+        if issue["description"]:
+            lines.append(f"   {issue['description']}")
+        if issue["recommended_action"]:
+            lines.append(f"   Next step: {issue['recommended_action']}")
+        lines.append(f"   Recommended trade: {issue['recommended_trade'].replace('_', ' ')}")
+    if report["needs_professional_inspection"]:
+        lines += ["", "A professional inspection is recommended."]
+    return "\n".join(lines)
+
+
+def _timestamp(value: ReportTime) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class IssueReportStore:
+    """
+    SQLite store of structured issue reports, one row per report and one per
+    issue, indexed for portfolio queries
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                property_id TEXT,
+                created_at REAL NOT NULL,
+                query TEXT,
+                summary TEXT,
+                location TEXT,
+                overall_severity TEXT,
+                report_json TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS issues (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,
+                property_id TEXT,
+                created_at REAL NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                severity TEXT NOT NULL,
+                severity_rank INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                recommended_trade TEXT,
+                location TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_reports_property ON reports (property_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_reports_created ON reports (created_at);
+            CREATE INDEX IF NOT EXISTS idx_issues_property ON issues (property_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_issues_severity ON issues (severity, category, created_at);
+            CREATE INDEX IF NOT EXISTS idx_issues_category ON issues (category, created_at);
+            CREATE INDEX IF NOT EXISTS idx_issues_created ON issues (created_at);
+            """
+        )
+        self._conn.commit()
+
+    def add(self, report: Dict, property_id: Optional[str] = None, query: Optional[str] = None,
+            created_at: ReportTime = None) -> int:
+        """
+        Persist a normalized report
+
+        Args:
+            report (Dict): Output of parse_report or normalize_report
+            property_id (str, optional): Property the photos belong to
+            query (str, optional): User query sent with the photos
+            created_at (optional): Report time, defaults to now
+
+        Returns:
+            int: Report ID
+        """
+        created = _timestamp(created_at) or time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO reports (property_id, created_at, query, summary, location, overall_severity, "
+                "report_json) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (property_id, created, query, report["summary"], report["location"],
+                 report["overall_severity"], json.dumps(report)),
+            )
+            report_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO issues (report_id, property_id, created_at, title, description, severity, "
+                "severity_rank, category, recommended_trade, location) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (report_id, property_id, created, issue["title"], issue["description"], issue["severity"],
+                     SEVERITY_RANK[issue["severity"]], issue["category"], issue["recommended_trade"],
+                     issue["location"])
+                    for issue in report["issues"]
+                ],
+            )
+            self._conn.commit()
+        return report_id
+
+    @staticmethod
+    def _filters(property_id, severity, min_severity, category, since, until):
+        clauses, params = [], []
+        if property_id is not None:
+            clauses.append("property_id = ?")
+            params.append(property_id)
+        if severity is not None:
+            clauses.append("severity = ?")
+            params.append(_choice(severity, SEVERITIES, severity))
+        if min_severity is not None:
+            clauses.append("severity_rank >= ?")
+            params.append(SEVERITY_RANK[_choice(min_severity, SEVERITIES, "Low")])
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(_choice(category, CATEGORIES, category))
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(_timestamp(until))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_issues(self, property_id: Optional[str] = None, severity: Optional[str] = None,
+                     min_severity: Optional[str] = None, category: Optional[str] = None,
+                     since: ReportTime = None, until: ReportTime = None, limit: int = 100) -> List[Dict]:
+        """
+        Find issues across reports, newest first
+
+        Args:
+            property_id (str, optional): Only this property
+            severity (str, optional): Exact severity (Low, Medium, High)
+            min_severity (str, optional): This severity or worse
+            category (str, optional): One of CATEGORIES
+            since, until (optional): Time range as datetime, ISO string or Unix time
+            limit (int): Maximum rows
+
+        Returns:
+            List[Dict]: Issue rows
+        """
+        where, params = self._filters(property_id, severity, min_severity, category, since, until)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, report_id, property_id, created_at, title, description, severity, category, "
+                f"recommended_trade, location FROM issues{where} ORDER BY created_at DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self, by: str = "category", property_id: Optional[str] = None, severity: Optional[str] = None,
+               min_severity: Optional[str] = None, category: Optional[str] = None,
+               since: ReportTime = None, until: ReportTime = None) -> Dict[str, int]:
+        """
+        Count issues grouped by "category", "severity", "property_id" or
+        "recommended_trade", with the same filters as query_issues
+        """
+        if by not in ("category", "severity", "property_id", "recommended_trade"):
+            raise ValueError(f"Cannot group issues by '{by}'")
+        where, params = self._filters(property_id, severity, min_severity, category, since, until)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {by}, COUNT(*) FROM issues{where} GROUP BY {by} ORDER BY COUNT(*) DESC", params
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def get_report(self, report_id: int) -> Optional[Dict]:
+        """
+        Return a stored report with its metadata
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, property_id, created_at, query, report_json FROM reports WHERE id = ?", (report_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        report = json.loads(row["report_json"])
+        report.update(id=row["id"], property_id=row["property_id"], created_at=row["created_at"],
+                      query=row["query"])
+        return report
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_report_store() -> Optional[IssueReportStore]:
+    """
+    Return the process-wide report store, kept in ISSUE_REPORT_DB, or None
+    when that is not set
+    """
+    global _default_store
+    path = os.environ.get("ISSUE_REPORT_DB")
+    if not path:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = IssueReportStore(path)
+        return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query stored property issue reports")
+    parser.add_argument("command", choices=("query", "counts"))
+    parser.add_argument("--db", default=os.environ.get("ISSUE_REPORT_DB"), help="SQLite file (ISSUE_REPORT_DB)")
+    parser.add_argument("--property-id", default=None)
+    parser.add_argument("--severity", default=None, help="Exact severity: Low, Medium or High")
+    parser.add_argument("--min-severity", default=None, help="This severity or worse")
+    parser.add_argument("--category", default=None, help=f"One of: {', '.join(CATEGORIES)}")
+    parser.add_argument("--since", default=None, help="ISO date or time")
+    parser.add_argument("--until", default=None, help="ISO date or time")
+    parser.add_argument("--by", default="category", help="Grouping for counts")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("A database is required (--db or ISSUE_REPORT_DB)")
+
+    store = IssueReportStore(args.db)
+    filters = dict(property_id=args.property_id, severity=args.severity, min_severity=args.min_severity,
+                   category=args.category, since=args.since, until=args.until)
+    start = time.perf_counter()
+    if args.command == "query":
+        rows = store.query_issues(limit=args.limit, **filters)
+        elapsed = time.perf_counter() - start
+        for row in rows:
+            when = datetime.fromtimestamp(row["created_at"]).isoformat(timespec="minutes")
+            print(f"{when}  {row['property_id'] or '-':12} {row['severity']:6} {row['category']:14} "
+                  f"{row['title']} ({row['location']})")
+        print(f"{len(rows)} issues in {1000 * elapsed:.2f} ms")
+    else:
+        counts = store.counts(by=args.by, **filters)
+        elapsed = time.perf_counter() - start
+        for key, count in counts.items():
+            print(f"{key or '-':20} {count}")
+        print(f"Counted in {1000 * elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
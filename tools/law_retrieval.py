@@ -0,0 +1,439 @@
+# tools/law_retrieval.py
+"""
+Local retrieval over a tenancy-law corpus (statutes, guidance notes, FAQ),
+partitioned by jurisdiction.
+
+Corpus layout: one sub-directory per jurisdiction (named like the keys of
+JURISDICTION_ALIASES, e.g. "england", "scotland"); files in the corpus root
+go to the "general" partition. Supported files are .md and .txt (split into
+passages on paragraphs) and .jsonl (one passage per line with "text" and
+optional "jurisdiction" and "source" fields).
+
+Passages are ranked with BM25. When the index was built with an embedding
+model, dense vectors are stored in a memory-mapped float32 file and fused
+with the BM25 ranking. Rebuilding only re-reads and re-embeds files that
+changed since the last build.
+
+Usage:
+    python -m tools.law_retrieval build CORPUS_DIR --index law_index [--embed-model MODEL]
+    python -m tools.law_retrieval query "Can my landlord keep my deposit?" --index law_index
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from tools.answer_cache import content_tokens
+from utils.metrics import metrics
+
+try:
+    import numpy as np
+except ImportError:  # Dense vectors are optional
+    np = None
+
+GENERAL = "general"
+CORPUS_EXTENSIONS = (".md", ".txt", ".jsonl")
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+INDEX_VERSION = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Reciprocal rank fusion constant for combining BM25 and dense rankings
+RRF_K = 60
+
+Embedder = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+@dataclass
+class Passage:
+    """
+    A retrieved corpus passage
+    """
+    id: str
+    jurisdiction: str
+    source: str
+    text: str
+    score: float = 0.0
+
+
+def split_passages(text: str, max_words: int = 150) -> List[str]:
+    """
+    Split a document into passages of whole paragraphs, at most max_words
+    each (a longer single paragraph is kept whole). Markdown headings are
+    carried into the passages under them.
+    """
+    passages = []
+    heading = ""
+    current: List[str] = []
+    words = 0
+
+    def flush():
+        nonlocal current, words
+        if current:
+            body = "\n".join(current)
+            passages.append(f"{heading}\n{body}" if heading else body)
+        current, words = [], 0
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if paragraph.startswith("#") and "\n" not in paragraph:
+            flush()
+            heading = paragraph.lstrip("#").strip()
+            continue
+        length = len(paragraph.split())
+        if current and words + length > max_words:
+            flush()
+        current.append(paragraph)
+        words += length
+    flush()
+    return passages
+
+
+def load_sentence_embedder(model_name: str) -> Optional[Embedder]:
+    """
+    Embedder backed by sentence-transformers, or None if it is not installed
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    model = SentenceTransformer(model_name)
+    return lambda texts: model.encode(texts, normalize_embeddings=True)
+
+
+class _Partition:
+    """
+    BM25 postings for the passages of one jurisdiction; rows are contiguous
+    """
+
+    def __init__(self, start: int, token_lists: List[List[str]]):
+        self.start = start
+        self.end = start + len(token_lists)
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths = [len(tokens) for tokens in token_lists]
+        for offset, tokens in enumerate(token_lists):
+            for token, tf in Counter(tokens).items():
+                self.postings[token].append((start + offset, tf))
+        n = len(token_lists)
+        self.avg_length = (sum(self.lengths) / n) if n else 0.0
+        self.idf = {
+            token: math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            for token, rows in self.postings.items()
+        }
+
+    def search(self, tokens: List[str], limit: int) -> List[Tuple[int, float]]:
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokens):
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for row, tf in self.postings[token]:
+                length = self.lengths[row - self.start]
+                norm = K1 * (1 - B + B * length / self.avg_length)
+                scores[row] += idf * tf * (K1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+class LawIndex:
+    """
+    BM25 (plus optional dense vector) index of tenancy-law passages,
+    partitioned by jurisdiction
+    """
+
+    def __init__(self, index_dir: str, embedder: Optional[Embedder] = None):
+        """
+        Args:
+            index_dir (str): Directory holding the manifest and vectors
+            embedder (Callable, optional): Maps a list of texts to vectors.
+                Defaults to the model the index was built with, if installed.
+        """
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.passages: List[Dict] = manifest["passages"]
+        self.embed_model: Optional[str] = manifest.get("embed_model")
+        self.dim: Optional[int] = manifest.get("dim")
+
+        self.partitions: Dict[str, _Partition] = {}
+        start = 0
+        for jurisdiction, count in manifest["partitions"]:
+            tokens = [content_tokens(p["text"]) for p in self.passages[start:start + count]]
+            self.partitions[jurisdiction] = _Partition(start, tokens)
+            start += count
+
+        self.vectors = None
+        vectors_path = os.path.join(index_dir, VECTORS_FILE)
+        if np is not None and self.dim and self.passages and os.path.exists(vectors_path):
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode="r",
+                                     shape=(len(self.passages), self.dim))
+        if embedder is None and self.vectors is not None and self.embed_model:
+            embedder = load_sentence_embedder(self.embed_model)
+        self.embedder = embedder
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def _dense_search(self, query: str, partitions: List[_Partition], limit: int) -> List[Tuple[int, float]]:
+        query_vector = np.asarray(self.embedder([query])[0], dtype=np.float32)
+        ranked = []
+        for partition in partitions:
+            # Slicing the memmap reads only this partition's rows
+            scores = self.vectors[partition.start:partition.end] @ query_vector
+            top = np.argsort(-scores)[:limit]
+            ranked.extend((partition.start + int(i), float(scores[i])) for i in top)
+        return heapq.nlargest(limit, ranked, key=lambda item: item[1])
+
+    def search(self, query: str, jurisdiction: Optional[str] = None, k: int = 4) -> List[Passage]:
+        """
+        Retrieve the passages most relevant to a query
+
+        Args:
+            query (str): User's tenancy question
+            jurisdiction (str, optional): Jurisdiction from extract_jurisdiction.
+                Its partition and the general one are searched; without one,
+                all partitions are.
+            k (int): Number of passages to return
+
+        Returns:
+            List[Passage]: Best passages first
+        """
+        start = time.perf_counter()
+        if jurisdiction:
+            names = [jurisdiction, GENERAL]
+        else:
+            names = list(self.partitions)
+        partitions = [self.partitions[name] for name in names if name in self.partitions]
+
+        tokens = content_tokens(query)
+        limit = k * 5
+        bm25 = heapq.nlargest(
+            limit,
+            (hit for partition in partitions for hit in partition.search(tokens, limit)),
+            key=lambda item: item[1],
+        )
+
+        if self.vectors is not None and self.embedder is not None:
+            dense = self._dense_search(query, partitions, limit)
+            fused: Dict[int, float] = defaultdict(float)
+            for ranking in (bm25, dense):
+                for rank, (row, _) in enumerate(ranking):
+                    fused[row] += 1.0 / (RRF_K + rank + 1)
+            ranked = heapq.nlargest(k, fused.items(), key=lambda item: item[1])
+        else:
+            ranked = bm25[:k]
+
+        results = [Passage(score=score, **self.passages[row]) for row, score in ranked]
+        metrics.observe("law_retrieval.query_seconds", time.perf_counter() - start)
+        return results
+
+
+def _file_jurisdiction(relpath: str) -> str:
+    parts = relpath.replace(os.sep, "/").split("/")
+    return parts[0].lower().replace(" ", "_").replace("-", "_") if len(parts) > 1 else GENERAL
+
+
+def _read_passages(path: str, relpath: str, max_words: int) -> List[Dict]:
+    jurisdiction = _file_jurisdiction(relpath)
+    passages = []
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for number, line in enumerate(f):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                passages.append({
+                    "id": f"{relpath}#{number}",
+                    "jurisdiction": entry.get("jurisdiction") or jurisdiction,
+                    "source": entry.get("source") or relpath,
+                    "text": entry["text"].strip(),
+                })
+        else:
+            for number, text in enumerate(split_passages(f.read(), max_words)):
+                passages.append({
+                    "id": f"{relpath}#{number}",
+                    "jurisdiction": jurisdiction,
+                    "source": relpath,
+                    "text": text,
+                })
+    return passages
+
+
+def _sha1(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def build_index(corpus_dir: str, index_dir: str, embedder: Optional[Embedder] = None,
+                embed_model: Optional[str] = None, max_words: int = 150) -> Dict[str, int]:
+    """
+    Build or incrementally update an index from a corpus directory. Files
+    whose size, modification time and content are unchanged keep their
+    passages and vectors; only new or changed files are read and embedded.
+
+    Args:
+        corpus_dir (str): Corpus root, one sub-directory per jurisdiction
+        index_dir (str): Output directory
+        embedder (Callable, optional): Maps a list of texts to vectors
+        embed_model (str, optional): Name recorded so queries use the same model
+        max_words (int): Passage size for .md and .txt files
+
+    Returns:
+        Dict[str, int]: Counts of "files", "changed", "removed" and "passages"
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    vectors_path = os.path.join(index_dir, VECTORS_FILE)
+
+    old = {"files": {}, "passages": [], "dim": None, "embed_model": None}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            old = json.load(f)
+    if old.get("version") != INDEX_VERSION or old.get("embed_model") != embed_model:
+        # Vectors from another model (or none) cannot be reused
+        old = {"files": {}, "passages": [], "dim": None, "embed_model": None}
+    old_passages = {p["id"]: p for p in old["passages"]}
+    old_rows = {p["id"]: row for row, p in enumerate(old["passages"])}
+
+    files: Dict[str, Dict] = {}
+    passages: List[Dict] = []
+    changed = 0
+    for root, _, names in os.walk(corpus_dir):
+        for name in sorted(names):
+            if not name.lower().endswith(CORPUS_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, corpus_dir).replace(os.sep, "/")
+            stat = os.stat(path)
+            previous = old["files"].get(relpath)
+            if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+                entry = previous
+            else:
+                sha1 = _sha1(path)
+                entry = {"size": stat.st_size, "mtime": stat.st_mtime, "sha1": sha1}
+                if previous and previous["sha1"] == sha1:
+                    entry["passages"] = previous["passages"]
+                else:
+                    changed += 1
+                    file_passages = _read_passages(path, relpath, max_words)
+                    entry["passages"] = [p["id"] for p in file_passages]
+                    # Changed passages must not reuse stale vectors
+                    for p in file_passages:
+                        old_rows.pop(p["id"], None)
+                        old_passages[p["id"]] = p
+            files[relpath] = entry
+            passages.extend(old_passages[pid] for pid in entry["passages"])
+
+    # Contiguous rows per jurisdiction let a search slice its partition
+    passages.sort(key=lambda p: (p["jurisdiction"], p["id"]))
+    partitions = [[j, n] for j, n in sorted(Counter(p["jurisdiction"] for p in passages).items())]
+
+    dim = None
+    if embedder is not None and passages:
+        if np is None:
+            raise ImportError("numpy is required for dense vectors")
+        old_vectors = None
+        if old.get("dim") and old["passages"] and os.path.exists(vectors_path):
+            old_vectors = np.memmap(vectors_path, dtype=np.float32, mode="r",
+                                    shape=(len(old["passages"]), old["dim"]))
+        missing = [row for row, p in enumerate(passages) if p["id"] not in old_rows or old_vectors is None]
+        new_vectors = (np.asarray(embedder([passages[row]["text"] for row in missing]), dtype=np.float32)
+                       if missing else None)
+        dim = new_vectors.shape[1] if new_vectors is not None else old["dim"]
+
+        tmp_path = f"{vectors_path}.tmp"
+        vectors = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(len(passages), dim))
+        missing_index = {row: i for i, row in enumerate(missing)}
+        for row, p in enumerate(passages):
+            if row in missing_index:
+                vectors[row] = new_vectors[missing_index[row]]
+            else:
+                vectors[row] = old_vectors[old_rows[p["id"]]]
+        vectors.flush()
+        del vectors, old_vectors
+        os.replace(tmp_path, vectors_path)
+    elif os.path.exists(vectors_path):
+        os.remove(vectors_path)
+
+    manifest = {
+        "version": INDEX_VERSION,
+        "embed_model": embed_model,
+        "dim": dim,
+        "partitions": partitions,
+        "files": files,
+        "passages": passages,
+    }
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    return {
+        "files": len(files),
+        "changed": changed,
+        "removed": len(set(old["files"]) - set(files)),
+        "passages": len(passages),
+    }
+
+
+def load_default_index(index_dir: Optional[str] = None) -> Optional[LawIndex]:
+    """
+    Load the index at index_dir (or TENANCY_LAW_INDEX), None if there is none
+    """
+    index_dir = index_dir or os.environ.get("TENANCY_LAW_INDEX")
+    if not index_dir or not os.path.exists(os.path.join(index_dir, MANIFEST_FILE)):
+        return None
+    return LawIndex(index_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tenancy-law retrieval index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build or update the index")
+    build.add_argument("corpus", help="Corpus directory, one sub-directory per jurisdiction")
+    build.add_argument("--index", default="law_index", help="Index directory")
+    build.add_argument("--embed-model", default=None,
+                       help="sentence-transformers model for dense vectors (BM25 only if omitted)")
+    build.add_argument("--max-words", type=int, default=150, help="Passage size")
+
+    query = commands.add_parser("query", help="Search the index")
+    query.add_argument("text", help="Question to search for")
+    query.add_argument("--index", default="law_index", help="Index directory")
+    query.add_argument("--jurisdiction", default=None)
+    query.add_argument("-k", type=int, default=4)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        embedder = None
+        if args.embed_model:
+            embedder = load_sentence_embedder(args.embed_model)
+            if embedder is None:
+                parser.error("--embed-model requires the sentence-transformers package")
+        start = time.perf_counter()
+        summary = build_index(args.corpus, args.index, embedder, args.embed_model, args.max_words)
+        print(f"Indexed {summary['passages']} passages from {summary['files']} files "
+              f"({summary['changed']} changed, {summary['removed']} removed) "
+              f"in {time.perf_counter() - start:.2f}s -> {args.index}")
+    else:
+        index = LawIndex(args.index)
+        start = time.perf_counter()
+        results = index.search(args.text, args.jurisdiction, args.k)
+        elapsed = time.perf_counter() - start
+        for passage in results:
+            print(f"[{passage.score:.3f}] {passage.jurisdiction} {passage.source}\n{passage.text}\n")
+        print(f"{len(results)} passages in {1000 * elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
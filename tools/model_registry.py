@@ -0,0 +1,268 @@
+# tools/model_registry.py
+"""
+Which model each pipeline stage runs on.
+
+Models are grouped into tiers by cost and latency. Each stage lists the
+tiers it may use, cheapest first: a call starts on the first tier and only
+escalates to the next one when the stage's validation check rejects the
+output (cascade / acascade). Routing and summaries run on the small text
+model, tenancy answers start there, and vision starts on Scout.
+
+While a model's circuit is open (tools.groq_client.CircuitBreaker) its tier
+is replaced by the tier's fallback, so a stage keeps working on another
+model during a provider incident instead of waiting on the failing one.
+
+The defaults can be overridden with a JSON file named by MODEL_REGISTRY_PATH:
+
+    {"tiers": {"small": "llama-3.1-8b-instant"},
+     "stages": {"tenancy": ["medium", "large"]},
+     "fallbacks": {"small": "medium"}}
+"""
+import json
+import os
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from tools.groq_client import CircuitOpenError, circuit_breaker, unwrap_error
+from tools.intent_classifier import ROUTES
+from utils.deadlines import DeadlineExceeded, check_deadline
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+T = TypeVar("T")
+
+DEFAULT_TIERS: Dict[str, str] = {
+    "small": "llama-3.1-8b-instant",
+    "medium": "llama-3.3-70b-versatile",
+    "large": "meta-llama/llama-4-maverick-17b-128e-instruct",
+    "vision": "meta-llama/llama-4-scout-17b-16e-instruct",
+    "vision_large": "meta-llama/llama-4-maverick-17b-128e-instruct",
+}
+
+# Stage -> tiers tried in order
+DEFAULT_STAGES: Dict[str, List[str]] = {
+    "router": ["small", "large"],
+    "tenancy": ["small", "large"],
+    "summary": ["small"],
+    "issue_text": ["medium"],
+    "vision": ["vision", "vision_large"],
+    "issue_report": ["vision", "vision_large"],
+    "inspection": ["vision_large"],
+}
+
+# Tier used in place of another while its model's circuit is open
+DEFAULT_FALLBACKS: Dict[str, str] = {
+    "small": "medium",
+    "medium": "small",
+    "large": "medium",
+    "vision": "vision_large",
+    "vision_large": "vision",
+}
+
+
+class ModelRegistry:
+    """
+    Maps pipeline stages to model tiers and tiers to model names
+    """
+
+    def __init__(self, tiers: Optional[Dict[str, str]] = None, stages: Optional[Dict[str, List[str]]] = None,
+                 fallbacks: Optional[Dict[str, str]] = None):
+        self.tiers = dict(DEFAULT_TIERS, **(tiers or {}))
+        self.stages = dict(DEFAULT_STAGES, **(stages or {}))
+        self.fallbacks = dict(DEFAULT_FALLBACKS, **(fallbacks or {}))
+        for stage, stage_tiers in self.stages.items():
+            unknown = [tier for tier in stage_tiers if tier not in self.tiers]
+            if not stage_tiers or unknown:
+                raise ValueError(f"Stage '{stage}' needs known tiers, got {stage_tiers}")
+        for tier, fallback in self.fallbacks.items():
+            if fallback not in self.tiers:
+                raise ValueError(f"Fallback for tier '{tier}' is unknown tier '{fallback}'")
+
+    @classmethod
+    def from_file(cls, path: str) -> "ModelRegistry":
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config.get("tiers"), config.get("stages"), config.get("fallbacks"))
+
+    def models(self, stage: str) -> List[str]:
+        """
+        Models for a stage in cascade order
+        """
+        if stage not in self.stages:
+            raise KeyError(f"Unknown stage '{stage}', expected one of: {', '.join(self.stages)}")
+        return [self.tiers[tier] for tier in self.stages[stage]]
+
+    def available_models(self, stage: str) -> List[str]:
+        """
+        Models for a stage in cascade order, with each model whose circuit is
+        open replaced by its tier's fallback
+
+        Raises:
+            CircuitOpenError: Every model and fallback for the stage is open
+        """
+        models = self.models(stage)
+        available = []
+        for tier in self.stages[stage]:
+            for candidate in (tier, self.fallbacks.get(tier)):
+                model = self.tiers.get(candidate)
+                if model is None or not circuit_breaker.available(model):
+                    continue
+                if candidate != tier:
+                    metrics.increment(f"cascade.{stage}.fallbacks")
+                if model not in available:
+                    available.append(model)
+                break
+        if not available:
+            raise CircuitOpenError(models[0])
+        return available
+
+    def model(self, stage: str) -> str:
+        """
+        The first (cheapest) available model for a stage
+        """
+        return self.available_models(stage)[0]
+
+
+_default_registry: Optional[ModelRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Return the process-wide registry, loaded from MODEL_REGISTRY_PATH if set
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            path = os.environ.get("MODEL_REGISTRY_PATH")
+            _default_registry = ModelRegistry.from_file(path) if path else ModelRegistry()
+        return _default_registry
+
+
+def set_model_registry(registry: Optional[ModelRegistry]) -> None:
+    """
+    Replace the process-wide registry; None reloads it on next use
+    """
+    global _default_registry
+    with _default_registry_lock:
+        _default_registry = registry
+
+
+def _record(stage: str, model: str, index: int, accepted: bool) -> None:
+    metrics.increment(f"cascade.{stage}.calls")
+    if index:
+        metrics.increment(f"cascade.{stage}.escalations")
+    span = tracer.current_span()
+    span.set_attribute("model", model)
+    span.set_attribute("cascade_step", index)
+    if not accepted:
+        metrics.increment(f"cascade.{stage}.rejected")
+
+
+def cascade(stage: str, attempt: Callable[[str], T], accept: Callable[[T], bool],
+            registry: Optional[ModelRegistry] = None) -> T:
+    """
+    Run attempt(model) on each of the stage's models until accept() passes
+
+    Args:
+        stage (str): Registry stage name
+        attempt (Callable[[str], T]): Calls the stage on one model
+        accept (Callable[[T], bool]): Validation check for a result
+        registry (ModelRegistry, optional): Defaults to get_model_registry()
+
+    Returns:
+        T: The first accepted result, or the last model's result when none is
+            accepted. Exceptions escalate too; the last model's is raised.
+
+    Raises:
+        DeadlineExceeded: The request's deadline passed; no escalation
+        CircuitOpenError: Every model for the stage is failing
+    """
+    models = (registry or get_model_registry()).available_models(stage)
+    for index, model in enumerate(models):
+        last = index == len(models) - 1
+        check_deadline(stage)
+        try:
+            result = attempt(model)
+        except Exception as e:
+            error = unwrap_error(e)
+            if isinstance(error, DeadlineExceeded):
+                # No time left for a larger model either
+                raise error
+            _record(stage, model, index, False)
+            if last:
+                raise error
+            continue
+        accepted = accept(result)
+        _record(stage, model, index, accepted)
+        if accepted or last:
+            return result
+
+
+async def acascade(stage: str, attempt: Callable[[str], Awaitable[T]], accept: Callable[[T], bool],
+                   registry: Optional[ModelRegistry] = None) -> T:
+    """
+    Async version of cascade
+    """
+    models = (registry or get_model_registry()).available_models(stage)
+    for index, model in enumerate(models):
+        last = index == len(models) - 1
+        check_deadline(stage)
+        try:
+            result = await attempt(model)
+        except Exception as e:
+            error = unwrap_error(e)
+            if isinstance(error, DeadlineExceeded):
+                # No time left for a larger model either
+                raise error
+            _record(stage, model, index, False)
+            if last:
+                raise error
+            continue
+        accepted = accept(result)
+        _record(stage, model, index, accepted)
+        if accepted or last:
+            return result
+
+
+# Validation checks used to decide escalation
+
+_UNSURE_PATTERN = re.compile(
+    r"\b(i'?m not sure|i am not sure|i don'?t know|i do not know|cannot answer|can'?t answer|unable to answer)\b"
+)
+_CITATION_PATTERN = re.compile(r"\[\d+\]")
+
+
+def accept_route(raw: Any) -> bool:
+    """
+    A router reply is trusted when it is exactly one route label
+    """
+    return str(raw).strip().strip("\"'.`").lower() in ROUTES
+
+
+def accept_answer(answer: Any, passages: Optional[list] = None, min_words: int = 25) -> bool:
+    """
+    A tenancy answer needs some substance, no admission of not knowing, and
+    citations when passages were provided
+    """
+    text = str(answer or "").strip()
+    if len(text.split()) < min_words or _UNSURE_PATTERN.search(text.lower()):
+        return False
+    return not passages or bool(_CITATION_PATTERN.search(text))
+
+
+def accept_analysis(text: Any, min_words: int = 20) -> bool:
+    """
+    A free-text image analysis must be a real answer, not an error or a stub
+    """
+    from tools.image_tools import ERROR_PREFIX
+    text = str(text or "").strip()
+    return not text.startswith(ERROR_PREFIX) and len(text.split()) >= min_words
+
+
+def accept_report(report: Dict) -> bool:
+    """
+    A structured report needs a summary or at least one issue
+    """
+    return bool(report.get("summary") or report.get("issues"))
@@ -0,0 +1,181 @@
+# tools/prompt_assembly.py
+"""
+Assemble agent prompts from named sections.
+
+Static sections (persona, instructions, output format) come first and are
+normalized the same way every time, so every request for a stage starts
+with a byte-identical prefix that provider-side prompt caching can reuse.
+Per-request sections (history, retrieved passages, the question) follow.
+
+While assembling, lines that repeat an earlier section are dropped, base64
+and data URLs are replaced by a placeholder (images travel as image parts,
+never as text), and each section's token estimate is recorded under
+prompt.<stage>.<section>.tokens.
+"""
+import re
+import textwrap
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from tools.text_tools import estimate_tokens
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+BINARY_PLACEHOLDER = "[binary data omitted]"
+
+# Data URLs, and long unbroken base64 runs that are not ordinary words
+_DATA_URL_PATTERN = re.compile(r"data:[\w.+-]+/[\w.+-]+;base64,[A-Za-z0-9+/=]+")
+_BASE64_PATTERN = re.compile(r"(?<![\w/+])[A-Za-z0-9+/]{200,}={0,2}(?![\w/+])")
+# Lines this short ("Severity:", "1.") are left alone by deduplication
+_MIN_DEDUP_CHARS = 24
+
+
+@lru_cache(maxsize=256)
+def compact(text: str) -> str:
+    """
+    Normalize a prompt template: dedent, strip trailing spaces and collapse
+    runs of blank lines, so the same template always yields the same bytes
+    """
+    text = textwrap.dedent(text).strip()
+    lines = [line.rstrip() for line in text.splitlines()]
+    # Continuation lines of triple-quoted strings keep their source indent
+    lines = [lines[0]] + textwrap.dedent("\n".join(lines[1:])).splitlines() if len(lines) > 1 else lines
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def strip_binary(text: str) -> Tuple[str, int]:
+    """
+    Replace base64 payloads in text with a placeholder
+
+    Returns:
+        Tuple[str, int]: The cleaned text and the number of payloads removed
+    """
+    text, urls = _DATA_URL_PATTERN.subn(BINARY_PLACEHOLDER, text)
+    text, runs = _BASE64_PATTERN.subn(BINARY_PLACEHOLDER, text)
+    return text, urls + runs
+
+
+@dataclass
+class PromptSection:
+    name: str
+    text: str
+    static: bool
+    # Whether lines repeating an earlier section are dropped
+    dedupe: bool = True
+
+
+class Prompt:
+    """
+    An assembled prompt: static sections first, then per-request ones
+    """
+
+    def __init__(self, stage: str, sections: List[PromptSection]):
+        self.stage = stage
+        self.sections = sections
+
+    @property
+    def static_text(self) -> str:
+        return "\n\n".join(section.text for section in self.sections if section.static)
+
+    @property
+    def dynamic_text(self) -> str:
+        return "\n\n".join(section.text for section in self.sections if not section.static)
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(section.text for section in self.sections)
+
+    def token_counts(self) -> Dict[str, int]:
+        """
+        Estimated tokens per section
+        """
+        return {section.name: estimate_tokens(section.text) for section in self.sections}
+
+    def messages(self) -> list:
+        """
+        Chat messages: the static sections as the system message, the
+        per-request ones as the user message
+        """
+        return [("system", self.static_text), ("user", self.dynamic_text)]
+
+
+class PromptBuilder:
+    """
+    Collects sections for one stage and assembles them into a Prompt
+
+    Example:
+        prompt = (PromptBuilder("router")
+                  .static("instructions", ROUTER_INSTRUCTIONS)
+                  .add("query", user_input)
+                  .build())
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._static: List[PromptSection] = []
+        self._dynamic: List[PromptSection] = []
+
+    def static(self, name: str, text: str) -> "PromptBuilder":
+        """
+        Add a section that is identical for every request of the stage
+        """
+        if text:
+            self._static.append(PromptSection(name, compact(text), True))
+        return self
+
+    def add(self, name: str, text: Optional[str], header: Optional[str] = None,
+            dedupe: bool = True) -> "PromptBuilder":
+        """
+        Add a per-request section; empty sections are skipped
+
+        Args:
+            name (str): Section name used in token counts
+            text (str, optional): Section body
+            header (str, optional): Line put above the body
+            dedupe (bool): Drop lines already present in earlier sections; off
+                for the user's own question, which may repeat the history
+        """
+        if not text or not str(text).strip():
+            return self
+        text, removed = strip_binary(str(text).strip())
+        if removed:
+            metrics.increment("prompt.binary_stripped", removed)
+        if header:
+            text = f"{header}\n{text}"
+        self._dynamic.append(PromptSection(name, text, False, dedupe))
+        return self
+
+    def build(self) -> Prompt:
+        """
+        Deduplicate repeated lines, record token counts and return the prompt
+        """
+        seen = set()
+        sections = []
+        dropped = 0
+        for section in self._static + self._dynamic:
+            kept = []
+            for line in section.text.splitlines():
+                key = " ".join(line.lower().split())
+                if section.dedupe and len(key) >= _MIN_DEDUP_CHARS:
+                    if key in seen:
+                        dropped += 1
+                        continue
+                    seen.add(key)
+                kept.append(line)
+            text = "\n".join(kept).strip()
+            if text:
+                sections.append(PromptSection(section.name, text, section.static, section.dedupe))
+        if dropped:
+            metrics.increment(f"prompt.{self.stage}.deduplicated_lines", dropped)
+
+        prompt = Prompt(self.stage, sections)
+        counts = prompt.token_counts()
+        for name, tokens in counts.items():
+            metrics.observe(f"prompt.{self.stage}.{name}.tokens", tokens)
+        total = sum(counts.values())
+        metrics.observe(f"prompt.{self.stage}.tokens", total)
+        span = tracer.current_span()
+        span.set_attribute("prompt_tokens", total)
+        span.set_attribute("prompt_static_tokens", estimate_tokens(prompt.static_text))
+        return prompt
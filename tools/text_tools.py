@@ -1,37 +1,109 @@
 #tools/text_tools.py
+import re
+from typing import Optional
+
+# Canonical jurisdiction -> aliases that identify it in free text
+JURISDICTION_ALIASES = {
+    "england": ["england", "english", "london", "manchester", "birmingham", "leeds",
+                "liverpool", "bristol", "sheffield", "newcastle", "nottingham"],
+    "wales": ["wales", "welsh", "cardiff", "swansea"],
+    "scotland": ["scotland", "scottish", "edinburgh", "glasgow", "aberdeen", "dundee"],
+    "northern_ireland": ["northern ireland", "belfast", "derry"],
+    "ireland": ["republic of ireland", "ireland", "dublin", "cork"],
+}
+
+_ALIAS_TO_JURISDICTION = {
+    alias: jurisdiction
+    for jurisdiction, aliases in JURISDICTION_ALIASES.items()
+    for alias in aliases
+}
+# Longer aliases first so "northern ireland" wins over "ireland"
+_JURISDICTION_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(a) for a in sorted(_ALIAS_TO_JURISDICTION, key=len, reverse=True)) + r")\b"
+)
+
 def extract_location(text: str) -> str:
     """
     Extract location information from text
     """
     return text
 
-def get_conversation_context(messages: list) -> str:
+def extract_jurisdiction(text: str) -> Optional[str]:
+    """
+    Extract the tenancy-law jurisdiction mentioned in text
+    Args:
+        text (str): User query
+    Returns:
+        Optional[str]: Canonical jurisdiction name, or None if none is mentioned
+    """
+    match = _JURISDICTION_PATTERN.search(text.lower())
+    return _ALIAS_TO_JURISDICTION[match.group(1)] if match else None
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English text)
+    Args:
+        text (str): Text to measure
+    Returns:
+        int: Estimated token count
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text to roughly max_tokens, marking the cut with an ellipsis
+    """
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rstrip() + "..."
+
+def get_conversation_context(messages: list, max_tokens: int = None, max_message_tokens: int = 200) -> str:
     """
     Build context from previous messages
     Args:
         messages (list): List of message dictionaries with 'role' and 'content' keys
+        max_tokens (int, optional): Token budget for the whole context; without
+            one, the last 5 messages are used
+        max_message_tokens (int): Each message is truncated to this many tokens
     Returns:
         str: Formatted conversation context
     """
+    if max_tokens is None:
+        # Get last 5 messages for recent context
+        recent = messages[-5:]
+        return "\n".join(
+            f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in recent
+        )
+    
     context = []
-    # Get last 5 messages for recent context
-    for message in messages[-5:]:
+    used = 0
+    # Walk back from the newest message until the budget is spent
+    for message in reversed(messages):
         role = "User" if message["role"] == "user" else "Assistant"
-        content = message["content"]
-        context.append(f"{role}: {content}")
+        line = f"{role}: {truncate_to_tokens(message['content'], max_message_tokens)}"
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            break
+        context.append(line)
+        used += cost
     
-    return "\n".join(context)
+    return "\n".join(reversed(context))
 
-def build_query_context(current_query: str, conversation_history: list) -> str:
+def build_query_context(current_query: str, conversation_history) -> str:
     """
     Combine current query with conversation history
     Args:
         current_query (str): Current user input
-        conversation_history (list): List of previous messages
+        conversation_history (list or str): List of previous messages, or an
+            already formatted context (e.g. from ConversationMemory)
     Returns:
         str: Combined context string
     """
-    history = get_conversation_context(conversation_history)
+    if isinstance(conversation_history, str):
+        history = conversation_history
+    else:
+        history = get_conversation_context(conversation_history)
     return f"Current Query: {current_query}\n\nPrevious Context:\n{history}"
 
 # Remove or comment out location_tool if it's not implemented
\ No newline at end of file
@@ -0,0 +1,239 @@
+# tools/tiled_inspection.py
+"""
+High-resolution inspection of one large photo.
+
+A phone photo is downsampled to the vision model's input size before it is
+sent, which loses hairline cracks and early mould spotting. This mode splits
+the photo into overlapping tiles of about that size (tile_boxes) and sends
+them through the structured report path concurrently, next to one overview
+call on the whole photo for context (room, large stains). Tiles that are
+plainly empty (bare wall, sky) are skipped with a local check (is_uniform).
+Findings are merged into a single report, with repeats across overlapping
+tiles folded together.
+
+Tiles are cropped, checked and encoded in worker threads while earlier
+tiles' calls are already in flight, so the wall-clock time stays close to
+that of the slowest single call.
+
+Usage:
+    python -m tools.tiled_inspection photo.jpg --query "Any damp on this wall?" [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from tools.image_tools import aanalyze_property_report
+from tools.issue_reports import SEVERITY_RANK, normalize_report, render_report
+from utils.async_utils import run_sync
+from utils.image_preprocessing import (
+    DEFAULT_IMAGE_PROFILE, MAX_TILES, TILE_OVERLAP, open_oriented, preprocess_image, tile_boxes
+)
+from utils.image_triage import is_uniform
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+TILE_SIDE = DEFAULT_IMAGE_PROFILE["max_side"]
+# Photos up to this much larger than one tile are inspected in a single call
+MIN_TILING_SCALE = 1.25
+# Two findings in the same category whose titles share this much are one issue
+DUPLICATE_TITLE_SIMILARITY = 0.5
+
+TILE_INSTRUCTIONS = ("This is a full-resolution close-up of the {region} of a larger photo. "
+                     "Report only issues visible in this close-up; an empty issues list is fine.")
+
+_ROW_NAMES = {1: [""], 2: ["top", "bottom"], 3: ["top", "middle", "bottom"]}
+_COLUMN_NAMES = {1: [""], 2: ["left", "right"], 3: ["left", "centre", "right"]}
+
+
+def region_names(boxes: List[Tuple[int, int, int, int]]) -> List[str]:
+    """
+    Human-readable position of each tile in its grid, e.g. "top left"
+    """
+    rows = sorted({box[1] for box in boxes})
+    columns = sorted({box[0] for box in boxes})
+    names = []
+    for left, top, _, _ in boxes:
+        row, column = rows.index(top), columns.index(left)
+        row_name = _ROW_NAMES.get(len(rows), [f"row {i + 1}" for i in range(len(rows))])[row]
+        column_name = _COLUMN_NAMES.get(len(columns), [f"column {i + 1}" for i in range(len(columns))])[column]
+        name = " ".join(part for part in (row_name, column_name) if part)
+        names.append("centre" if name == "middle centre" else name or "whole photo")
+    return names
+
+
+def _title_tokens(title: str) -> set:
+    return set(re.findall(r"[a-z]{3,}", title.lower()))
+
+
+def _same_issue(a: Dict, b: Dict) -> bool:
+    if a["category"] != b["category"]:
+        return False
+    tokens_a, tokens_b = _title_tokens(a["title"]), _title_tokens(b["title"])
+    if not tokens_a or not tokens_b:
+        return tokens_a == tokens_b
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b) >= DUPLICATE_TITLE_SIMILARITY
+
+
+def merge_reports(overview: Optional[Dict], tiles: List[Tuple[str, Dict]]) -> Dict:
+    """
+    Merge the overview report and per-tile reports into one report
+
+    Tile issues get their region appended to the location. An issue found
+    again in another tile (or in the overview) is kept once, at the higher
+    severity, with both regions listed.
+
+    Args:
+        overview (dict, optional): Report for the whole photo
+        tiles (List[Tuple[str, dict]]): (region name, report) per analyzed tile
+
+    Returns:
+        dict: Normalized report
+    """
+    issues: List[Dict] = []
+    for region, report in [(None, overview)] + list(tiles):
+        if not report:
+            continue
+        for issue in report["issues"]:
+            issue = dict(issue)
+            if region:
+                issue["location"] = f"{issue['location']} ({region})" if issue["location"] else region
+            match = next((kept for kept in issues if _same_issue(kept, issue)), None)
+            if match is None:
+                issues.append(issue)
+                continue
+            metrics.increment("inspection.tiles.merged_issues")
+            if SEVERITY_RANK[issue["severity"]] > SEVERITY_RANK[match["severity"]]:
+                for field in ("severity", "description", "recommended_action", "recommended_trade"):
+                    match[field] = issue[field]
+            if region and region not in match["location"]:
+                match["location"] = f"{match['location']}; {region}" if match["location"] else region
+
+    reports = [report for report in [overview] + [report for _, report in tiles] if report]
+    summary = next((report["summary"] for report in reports if report["summary"]), "")
+    location = next((report["location"] for report in reports if report["location"]), "")
+    return normalize_report({
+        "summary": summary,
+        "location": location,
+        "issues": issues,
+        "needs_professional_inspection": any(report["needs_professional_inspection"] for report in reports),
+    })
+
+
+async def ainspect_tiled(image_bytes: bytes, query: str, api_key: str, conversation_context: str = None,
+                         overlap: float = TILE_OVERLAP, max_tiles: int = MAX_TILES) -> Dict:
+    """
+    Inspect a large photo as an overview plus concurrent overlapping tiles
+
+    Args:
+        image_bytes (bytes): The original upload (not the downsampled copy)
+        query (str): User's question
+        api_key (str): Groq API key
+        conversation_context (str, optional): Sent with the overview call only
+        overlap (float): Fraction of a tile shared with its neighbour
+        max_tiles (int): Upper bound on tiles (and vision calls) per photo
+
+    Returns:
+        dict: Merged report (see merge_reports) with a "regions" entry
+            counting analyzed, skipped and failed tiles
+
+    Raises:
+        Exception: When the overview and every tile call failed
+    """
+    start = time.perf_counter()
+    with tracer.span("inspection.tiled") as span:
+        async def overview():
+            # From the original bytes, so the JPEG decoder downscales for free
+            # while the full-resolution decode runs in another thread
+            prepared = await asyncio.to_thread(preprocess_image, image_bytes)
+            return await aanalyze_property_report(
+                prepared.base64, query, api_key, conversation_context=conversation_context
+            )
+
+        overview_task = asyncio.ensure_future(overview())
+        try:
+            # JPEG draft decoding skips resolution no tile grid would use
+            image = await asyncio.to_thread(open_oriented, image_bytes, TILE_SIDE * 3)
+        except BaseException:
+            overview_task.cancel()
+            raise
+        boxes = []
+        if max(image.size) > TILE_SIDE * MIN_TILING_SCALE:
+            boxes = tile_boxes(image.width, image.height, TILE_SIDE, overlap, max_tiles)
+        regions = region_names(boxes)
+        span.set_attribute("tiles", len(boxes))
+
+        async def tile(box, region):
+            def prepare():
+                crop = image.crop(box)
+                return None if is_uniform(crop) else preprocess_image(crop).base64
+
+            data = await asyncio.to_thread(prepare)
+            if data is None:
+                metrics.increment("inspection.tiles.skipped")
+                return None
+            metrics.increment("inspection.tiles.analyzed")
+            return await aanalyze_property_report(
+                data, f"{query}\n{TILE_INSTRUCTIONS.format(region=region)}", api_key
+            )
+
+        results = await asyncio.gather(
+            overview_task, *(tile(box, region) for box, region in zip(boxes, regions)), return_exceptions=True
+        )
+
+        overview_result, tile_results = results[0], results[1:]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if len(errors) == len(results):
+            raise errors[0]
+        tile_reports = [(region, result) for region, result in zip(regions, tile_results)
+                        if isinstance(result, dict)]
+        report = merge_reports(None if isinstance(overview_result, BaseException) else overview_result,
+                               tile_reports)
+        report["regions"] = {
+            "analyzed": len(tile_reports),
+            "skipped": sum(1 for result in tile_results if result is None),
+            "failed": sum(1 for result in tile_results if isinstance(result, BaseException)),
+        }
+        span.set_attribute("skipped_tiles", report["regions"]["skipped"])
+    metrics.observe("inspection.tiled.seconds", time.perf_counter() - start)
+    return report
+
+
+def inspect_tiled(image_bytes: bytes, query: str, api_key: str, conversation_context: str = None,
+                  overlap: float = TILE_OVERLAP, max_tiles: int = MAX_TILES) -> Dict:
+    """
+    Synchronous wrapper around ainspect_tiled
+    """
+    return run_sync(ainspect_tiled(image_bytes, query, api_key, conversation_context, overlap, max_tiles))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="High-resolution tiled inspection of one photo")
+    parser.add_argument("image", help="Photo to inspect")
+    parser.add_argument("--query", default="Inspect this photo for property issues, damage or maintenance problems.")
+    parser.add_argument("--max-tiles", type=int, default=MAX_TILES, help="Upper bound on tile calls")
+    parser.add_argument("--json", action="store_true", help="Print the merged report as JSON")
+    parser.add_argument("--api-key", default=os.environ.get("GROQ_API_KEY"))
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("Groq API key is required (--api-key or GROQ_API_KEY)")
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+    start = time.perf_counter()
+    report = inspect_tiled(image_bytes, args.query, args.api_key, max_tiles=args.max_tiles)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(render_report(report))
+        regions = report["regions"]
+        print(f"\n{regions['analyzed']} tiles analyzed, {regions['skipped']} skipped, "
+              f"{regions['failed']} failed in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# utils/async_utils.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, Optional
+
+# Threads for asyncio.to_thread work (CrewAI stages, image decoding) of all
+# synchronous callers together
+BACKGROUND_LOOP_THREADS = 32
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide event loop that runs coroutines for synchronous
+    callers, starting it in a daemon thread on first use
+
+    Everything bound to a loop (the pooled async Groq clients, in-flight
+    request coalescing) is then shared by every synchronous caller instead
+    of being rebuilt on a fresh loop per call.
+    """
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(
+                ThreadPoolExecutor(max_workers=BACKGROUND_LOOP_THREADS, thread_name_prefix="run-sync")
+            )
+            thread = threading.Thread(target=loop.run_forever, name="run-sync-loop", daemon=True)
+            thread.start()
+            _loop, _loop_thread = loop, thread
+        return _loop
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    Run a coroutine to completion from synchronous code
+
+    The coroutine runs on the shared background loop (background_loop) and
+    the calling thread blocks until it finishes, so concurrent callers from
+    any number of threads share its connection pools. Context variables
+    (e.g. a deadline) are carried over. Called from a coroutine on that loop
+    itself, the coroutine runs on a fresh loop in a helper thread instead.
+
+    Args:
+        coro (Coroutine): Coroutine to run
+
+    Returns:
+        Any: The coroutine's result; exceptions propagate to the caller
+    """
+    loop = background_loop()
+    if threading.current_thread() is not _loop_thread:
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result()
+        except BaseException:
+            # e.g. KeyboardInterrupt in the caller: stop the work as well
+            future.cancel()
+            raise
+
+    # Blocking the shared loop on its own work would deadlock
+    result = {}
+
+    def runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner, daemon=True)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
@@ -0,0 +1,142 @@
+# utils/deadlines.py
+"""
+Per-request time budgets.
+
+A Deadline is set once per query (deadline_scope) and carried in a context
+variable, so it follows asyncio tasks and asyncio.to_thread calls into the
+router, the specialists and every Groq request without being passed
+around. Groq requests cap their timeouts, rate-limit waits and retry
+backoff to the remaining time (tools.groq_client), and run_with_deadline
+cancels in-flight async work when the budget runs out.
+
+Work in threads (CrewAI steps) cannot be cancelled, but every Groq request
+it makes after the deadline fails immediately.
+"""
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a request's time budget is used up
+    """
+
+    def __init__(self, stage: str = "request"):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    A point in (monotonic) time by which a request must finish
+    """
+    __slots__ = ("seconds", "expires_at")
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str = "request") -> None:
+        """
+        Raise DeadlineExceeded if the budget is used up
+        """
+        if self.expired:
+            raise DeadlineExceeded(stage)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    The deadline of the request being processed, if any
+    """
+    return _current_deadline.get()
+
+
+def remaining_seconds() -> Optional[float]:
+    """
+    Seconds left for the current request, or None without a deadline
+    """
+    deadline = _current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def check_deadline(stage: str = "request") -> None:
+    """
+    Raise DeadlineExceeded if the current request's budget is used up
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def clear_deadline() -> None:
+    """
+    Drop the deadline for the rest of the current context, e.g. in a task
+    shared by several requests that each enforce their own
+    """
+    _current_deadline.set(None)
+
+
+@contextmanager
+def deadline_scope(budget: Union[None, float, Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    Run a block under a deadline
+
+    Args:
+        budget: Seconds from now, an existing Deadline, or None for no new
+            limit. An enclosing deadline that expires earlier stays in force.
+
+    Yields:
+        Deadline: The deadline in force, or None
+    """
+    outer = _current_deadline.get()
+    deadline = Deadline(budget) if isinstance(budget, (int, float)) else budget
+    if deadline is None or (outer is not None and outer.expires_at <= deadline.expires_at):
+        yield outer
+        return
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+async def run_with_deadline(awaitable: Awaitable[T], stage: str = "request") -> T:
+    """
+    Await under the current deadline, cancelling the work when it expires
+
+    Unlike asyncio.wait_for, this returns as soon as the budget runs out
+    instead of waiting for the cancelled work to unwind (closing a hung
+    connection or a thread finishing can take seconds).
+
+    Raises:
+        DeadlineExceeded: The budget ran out first
+    """
+    remaining = remaining_seconds()
+    if remaining is None:
+        return await awaitable
+    task = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=remaining)
+    except BaseException:
+        task.cancel()
+        raise
+    if done:
+        return task.result()
+    task.cancel()
+    # Nobody awaits the cancelled task; retrieve its outcome so it is not logged
+    task.add_done_callback(lambda finished: finished.cancelled() or finished.exception())
+    raise DeadlineExceeded(stage)
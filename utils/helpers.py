@@ -116,4 +116,33 @@ def get_issue_severity(response: str) -> Optional[str]:
         severity = match.group(1).capitalize()
         return severity
     
-    return None
\ No newline at end of file
+    return None
+
+
+def compute_dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Compute a difference hash (dHash) of an image
+    
+    Args:
+        image (PIL.Image): Image to hash
+        hash_size (int): Hash is hash_size * hash_size bits
+        
+    Returns:
+        int: Perceptual hash; visually similar images differ in few bits
+    """
+    grey = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(grey.getdata())
+    
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    
+    return value
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """
+    Count the differing bits between two perceptual hashes
+    """
+    return bin(hash_a ^ hash_b).count("1")
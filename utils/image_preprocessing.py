@@ -0,0 +1,303 @@
+# utils/image_preprocessing.py
+import base64
+import io
+import math
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageDraw, ImageOps
+
+from utils.tracing import tracer
+
+# Input sizing per vision model. Llama 4 splits images into 336px tiles, so
+# sides beyond max_side only add tiles (and tokens) without adding detail the
+# model can use. max_bytes keeps the base64 payload well under Groq's 4MB limit.
+MODEL_IMAGE_PROFILES: Dict[str, Dict] = {
+    "meta-llama/llama-4-scout-17b-16e-instruct": {"max_side": 1344, "max_bytes": 1_000_000},
+    "meta-llama/llama-4-maverick-17b-128e-instruct": {"max_side": 1344, "max_bytes": 1_000_000},
+}
+DEFAULT_IMAGE_PROFILE = {"max_side": 1344, "max_bytes": 1_000_000}
+
+# Groq accepts at most this many images in one vision request
+MAX_IMAGES_PER_REQUEST = 5
+# Total payload budget for a multi-image request, split across the images
+MAX_REQUEST_BYTES = 3_000_000
+
+# JPEG qualities tried in order until the payload fits the byte budget
+QUALITY_LADDER = (85, 75, 65, 55, 45)
+MIN_SIDE = 336
+
+# High-resolution inspection tiles overlap, so a crack on a tile border is
+# whole in at least one tile
+TILE_OVERLAP = 0.15
+MAX_TILES = 9
+
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+
+@dataclass
+class PreparedImage:
+    """
+    Image bytes ready to send to a vision model
+    """
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    encode_seconds: float
+
+    @property
+    def base64(self) -> str:
+        with tracer.span("image.base64", bytes=len(self.data)):
+            return base64.b64encode(self.data).decode("utf-8")
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+
+def get_image_profile(model: Optional[str] = None) -> Dict:
+    """
+    Return the sizing profile for a vision model
+    """
+    return MODEL_IMAGE_PROFILES.get(model, DEFAULT_IMAGE_PROFILE)
+
+
+def detect_mime_type(image_data: str) -> str:
+    """
+    Detect the MIME type of base64 encoded image data from its magic bytes
+
+    Args:
+        image_data (str): Base64 encoded image
+
+    Returns:
+        str: MIME type, defaulting to image/jpeg when unknown
+    """
+    try:
+        header = base64.b64decode(image_data[:32])
+    except (ValueError, TypeError):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG"):
+        return "image/png"
+    if header.startswith(b"GIF8"):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    # JPEG has no alpha channel; composite transparent images on white
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def _encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    # No exif/icc arguments are passed, so metadata is stripped
+    image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def preprocess_image(source: Union[bytes, BinaryIO, Image.Image], model: Optional[str] = None,
+                     max_side: Optional[int] = None, max_bytes: Optional[int] = None) -> PreparedImage:
+    """
+    Prepare an uploaded image for a vision model in a single decode pass:
+    apply EXIF orientation, strip metadata, downsample to the model's input
+    resolution and re-encode as JPEG within a byte budget.
+
+    Args:
+        source: Raw image bytes, a file-like object or an opened PIL image
+        model (str, optional): Target vision model, selects the sizing profile
+        max_side (int, optional): Override for the longest output side
+        max_bytes (int, optional): Override for the encoded size budget
+
+    Returns:
+        PreparedImage: Encoded image with its MIME type and dimensions
+    """
+    with tracer.span("image.preprocess") as span:
+        prepared = _preprocess_image(source, model, max_side, max_bytes)
+        span.set_attribute("input_bytes", prepared.original_bytes)
+        span.set_attribute("output_bytes", len(prepared.data))
+        span.set_attribute("width", prepared.width)
+        span.set_attribute("height", prepared.height)
+    return prepared
+
+
+def _preprocess_image(source, model, max_side, max_bytes) -> PreparedImage:
+    start = time.perf_counter()
+    profile = get_image_profile(model)
+    max_side = max_side or profile["max_side"]
+    max_bytes = max_bytes or profile["max_bytes"]
+
+    if isinstance(source, Image.Image):
+        image = source
+        original_bytes = 0
+    else:
+        raw = source if isinstance(source, bytes) else source.read()
+        original_bytes = len(raw)
+        image = Image.open(io.BytesIO(raw))
+        # Let the JPEG decoder downscale by a power of two while decoding.
+        # EXIF rotation may swap the sides, so request the square bound.
+        if image.format == "JPEG":
+            image.draft("RGB", (max_side, max_side))
+
+    image = ImageOps.exif_transpose(image)
+    image = _flatten(image)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    data = b""
+    with tracer.span("image.encode") as span:
+        while True:
+            for quality in QUALITY_LADDER:
+                data = _encode_jpeg(image, quality)
+                span.add_to_attribute("attempts", 1)
+                if len(data) <= max_bytes:
+                    break
+            if len(data) <= max_bytes or max(image.size) <= MIN_SIDE:
+                break
+            # Still over budget at the lowest quality: shrink and try again
+            scale = 0.75
+            image = image.resize(
+                (max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS
+            )
+
+    return PreparedImage(
+        data=data,
+        mime_type=MIME_TYPES["JPEG"],
+        width=image.width,
+        height=image.height,
+        original_bytes=original_bytes,
+        encode_seconds=time.perf_counter() - start,
+    )
+
+
+def preprocess_images(sources: List[Union[bytes, BinaryIO, Image.Image]],
+                      model: Optional[str] = None) -> List[PreparedImage]:
+    """
+    Prepare several images for one vision request, splitting the request's
+    byte budget across them
+
+    Args:
+        sources (List): Raw image bytes, file-like objects or PIL images
+        model (str, optional): Target vision model
+
+    Returns:
+        List[PreparedImage]: One prepared image per source
+    """
+    if not sources:
+        return []
+    profile = get_image_profile(model)
+    per_image = min(profile["max_bytes"], MAX_REQUEST_BYTES // min(len(sources), MAX_IMAGES_PER_REQUEST))
+    return [preprocess_image(source, model=model, max_bytes=per_image) for source in sources]
+
+
+def build_contact_sheet(images: List[Image.Image], max_side: int = DEFAULT_IMAGE_PROFILE["max_side"],
+                        start_number: int = 1) -> Image.Image:
+    """
+    Tile several images into one numbered grid
+
+    Args:
+        images (List[PIL.Image]): Images to tile
+        max_side (int): Side length of the square sheet
+        start_number (int): Label of the first tile
+
+    Returns:
+        PIL.Image: Contact sheet
+    """
+    cols = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / cols)
+    cell = max_side // cols
+    sheet = Image.new("RGB", (cell * cols, cell * rows), (255, 255, 255))
+    draw = ImageDraw.Draw(sheet)
+
+    for index, image in enumerate(images):
+        tile = _flatten(ImageOps.exif_transpose(image))
+        tile.thumbnail((cell - 4, cell - 4), Image.LANCZOS)
+        x = (index % cols) * cell + (cell - tile.width) // 2
+        y = (index // cols) * cell + (cell - tile.height) // 2
+        sheet.paste(tile, (x, y))
+        label_x, label_y = (index % cols) * cell + 4, (index // cols) * cell + 4
+        draw.rectangle((label_x, label_y, label_x + 22, label_y + 16), fill=(0, 0, 0))
+        draw.text((label_x + 4, label_y + 2), str(start_number + index), fill=(255, 255, 255))
+
+    return sheet
+
+
+def pack_images(images: List[str], max_images: int = MAX_IMAGES_PER_REQUEST) -> List[str]:
+    """
+    Fit base64 images into a request's image limit, tiling them into
+    numbered contact sheets when there are too many
+
+    Args:
+        images (List[str]): Base64 encoded images
+        max_images (int): Image limit of the vision model
+
+    Returns:
+        List[str]: Base64 encoded images or contact sheets, at most max_images
+    """
+    if len(images) <= max_images:
+        return list(images)
+
+    per_sheet = math.ceil(len(images) / max_images)
+    packed = []
+    for start in range(0, len(images), per_sheet):
+        group = [Image.open(io.BytesIO(base64.b64decode(data))) for data in images[start:start + per_sheet]]
+        sheet = build_contact_sheet(group, start_number=start + 1)
+        packed.append(preprocess_image(sheet, max_bytes=MAX_REQUEST_BYTES // max_images).base64)
+    return packed
+
+
+def open_oriented(source: Union[bytes, BinaryIO, Image.Image], max_side: Optional[int] = None) -> Image.Image:
+    """
+    Decode an image upright and as RGB, without downsampling beyond what the
+    JPEG decoder can skip for free when max_side is given
+    """
+    if isinstance(source, Image.Image):
+        image = source
+    else:
+        image = Image.open(io.BytesIO(source if isinstance(source, bytes) else source.read()))
+        if max_side and image.format == "JPEG":
+            image.draft("RGB", (max_side, max_side))
+    return _flatten(ImageOps.exif_transpose(image))
+
+
+def tile_boxes(width: int, height: int, tile_side: int = DEFAULT_IMAGE_PROFILE["max_side"],
+               overlap: float = TILE_OVERLAP, max_tiles: int = MAX_TILES) -> List[Tuple[int, int, int, int]]:
+    """
+    Split an image into a grid of overlapping crop boxes of about tile_side
+    pixels, so each tile reaches the model near full resolution
+
+    With more than max_tiles needed, the grid is coarsened and tiles get
+    larger (and are downsampled a little when sent).
+
+    Returns:
+        List[Tuple[int, int, int, int]]: (left, top, right, bottom) boxes,
+            row by row
+    """
+    def count(length):
+        return max(1, math.ceil((length / tile_side - overlap) / (1 - overlap)))
+
+    def spans(length, tiles):
+        if tiles == 1:
+            return [(0, length)]
+        size = math.ceil(length / (tiles - (tiles - 1) * overlap))
+        stride = (length - size) / (tiles - 1)
+        return [(round(i * stride), round(i * stride) + size) for i in range(tiles)]
+
+    cols, rows = count(width), count(height)
+    while cols * rows > max_tiles:
+        if cols >= rows:
+            cols -= 1
+        else:
+            rows -= 1
+    return [(left, top, right, bottom)
+            for top, bottom in spans(height, rows)
+            for left, right in spans(width, cols)]
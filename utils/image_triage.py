@@ -0,0 +1,255 @@
+# utils/image_triage.py
+"""
+Cheap, CPU-only checks that run before an image reaches a vision model.
+
+Each image is decoded once at reduced size (JPEG draft mode) and measured
+on a small greyscale copy:
+
+- exposure: the brightness histogram catches black, washed-out and blank
+  frames
+- sharpness: the variance of the Laplacian, together with its strongest
+  responses, catches blurry photos of contrasty scenes without rejecting
+  plain walls, smooth or with one sharp crack in them
+- screenshots: sharp edges, few distinct colours with large identical
+  areas, and no camera EXIF (extract_image_metadata)
+- selfies: a front-camera lens in the EXIF data
+- duplicates: a dHash within a few bits of an image already seen in the
+  conversation
+
+A triage takes a few milliseconds for a preprocessed upload, far less than
+the vision call it can save.
+"""
+import base64
+import io
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+from PIL import Image, ImageFilter, ImageStat
+
+from utils.helpers import compute_dhash, extract_image_metadata, hamming_distance
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+# Longest side of the copy the measures run on
+TRIAGE_SIDE = 256
+MIN_SIDE = 64
+
+# Share of pixels that are near black / near white, and brightness spread
+DARK_LEVEL = 24
+BRIGHT_LEVEL = 232
+MAX_DARK_FRACTION = 0.92
+MAX_BRIGHT_FRACTION = 0.92
+MIN_CONTRAST = 4.0
+
+# Blurry: a scene with real contrast but low Laplacian variance and no
+# strong edge anywhere. Smooth, low-contrast subjects (a damp patch on a
+# bare wall) look the same as defocus to these measures, so they are never
+# called blurry.
+BLUR_VARIANCE = 20.0
+BLUR_EDGE = 40
+BLUR_MIN_CONTRAST = 15.0
+
+# Screenshot: sharp edges, one colour covering most of the frame and few
+# colours overall. Flat walls also end up with large uniform areas once
+# downsampled, but without sharp edges.
+SCREENSHOT_EDGE = 64
+SCREENSHOT_TOP_COLOR_SHARE = 0.5
+SCREENSHOT_COLOR_RATIO = 0.15
+
+# Uniform region (bare wall, sky): little spread and not even a hairline
+# edge, measured at half resolution so thin cracks survive
+UNIFORM_CONTRAST = 10.0
+UNIFORM_EDGE = 16
+
+# Same bound the image analysis cache uses for "the same photo"
+DUPLICATE_DISTANCE = 6
+
+# EXIF tags (extract_image_metadata keys them by id)
+EXIF_MAKE = 271
+EXIF_LENS_MODEL = 42036
+
+_LAPLACIAN = ImageFilter.Kernel((3, 3), (0, 1, 0, 1, -4, 1, 0, 1, 0), scale=1, offset=128)
+
+RETAKE_MESSAGES = {
+    "unreadable": "I couldn't open this image. Please upload a JPEG or PNG photo of the problem area.",
+    "too_small": "This image is too small to inspect. Please upload a larger photo of the problem area.",
+    "too_dark": "This photo is too dark to make out any detail. Please retake it with more light "
+                "or with the flash on.",
+    "overexposed": "This photo is washed out. Please retake it without pointing the camera at a "
+                   "window or a bright light.",
+    "blank": "This image looks blank. Please upload a photo that shows the problem area.",
+    "blurry": "This photo is too blurry to assess. Please hold the camera steady, tap the screen "
+              "to focus on the problem area and retake it.",
+    "screenshot": "This looks like a screenshot rather than a photo of the property. Please upload "
+                  "a photo of the problem area, or type your question if it is about a document.",
+    "selfie": "This looks like a front-camera photo. Please use the rear camera to photograph "
+              "the problem area.",
+    "duplicate": "This photo looks the same as one you already sent, so my earlier analysis still "
+                 "applies. For a fresh look, send a different angle or a closer shot.",
+}
+
+
+@dataclass
+class TriageResult:
+    """
+    Outcome and measurements of one image's triage
+    """
+    reason: Optional[str] = None
+    width: int = 0
+    height: int = 0
+    blur_variance: float = 0.0
+    edge_strength: int = 0
+    mean_brightness: float = 0.0
+    contrast: float = 0.0
+    dark_fraction: float = 0.0
+    bright_fraction: float = 0.0
+    top_color_share: float = 0.0
+    dhash: Optional[int] = None
+    seconds: float = 0.0
+
+    @property
+    def usable(self) -> bool:
+        return self.reason is None
+
+    @property
+    def message(self) -> Optional[str]:
+        """
+        What to ask the user when the image is not usable
+        """
+        return RETAKE_MESSAGES.get(self.reason)
+
+
+def _open(source: Union[str, bytes, Image.Image]) -> Image.Image:
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, str):
+        source = base64.b64decode(source)
+    return Image.open(io.BytesIO(source))
+
+
+def _laplacian(grey: Image.Image) -> Image.Image:
+    # Kernel filters copy the outermost pixels unfiltered; drop them
+    return grey.filter(_LAPLACIAN).crop((1, 1, grey.width - 1, grey.height - 1))
+
+
+def _edge_magnitudes(laplacian: Image.Image) -> list:
+    # |Laplacian| histogram: fold the offset-128 response around zero
+    response = laplacian.histogram()
+    return [response[128]] + [response[128 + d] + response[128 - d] for d in range(1, 128)]
+
+
+def _percentile(histogram, fraction: float) -> int:
+    total = sum(histogram)
+    running = 0
+    for level, count in enumerate(histogram):
+        running += count
+        if running >= total * fraction:
+            return level
+    return len(histogram) - 1
+
+
+def triage_image(source: Union[str, bytes, Image.Image], seen_hashes: Iterable[int] = (),
+                 duplicate_distance: int = DUPLICATE_DISTANCE) -> TriageResult:
+    """
+    Check whether an image is worth a vision call
+
+    Args:
+        source: Base64 string, raw bytes or an opened PIL image
+        seen_hashes (Iterable[int]): dHashes of images already analyzed in
+            the conversation
+        duplicate_distance (int): Hamming distance up to which two images
+            count as the same photo
+
+    Returns:
+        TriageResult: reason is None for a usable image, otherwise one of
+            the RETAKE_MESSAGES keys
+    """
+    start = time.perf_counter()
+    with tracer.span("image.triage") as span:
+        result = _triage(source, seen_hashes, duplicate_distance)
+        result.seconds = time.perf_counter() - start
+        span.set_attribute("reason", result.reason or "ok")
+    metrics.observe("image.triage.seconds", result.seconds)
+    if result.reason is not None:
+        metrics.increment(f"image.triage.rejected.{result.reason}")
+    return result
+
+
+def _triage(source, seen_hashes, duplicate_distance) -> TriageResult:
+    try:
+        image = _open(source)
+        metadata = extract_image_metadata(image)
+        exif = metadata["exif"] or {}
+        if image.format == "JPEG":
+            # Decode at 1/2 to 1/8 scale straight from the DCT data, keeping
+            # the longest side at least TRIAGE_SIDE
+            scale = TRIAGE_SIDE / max(image.size)
+            image.draft("RGB", (int(image.width * scale), int(image.height * scale)))
+        small = image.convert("RGB")
+        small.thumbnail((TRIAGE_SIDE, TRIAGE_SIDE), Image.BILINEAR, reducing_gap=2.0)
+    except Exception:
+        return TriageResult(reason="unreadable")
+
+    result = TriageResult(width=metadata["width"], height=metadata["height"])
+    if min(result.width, result.height) < MIN_SIDE:
+        result.reason = "too_small"
+        return result
+
+    grey = small.convert("L")
+    histogram = grey.histogram()
+    pixels = grey.width * grey.height
+    stat = ImageStat.Stat(grey)
+    result.mean_brightness = stat.mean[0]
+    result.contrast = stat.stddev[0]
+    result.dark_fraction = sum(histogram[:DARK_LEVEL]) / pixels
+    result.bright_fraction = sum(histogram[BRIGHT_LEVEL:]) / pixels
+    if result.dark_fraction > MAX_DARK_FRACTION:
+        result.reason = "too_dark"
+        return result
+    if result.bright_fraction > MAX_BRIGHT_FRACTION:
+        result.reason = "overexposed"
+        return result
+    if result.contrast < MIN_CONTRAST:
+        result.reason = "blank"
+        return result
+
+    laplacian = _laplacian(grey)
+    result.blur_variance = ImageStat.Stat(laplacian).var[0]
+    result.edge_strength = _percentile(_edge_magnitudes(laplacian), 0.999)
+    if (result.blur_variance < BLUR_VARIANCE and result.edge_strength < BLUR_EDGE
+            and result.contrast >= BLUR_MIN_CONTRAST):
+        result.reason = "blurry"
+        return result
+
+    if EXIF_MAKE not in exif and result.edge_strength >= SCREENSHOT_EDGE:
+        colors = small.getcolors(pixels) or []
+        result.top_color_share = max(count for count, _ in colors) / pixels if colors else 0.0
+        if (result.top_color_share > SCREENSHOT_TOP_COLOR_SHARE
+                and len(colors) < pixels * SCREENSHOT_COLOR_RATIO):
+            result.reason = "screenshot"
+            return result
+    if "front" in str(exif.get(EXIF_LENS_MODEL, "")).lower():
+        result.reason = "selfie"
+        return result
+
+    result.dhash = compute_dhash(grey)
+    if any(hamming_distance(result.dhash, seen) <= duplicate_distance for seen in seen_hashes):
+        result.reason = "duplicate"
+    return result
+
+
+def is_uniform(image: Image.Image) -> bool:
+    """
+    Whether an image region is near-empty (plain wall, sky, floor) and not
+    worth a vision call
+
+    Unlike triage_image this keeps fine detail: a hairline crack or a few
+    mould spots on a bare wall make the region non-uniform.
+    """
+    grey = image.convert("L")
+    if min(grey.size) >= 2 * TRIAGE_SIDE:
+        grey = grey.reduce(2)
+    if ImageStat.Stat(grey).stddev[0] >= UNIFORM_CONTRAST:
+        return False
+    return _percentile(_edge_magnitudes(_laplacian(grey)), 0.9995) < UNIFORM_EDGE
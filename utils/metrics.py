@@ -0,0 +1,133 @@
+# utils/metrics.py
+import re
+import threading
+from collections import defaultdict, deque
+from typing import Dict
+
+
+class MetricsRegistry:
+    """
+    Process-wide, thread-safe counters for the agent pipeline
+    """
+
+    def __init__(self, max_samples: int = 2048):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        # Recent samples per histogram, for percentiles
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """
+        Increase a named counter
+
+        Args:
+            name (str): Dotted counter name, e.g. "router.fast_path.hits"
+            amount (float): Value to add
+        """
+        with self._lock:
+            self._counters[name] += amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Record the latest value of a gauge, e.g. a cache hit rate
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record a sample of a distribution, e.g. a latency in seconds
+        """
+        with self._lock:
+            self._samples[name].append(value)
+            self._counters[f"{name}.count"] += 1
+            self._counters[f"{name}.sum"] += value
+
+    def summary(self, name: str) -> Dict[str, float]:
+        """
+        Summarize the recent samples of a distribution
+
+        Returns:
+            Dict: count, mean, p50, p95 and p99 (empty if no samples)
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return {}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+        return {
+            "count": len(samples),
+            "mean": sum(samples) / len(samples),
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+        }
+
+    def get(self, name: str) -> float:
+        """
+        Return the current value of a counter or gauge (0 if never recorded)
+        """
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Return a copy of all counters and gauges
+        """
+        with self._lock:
+            values = dict(self._counters)
+            values.update(self._gauges)
+            return values
+
+    def render_prometheus(self, prefix: str = "propertyloop") -> str:
+        """
+        Render all metrics in the Prometheus text exposition format:
+        counters, gauges, and distributions as summaries with p50/p95/p99
+        quantiles over the recent samples
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            distributions = list(self._samples)
+
+        def metric_name(name):
+            return re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{name}")
+
+        lines = []
+        derived = {f"{name}.{suffix}" for name in distributions for suffix in ("count", "sum")}
+        for name, value in sorted(counters.items()):
+            if name in derived:
+                continue
+            lines += [f"# TYPE {metric_name(name)} counter", f"{metric_name(name)} {value}"]
+        for name, value in sorted(gauges.items()):
+            lines += [f"# TYPE {metric_name(name)} gauge", f"{metric_name(name)} {value}"]
+        for name in sorted(distributions):
+            summary = self.summary(name)
+            if not summary:
+                continue
+            base = metric_name(name)
+            lines.append(f"# TYPE {base} summary")
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                lines.append(f'{base}{{quantile="{quantile}"}} {summary[key]}')
+            lines.append(f"{base}_sum {counters.get(f'{name}.sum', 0.0)}")
+            lines.append(f"{base}_count {counters.get(f'{name}.count', 0.0)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """
+        Clear all counters
+        """
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._samples.clear()
+
+
+# Shared registry used by agents, tools and the Streamlit front end
+metrics = MetricsRegistry()
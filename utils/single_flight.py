@@ -0,0 +1,263 @@
+# utils/single_flight.py
+"""
+Coalescing of identical in-flight requests.
+
+When several sessions ask the same thing at once (a building-wide notice,
+the same photo shared by neighbours), each would otherwise start its own
+model run. SingleFlight keeps one shared task per request fingerprint:
+the first caller starts it, callers arriving while it runs wait on it,
+and all of them get its result or its exception. Nothing is kept after
+the task finishes; repeated questions are the answer caches' job.
+
+A caller that is cancelled (speculation dropped, deadline reached) only
+stops waiting. The shared task is cancelled when its last waiter leaves.
+It runs without any one caller's deadline, since every waiter enforces
+its own.
+
+Async callers coalesce per event loop; synchronous callers share one
+(utils.async_utils.run_sync). Streamed answers are coalesced with stream:
+one producer thread reads the model stream and every reader, joining at
+any point, gets all chunks from the start.
+"""
+import asyncio
+import contextvars
+import hashlib
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+from utils.deadlines import DeadlineExceeded, clear_deadline, remaining_seconds
+from utils.metrics import metrics
+
+T = TypeVar("T")
+
+
+def _normalize_text(text: str) -> str:
+    # Case, spacing and trailing punctuation do not change the answer
+    return " ".join((text or "").casefold().split()).rstrip("?!. ")
+
+
+def _digest(data: Union[str, bytes]) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def request_fingerprint(query: str, image=None, route: str = "", model: str = "",
+                        context: Optional[str] = None) -> str:
+    """
+    Key identifying requests that must get the same answer
+
+    Args:
+        query (str): User's text query, normalized for case and spacing
+        image (str, bytes or list, optional): Image data (base64 or raw), hashed
+        route (str): Route or stage handling the request
+        model (str): First model the stage will call
+        context (str, optional): Conversation context sent with the request;
+            sessions with different histories are never coalesced
+
+    Returns:
+        str: Hex digest
+    """
+    images = image if isinstance(image, (list, tuple)) else [image] if image else []
+    parts = [route, model, _normalize_text(query), ",".join(_digest(data) for data in images),
+             _digest(context or "")]
+    return _digest("\x1f".join(parts))
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class _Stream:
+    __slots__ = ("chunks", "done", "error", "readers", "condition")
+
+    def __init__(self):
+        self.chunks: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.readers = 0
+        self.condition = threading.Condition()
+
+
+class SingleFlight:
+    """
+    One shared task per key for concurrent identical calls
+    """
+
+    def __init__(self, metrics_prefix: str = "coalescing"):
+        self.metrics_prefix = metrics_prefix
+        # Reentrant: a waiter forgets a call while holding it
+        self._lock = threading.RLock()
+        # (event loop, key) -> in-flight call; tasks cannot be awaited across loops
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _Call] = {}
+        self._streams: Dict[Hashable, _Stream] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    @property
+    def coalescing_ratio(self) -> float:
+        """
+        Share of requests that joined a call already in flight
+        """
+        total = self.calls + self.coalesced
+        return self.coalesced / total if total else 0.0
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._streams)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]], label: str = "call") -> T:
+        """
+        Await factory(), or the identical call another request already started
+
+        Args:
+            key (Hashable): Request fingerprint (see request_fingerprint)
+            factory (Callable): Starts the work; only called by the first caller
+            label (str): Route or stage, for the per-label counters
+
+        Returns:
+            The shared call's result
+
+        Raises:
+            Exception: Whatever the shared call raised, in every waiter
+        """
+        loop = asyncio.get_running_loop()
+        slot = (loop, key)
+        with self._lock:
+            call = self._calls.get(slot)
+            joined = call is not None
+            if not joined:
+                call = _Call(loop.create_task(self._run(factory)))
+                self._calls[slot] = call
+                call.task.add_done_callback(lambda _: self._forget(slot, call))
+            call.waiters += 1
+        self._record(label, joined)
+        try:
+            # Shielded: cancelling this waiter must not cancel the others' call
+            return await asyncio.shield(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                if not call.waiters and not call.task.done():
+                    # Nobody is waiting any more; a new caller starts afresh
+                    self._forget(slot, call)
+                    call.task.cancel()
+
+    @staticmethod
+    async def _run(factory: Callable[[], Awaitable[T]]) -> T:
+        clear_deadline()
+        return await factory()
+
+    def _forget(self, slot, call: _Call) -> None:
+        with self._lock:
+            if self._calls.get(slot) is call:
+                del self._calls[slot]
+
+    def stream(self, key: Hashable, factory: Callable[[], Iterator[T]], label: str = "stream") -> Iterator[T]:
+        """
+        Iterate factory(), or the identical stream another request already started
+
+        The first reader starts a producer thread; readers that stop early
+        only leave, and the producer stops once the last reader has left.
+        A reader waits for the next chunk no longer than its own deadline.
+
+        Args:
+            key (Hashable): Request fingerprint (see request_fingerprint)
+            factory (Callable): Returns the source iterator; only called once
+            label (str): Route or stage, for the per-label counters
+
+        Yields:
+            Every chunk of the shared stream, from the first
+
+        Raises:
+            Exception: Whatever the source raised, in every reader
+            DeadlineExceeded: The reader's deadline ran out waiting for a chunk
+        """
+        with self._lock:
+            flight = self._streams.get(key)
+            joined = flight is not None
+            if not joined:
+                flight = _Stream()
+                self._streams[key] = flight
+                # Tracing context comes along; the deadline is dropped in _produce
+                context = contextvars.copy_context()
+                threading.Thread(target=context.run, args=(self._produce, key, flight, factory),
+                                 name="single-flight-stream", daemon=True).start()
+            flight.readers += 1
+        self._record(label, joined)
+        position = 0
+        try:
+            while True:
+                with flight.condition:
+                    while position >= len(flight.chunks) and not flight.done:
+                        remaining = remaining_seconds()
+                        if remaining is not None and remaining <= 0:
+                            raise DeadlineExceeded("stream")
+                        flight.condition.wait(remaining)
+                    chunks = flight.chunks[position:]
+                    finished, error = flight.done, flight.error
+                position += len(chunks)
+                yield from chunks
+                if finished:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._lock:
+                flight.readers -= 1
+                if not flight.readers:
+                    self._forget_stream(key, flight)
+
+    def call(self, key: Hashable, function: Callable[[], T], label: str = "call") -> T:
+        """
+        Synchronous counterpart of do: function() runs once for identical
+        concurrent callers (in a producer thread, see stream)
+        """
+        def produce():
+            yield function()
+
+        return list(self.stream(key, produce, label))[0]
+
+    def _produce(self, key: Hashable, flight: _Stream, factory: Callable[[], Iterator]) -> None:
+        clear_deadline()
+        error = None
+        try:
+            source = factory()
+            try:
+                for chunk in source:
+                    with flight.condition:
+                        flight.chunks.append(chunk)
+                        flight.condition.notify_all()
+                    if not flight.readers:
+                        break
+            finally:
+                close = getattr(source, "close", None)
+                if close is not None:
+                    close()
+        except BaseException as e:
+            error = e
+        finally:
+            self._forget_stream(key, flight)
+            with flight.condition:
+                flight.done, flight.error = True, error
+                flight.condition.notify_all()
+
+    def _forget_stream(self, key: Hashable, flight: _Stream) -> None:
+        with self._lock:
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+
+    def _record(self, label: str, joined: bool) -> None:
+        with self._lock:
+            if joined:
+                self.coalesced += 1
+            else:
+                self.calls += 1
+            ratio = self.coalescing_ratio
+        metrics.increment(f"{self.metrics_prefix}.{label}.{'coalesced' if joined else 'calls'}")
+        metrics.set_gauge(f"{self.metrics_prefix}.ratio", ratio)
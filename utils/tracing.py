@@ -0,0 +1,249 @@
+# utils/tracing.py
+"""
+Lightweight per-stage tracing for the agent pipeline.
+
+Spans nest through a context variable, so they follow asyncio tasks and
+asyncio.to_thread calls. Finished spans are kept in a bounded buffer and
+their durations are recorded in the metrics registry as
+"stage.<name>.seconds". Traces export as OpenTelemetry (OTLP/JSON) and
+metrics as Prometheus text, optionally over HTTP (start_export_server).
+
+Tracing is off unless TRACING_ENABLED is set or tracer.enable() is called.
+When off, span() returns a shared no-op span without allocating anything.
+"""
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from utils.metrics import MetricsRegistry, metrics
+
+SERVICE_NAME = "propertyloop-assistant"
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """
+    Stand-in returned while tracing is disabled
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_to_attribute(self, key: str, amount: float) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    A timed pipeline stage with attributes
+    """
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent", "attributes",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.end()
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Exited in another context (e.g. a generator closed elsewhere)
+                pass
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_to_attribute(self, key: str, amount: float) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def duration_seconds(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._finish(self)
+
+
+class Tracer:
+    """
+    Creates spans and keeps the most recent finished ones for export
+    """
+
+    def __init__(self, enabled: bool = False, max_spans: int = 5000,
+                 registry: Optional[MetricsRegistry] = None):
+        self.enabled = enabled
+        self.registry = registry or metrics
+        self._lock = threading.Lock()
+        self._finished = deque(maxlen=max_spans)
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def span(self, name: str, **attributes):
+        """
+        Start a span as a context manager, nested under the current span
+
+        Args:
+            name (str): Stage name, e.g. "router" or "image.preprocess"
+            **attributes: Initial span attributes
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def start_span(self, name: str, **attributes):
+        """
+        Start a span that is not made current; the caller must call end()
+        (used where start and end happen in different callbacks)
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    @staticmethod
+    def current_span():
+        """
+        The innermost active span, or the no-op span
+        """
+        return _current_span.get() or NOOP_SPAN
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self._finished.append(span)
+        self.registry.observe(f"stage.{span.name}.seconds", span.duration_seconds)
+        if span.error:
+            self.registry.increment(f"stage.{span.name}.errors")
+
+    def finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._finished)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._finished.clear()
+
+    def export_otlp(self) -> Dict:
+        """
+        Finished spans as an OTLP/JSON ExportTraceServiceRequest
+        """
+        spans = []
+        for span in self.finished_spans():
+            item = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent is not None:
+                item["parentSpanId"] = span.parent.span_id
+            spans.append(item)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "utils.tracing"}, "spans": spans}],
+            }]
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+tracer = Tracer(enabled=os.environ.get("TRACING_ENABLED", "").lower() in ("1", "true", "yes"))
+
+
+class _ExportHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body = metrics.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/traces":
+            body = json.dumps(tracer.export_otlp()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_export_server: Optional[ThreadingHTTPServer] = None
+_export_lock = threading.Lock()
+
+
+def start_export_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics (Prometheus text) and /traces (OTLP/JSON) from a daemon
+    thread. The port defaults to METRICS_PORT; nothing starts without one.
+    Safe to call repeatedly (e.g. on every Streamlit rerun).
+    """
+    global _export_server
+    port = port or int(os.environ.get("METRICS_PORT") or 0)
+    if not port:
+        return None
+    with _export_lock:
+        if _export_server is None:
+            _export_server = ThreadingHTTPServer((host, port), _ExportHandler)
+            _export_server.daemon_threads = True
+            threading.Thread(target=_export_server.serve_forever, daemon=True).start()
+        return _export_server
@@ -0,0 +1,162 @@
+# utils/transcript_store.py
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+from PIL import Image, ImageOps
+
+from utils.helpers import format_response
+
+DEFAULT_STORE_DIR = os.path.join(tempfile.gettempdir(), "propertyloop_transcripts")
+
+
+class ThumbnailStore:
+    """
+    Content-addressed on-disk store of small JPEG thumbnails.
+
+    Images are referenced by the SHA-256 of their source bytes, so the same
+    photo uploaded in several messages or sessions is stored once and session
+    state only holds short IDs.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_side: int = 320, quality: int = 75):
+        """
+        Args:
+            root (str, optional): Directory for thumbnails (TRANSCRIPT_STORE_DIR
+                or a temp directory by default)
+            max_side (int): Longest thumbnail side in pixels
+            quality (int): JPEG quality
+        """
+        self.root = os.path.join(root or os.environ.get("TRANSCRIPT_STORE_DIR") or DEFAULT_STORE_DIR, "images")
+        self.max_side = max_side
+        self.quality = quality
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, image_id: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.root, image_id[:2], f"{image_id}.jpg")
+
+    def put(self, data: bytes) -> str:
+        """
+        Store a thumbnail of encoded image bytes
+
+        Args:
+            data (bytes): Encoded image
+
+        Returns:
+            str: Image ID
+        """
+        image_id = hashlib.sha256(data).hexdigest()[:32]
+        path = self.path(image_id)
+        if os.path.exists(path):
+            return image_id
+
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format == "JPEG":
+                image.draft("RGB", (self.max_side, self.max_side))
+            thumbnail = ImageOps.exif_transpose(image).convert("RGB")
+            thumbnail.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent sessions never read a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        thumbnail.save(tmp_path, format="JPEG", quality=self.quality, optimize=True)
+        os.replace(tmp_path, path)
+        return image_id
+
+
+class Transcript:
+    """
+    Chat transcript of one session, spilled to a JSONL file on disk.
+
+    Only the most recent `window` messages are kept in memory; older pages
+    are read back from disk on demand through a table of line offsets.
+    Message text is formatted once on append, so reruns do not re-format
+    the whole history.
+    """
+
+    def __init__(self, root: Optional[str] = None, session_id: Optional[str] = None, window: int = 50):
+        """
+        Args:
+            root (str, optional): Store directory (TRANSCRIPT_STORE_DIR or a
+                temp directory by default)
+            session_id (str, optional): Defaults to a new random ID
+            window (int): Number of recent messages kept in memory
+        """
+        root = root or os.environ.get("TRANSCRIPT_STORE_DIR") or DEFAULT_STORE_DIR
+        self.session_id = session_id or uuid.uuid4().hex
+        directory = os.path.join(root, "sessions")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{self.session_id}.jsonl")
+        self._recent = deque(maxlen=window)
+        self._offsets: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, role: str, content: str, images: Sequence[str] = ()) -> Dict:
+        """
+        Add a message
+
+        Args:
+            role (str): "user" or "assistant"
+            content (str): Raw message text
+            images (Sequence[str]): ThumbnailStore IDs shown with the message
+
+        Returns:
+            Dict: The stored message ("role", "text", "images")
+        """
+        message = {"role": role, "text": format_response(content), "images": list(images)}
+        line = (json.dumps(message) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                self._offsets.append(f.tell())
+                f.write(line)
+            self._recent.append(message)
+        return message
+
+    def page_count(self, page_size: int) -> int:
+        return max(1, -(-len(self) // page_size))
+
+    def page(self, number: int, page_size: int = 20) -> List[Dict]:
+        """
+        Messages of one page, numbered from 0 (oldest); the last page holds
+        the newest messages and may be partial
+
+        Args:
+            number (int): Page number
+            page_size (int): Messages per page
+
+        Returns:
+            List[Dict]: Messages, oldest first
+        """
+        start = number * page_size
+        end = min(start + page_size, len(self))
+        if start >= end:
+            return []
+        with self._lock:
+            first_recent = len(self._offsets) - len(self._recent)
+            if start >= first_recent:
+                recent = list(self._recent)
+                return recent[start - first_recent:end - first_recent]
+            offset = self._offsets[start]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return [json.loads(f.readline()) for _ in range(end - start)]
+
+    def delete(self) -> None:
+        """
+        Remove the session file (thumbnails are shared and kept)
+        """
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._recent.clear()
+            self._offsets.clear()